@@ -0,0 +1,399 @@
+"""
+Load test: replay the frontend's per-page request bursts against a running API.
+
+Each simulated user opens a page, fires that page's requests in parallel as
+React Query does (at most 6 connections, like a browser), waits for the slowest
+request, thinks, and moves on to another page. Responses it fetched within the
+last --stale seconds are not requested again, matching the frontend's
+staleTime. The report gives throughput and p50/p95/p99 latency per endpoint and
+per page, plus the server's CPU and RSS.
+
+    # synthetic data, N times the rows of data/, served from its own directory
+    python benchmarks/loadtest.py synth --out /tmp/uidai-synth --scale 20
+    UIDAI_DATA_DIR=/tmp/uidai-synth uvicorn main:app --port 8000
+
+    python benchmarks/loadtest.py run --users 50 --duration 60 --pid auto --report before.json
+    python benchmarks/loadtest.py compare before.json after.json
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+# page -> requests fired when it opens (frontend/app/*/page.tsx, lib/api.ts, lib/useMapData.ts).
+# {state}, {district} and {ids} are filled from GET /districts
+PAGES = {
+    "dashboard": ["/metrics/aadhaar-health-index", "/metrics/exclusion-risk-index", "/metrics/biometric-freshness",
+                  "/enrollments_by_state", "/map/states", "/map/clusters/cold"],
+    "dashboard_state": ["/metrics/aadhaar-health-index", "/metrics/exclusion-risk-index", "/map/states",
+                        "/map/clusters/cold", "/map/districts/{state}"],
+    "dashboard_district": ["/districts/{district}/profile", "/map/pincodes/{district}"],
+    "trends": ["/api/trends/summary", "/api/trends/forecast", "/api/trends/enrollment-by-age",
+               "/api/trends/state-performance", "/api/trends/bottleneck-districts", "/api/trends/daily-volume",
+               "/api/trends/high-volume-pincodes", "/api/trends/fraud/anomalies"],
+    "anomalies": ["/metrics/enrollment-zscore", "/metrics/bulk-enrollment-days", "/metrics/pincode-ghost-towns",
+                  "/metrics/enrollment-mirage", "/metrics/phantom-children"],
+    "clusters": ["/metrics/enrollment-cold-clusters", "/metrics/update-hot-clusters", "/map/states",
+                 "/map/clusters/{cluster}"],
+    "indices": ["/metrics/aadhaar-health-index", "/metrics/exclusion-risk-index"],
+    "compare": ["/districts", "/districts/compare?ids={ids}"],
+}
+# Share of page views; dashboards dominate real traffic
+WEIGHTS = {"dashboard": 30, "dashboard_state": 15, "dashboard_district": 10, "trends": 15, "anomalies": 10,
+           "clusters": 8, "indices": 7, "compare": 5}
+BROWSER_CONNECTIONS = 6
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(latencies_ms):
+    values = sorted(latencies_ms)
+    return {"p50_ms": round(percentile(values, 50), 1), "p95_ms": round(percentile(values, 95), 1),
+            "p99_ms": round(percentile(values, 99), 1), "max_ms": round(values[-1], 1),
+            "mean_ms": round(sum(values) / len(values), 1)} if values else {}
+
+
+# ---------------------------------------------------------------- server stats
+
+def find_server_pids():
+    """Processes serving main:app (uvicorn master and workers)"""
+    pids = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit() or int(entry.name) == os.getpid():
+            continue
+        try:
+            cmdline = (entry / "cmdline").read_bytes().replace(b"\0", b" ").decode(errors="replace")
+        except OSError:
+            continue
+        if "main:app" in cmdline:
+            pids.append(int(entry.name))
+    return pids
+
+
+def process_sample(pid):
+    """(CPU seconds, RSS bytes) of one process from /proc, or None once it is gone"""
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+        rss_pages = int(Path(f"/proc/{pid}/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK"), rss_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class ServerMonitor(threading.Thread):
+    """Samples summed CPU and RSS of the server processes once per interval"""
+
+    def __init__(self, pids, interval=1.0):
+        super().__init__(daemon=True)
+        self.pids, self.interval = pids, interval
+        self.samples = []   # (wall time, cpu seconds, rss bytes)
+        self.stopped = threading.Event()
+
+    def sample(self):
+        found = [s for s in map(process_sample, self.pids) if s]
+        if found:
+            self.samples.append((time.perf_counter(), sum(s[0] for s in found), sum(s[1] for s in found)))
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.sample()
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample()
+        if len(self.samples) < 2:
+            return None
+        cpu = [(c1 - c0) / (t1 - t0) * 100 for (t0, c0, _), (t1, c1, _) in zip(self.samples, self.samples[1:])]
+        (t_first, c_first, rss_first), (t_last, c_last, rss_last) = self.samples[0], self.samples[-1]
+        return {"pids": self.pids, "cpu_pct_mean": round((c_last - c_first) / (t_last - t_first) * 100, 1),
+                "cpu_pct_max": round(max(cpu), 1), "cpu_seconds": round(c_last - c_first, 2),
+                "rss_mb_start": round(rss_first / 2**20, 1), "rss_mb_max": round(max(s[2] for s in self.samples) / 2**20, 1),
+                "rss_mb_end": round(rss_last / 2**20, 1)}
+
+
+# ---------------------------------------------------------------- traffic
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(list)   # endpoint template -> [latency ms]
+        self.errors = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.cache = defaultdict(lambda: defaultdict(int))
+        self.pages = defaultdict(list)
+        self.cached_views = defaultdict(int)   # page views served entirely from the browser's cache
+
+    def request(self, template, ms, status, size, cache):
+        with self.lock:
+            self.requests[template].append(ms)
+            self.bytes[template] += size
+            self.cache[template][cache or "-"] += 1
+            if status != 200:
+                self.errors[template] += 1
+
+    def page(self, name, ms=None):
+        with self.lock:
+            if ms is None:
+                self.cached_views[name] += 1
+            else:
+                self.pages[name].append(ms)
+
+
+class Browser:
+    """One simulated user: its own connections and React Query cache"""
+
+    def __init__(self, target, recorder, places, stale_s, encoding):
+        self.target, self.recorder, self.places, self.stale_s = target, recorder, places, stale_s
+        self.headers = {"accept": "application/json", "accept-encoding": encoding}
+        self.fetched = {}   # url -> time fetched
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS)
+
+    def connection(self):
+        if getattr(self.local, "con", None) is None:
+            cls = http.client.HTTPSConnection if self.target.scheme == "https" else http.client.HTTPConnection
+            self.local.con = cls(self.target.hostname, self.target.port, timeout=120)
+        return self.local.con
+
+    def get(self, template, url):
+        start = time.perf_counter()
+        try:
+            con = self.connection()
+            con.request("GET", url, headers=self.headers)
+            response = con.getresponse()
+            size = len(response.read())
+            status, cache = response.status, response.getheader("x-cache")
+        except (OSError, http.client.HTTPException):
+            self.local.con = None
+            status, size, cache = 0, 0, "ERROR"
+        self.recorder.request(template, (time.perf_counter() - start) * 1000, status, size, cache)
+
+    def open(self, page):
+        """Fire the page's requests in parallel; page time is when the slowest one lands"""
+        place = random.choice(self.places)
+        fill = {"state": quote(place["state"]), "district": quote(place["district"]),
+                "cluster": random.choice(["cold", "hot"]),
+                "ids": ",".join(quote(p["district"]) for p in random.sample(self.places, min(3, len(self.places))))}
+        now = time.perf_counter()
+        todo = []
+        for template in PAGES[page]:
+            url = self.target.path.rstrip("/") + template.format(**fill)
+            if now - self.fetched.get(url, -self.stale_s - 1) > self.stale_s:
+                self.fetched[url] = now
+                todo.append((template, url))
+        if not todo:
+            self.recorder.page(page)
+            return
+        start = time.perf_counter()
+        for future in [self.pool.submit(self.get, t, u) for t, u in todo]:
+            future.result()
+        self.recorder.page(page, (time.perf_counter() - start) * 1000)
+
+
+def districts(target):
+    con = http.client.HTTPConnection(target.hostname, target.port, timeout=300)
+    con.request("GET", target.path.rstrip("/") + "/districts")
+    response = con.getresponse()
+    if response.status != 200:
+        raise SystemExit(f"GET /districts returned {response.status}; is the API up and loaded?")
+    return json.loads(response.read())["data"]
+
+
+def run(args):
+    target = urlsplit(args.url)
+    weights = dict(WEIGHTS) if not args.pages else {}
+    for part in filter(None, (args.pages or "").split(",")):
+        name, _, weight = part.partition("=")
+        if name not in PAGES:
+            raise SystemExit(f"Unknown page '{name}' (pages: {', '.join(PAGES)})")
+        weights[name] = float(weight or 1)
+    places = districts(target)
+    pids = find_server_pids() if args.pid == "auto" else [int(p) for p in args.pid.split(",")] if args.pid else []
+    monitor = ServerMonitor(pids) if pids else None
+    recorder = Recorder()
+    random.seed(args.seed)
+    deadline = time.perf_counter() + args.duration
+
+    def user(index):
+        browser = Browser(target, recorder, places, args.stale, args.encoding)
+        time.sleep(random.uniform(0, args.ramp))
+        while time.perf_counter() < deadline:
+            browser.open(random.choices(list(weights), list(weights.values()))[0])
+            time.sleep(random.expovariate(1 / args.think) if args.think > 0 else 0)
+        browser.pool.shutdown()
+
+    print(f"⏳ {args.users} users on {args.url} for {args.duration}s "
+          f"(think {args.think}s, stale {args.stale}s, server pids {pids or 'not monitored'})...")
+    if monitor:
+        monitor.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(args.users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    report = build_report(args, recorder, elapsed, monitor.stop() if monitor else None)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"✅ Report saved to {args.report}")
+
+
+def build_report(args, recorder, elapsed, server):
+    total = sum(len(v) for v in recorder.requests.values())
+    endpoints = {}
+    for template, latencies in sorted(recorder.requests.items()):
+        endpoints[template] = {"requests": len(latencies), "errors": recorder.errors[template],
+                               "rps": round(len(latencies) / elapsed, 2),
+                               "mean_bytes": recorder.bytes[template] // len(latencies),
+                               "cache": dict(recorder.cache[template]), **summarize(latencies)}
+    pages = {name: {"loads": len(times), "per_s": round(len(times) / elapsed, 2),
+                    "cached_views": recorder.cached_views[name], **summarize(times)}
+             for name, times in sorted(recorder.pages.items())}
+    every = [ms for latencies in recorder.requests.values() for ms in latencies]
+    return {"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {k: v for k, v in vars(args).items() if k not in ("func", "report")},
+            "elapsed_s": round(elapsed, 1), "requests": total, "errors": sum(recorder.errors.values()),
+            "throughput_rps": round(total / elapsed, 2), "page_loads": sum(len(t) for t in recorder.pages.values()),
+            "latency": summarize(every), "endpoints": endpoints, "pages": pages, "server": server}
+
+
+def print_report(report):
+    print(f"\n{report['requests']} requests ({report['errors']} errors), {report['page_loads']} page loads "
+          f"in {report['elapsed_s']}s: {report['throughput_rps']} req/s, p50 {report['latency'].get('p50_ms')}ms "
+          f"p95 {report['latency'].get('p95_ms')}ms p99 {report['latency'].get('p99_ms')}ms")
+    print(f"\n{'endpoint':<44}{'reqs':>7}{'err':>5}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}  cache")
+    for name, e in sorted(report["endpoints"].items(), key=lambda kv: -kv[1]["p95_ms"]):
+        cache = " ".join(f"{k}:{v}" for k, v in sorted(e["cache"].items()))
+        print(f"{name:<44}{e['requests']:>7}{e['errors']:>5}{e['rps']:>8}{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}  {cache}")
+    print(f"\n{'page':<44}{'loads':>7}{'load/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}  cached views")
+    for name, p in report["pages"].items():
+        print(f"{name:<44}{p['loads']:>7}{p['per_s']:>8}{p['p50_ms']:>9}{p['p95_ms']:>9}{p['p99_ms']:>9}  {p['cached_views']}")
+    server = report["server"]
+    if server:
+        print(f"\nserver: CPU {server['cpu_pct_mean']}% mean / {server['cpu_pct_max']}% max, "
+              f"RSS {server['rss_mb_start']} -> {server['rss_mb_end']} MB (max {server['rss_mb_max']} MB)")
+
+
+def compare(args):
+    """Per endpoint and page: p95 and throughput of the second report relative to the first"""
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    def delta(old, new):
+        if old is None or new is None:
+            return f"{'-':>10}"
+        change = f"{(new - old) / old * 100:+.0f}%" if old else "new"
+        return f"{new:>10} ({change:>5})"
+
+    print(f"{'':<44}{'p95 ms':>18}{'p99 ms':>18}{'req/s':>18}")
+    print(f"{'overall':<44}{delta(before['latency'].get('p95_ms'), after['latency'].get('p95_ms'))}"
+          f"{delta(before['latency'].get('p99_ms'), after['latency'].get('p99_ms'))}"
+          f"{delta(before['throughput_rps'], after['throughput_rps'])}")
+    for section, rate in (("endpoints", "rps"), ("pages", "per_s")):
+        for name in sorted(set(before[section]) | set(after[section])):
+            old, new = before[section].get(name, {}), after[section].get(name, {})
+            print(f"{name:<44}{delta(old.get('p95_ms'), new.get('p95_ms'))}{delta(old.get('p99_ms'), new.get('p99_ms'))}"
+                  f"{delta(old.get(rate), new.get(rate))}")
+    if before.get("server") and after.get("server"):
+        print(f"{'server CPU % mean':<44}{delta(before['server']['cpu_pct_mean'], after['server']['cpu_pct_mean'])}")
+        print(f"{'server RSS MB max':<44}{delta(before['server']['rss_mb_max'], after['server']['rss_mb_max'])}")
+
+
+# ---------------------------------------------------------------- synthetic data
+
+def synth(args):
+    """
+    Synthetic CSVs with the source schemas: --scale times the rows of each dataset in data/,
+    over the same state/district/pincode geography, spread over --days days
+    """
+    import duckdb
+    sys.path.append('.')
+    from db.duckdb_loader import DATASETS, BASE_DIR
+
+    source = BASE_DIR / "data"
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    con = duckdb.connect()
+    con.execute(f"SELECT setseed({args.seed / 2**31})")
+    files = {table: sorted(source.glob(pattern)) for table, (pattern, _) in DATASETS.items()}
+    sources = [f"SELECT state, district, pincode FROM read_csv_auto('{f}')" for fs in files.values() for f in fs]
+    con.execute(f"CREATE TABLE places AS SELECT DISTINCT * FROM ({' UNION ALL '.join(sources)}) "
+                "WHERE state IS NOT NULL AND district IS NOT NULL ORDER BY ALL")
+    con.execute("CREATE TABLE places_n AS SELECT row_number() OVER () - 1 AS i, * FROM places")
+    n_places = con.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+    for table, (pattern, columns) in DATASETS.items():
+        existing = sum(con.execute(f"SELECT COUNT(*) FROM read_csv_auto('{f}')").fetchone()[0] for f in files[table])
+        rows = int((existing or args.default_rows) * args.scale)
+        counts = ", ".join(f"CAST(floor(-ln(random()) * {args.mean_count}) AS INTEGER) AS {c}" for c in columns[4:])
+        name = pattern.replace("*", "synthetic")
+        con.execute(f"""
+            COPY (
+                SELECT strftime(DATE '{args.start}' + CAST(floor(random() * {args.days}) AS INTEGER), '%d-%m-%Y') AS date,
+                       p.state, p.district, p.pincode, {counts}
+                FROM (SELECT CAST(floor(random() * {n_places}) AS BIGINT) AS i FROM range({rows})) r
+                JOIN places_n p USING (i)
+            ) TO '{out / name}' (HEADER, DELIMITER ',')
+        """)
+        print(f"✅ {out / name}: {rows} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay frontend traffic against the API")
+    sub = parser.add_subparsers(required=True)
+
+    p = sub.add_parser("run", help="simulate users against a running API")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    p.add_argument("--duration", type=float, default=60, help="seconds of traffic")
+    p.add_argument("--ramp", type=float, default=5, help="users start spread over this many seconds")
+    p.add_argument("--think", type=float, default=2, help="mean think time between pages (s, exponential)")
+    p.add_argument("--stale", type=float, default=300, help="React Query staleTime: refetch only after this (s)")
+    p.add_argument("--pages", help="page weights, e.g. dashboard=3,trends=1 (default: built-in mix)")
+    p.add_argument("--encoding", default="gzip, deflate, br", help="Accept-Encoding sent by the users")
+    p.add_argument("--pid", help="server pid(s), comma separated, or 'auto' to find main:app processes")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--report", help="save the JSON report here")
+    p.set_defaults(func=run)
+
+    p = sub.add_parser("compare", help="compare two saved reports")
+    p.add_argument("before")
+    p.add_argument("after")
+    p.set_defaults(func=compare)
+
+    p = sub.add_parser("synth", help="write synthetic source CSVs for UIDAI_DATA_DIR")
+    p.add_argument("--out", required=True)
+    p.add_argument("--scale", type=float, default=10, help="rows per dataset as a multiple of data/")
+    p.add_argument("--default-rows", type=int, default=50000, help="base rows for a dataset missing from data/")
+    p.add_argument("--days", type=int, default=730)
+    p.add_argument("--start", default="2024-01-01")
+    p.add_argument("--mean-count", type=float, default=4, help="mean of each age-band count")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=synth)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: trend analyser response paths, per-request groupby + iterrows (before)
+vs. aggregates precomputed at load and zipped from column arrays (after).
+
+Run from the backend directory, after the API has loaded uidai.duckdb once
+and with the server stopped (DuckDB allows one writer process):
+    python benchmarks/trend_aggregates.py [repeats]
+"""
+import sys
+import time
+
+sys.path.append('.')
+from routes import trend_analyser as ta
+
+
+def legacy_state_performance(df):
+    state_stats = df.groupby('state', observed=True).agg({c: 'sum' for c in ta.SUM_COLUMNS}).astype('int64').reset_index()
+    state_stats['total_enrolled'] = state_stats['age_0_5'] + state_stats['age_5_17'] + state_stats['age_18_greater']
+    state_stats['demo_completed'] = state_stats['demo_age_5_17'] + state_stats['demo_age_17_']
+    state_stats['bio_completed'] = state_stats['bio_age_5_17'] + state_stats['bio_age_17_']
+    state_stats['demo_rate'] = (state_stats['demo_completed'] / state_stats['total_enrolled'] * 100).fillna(0)
+    state_stats['bio_rate'] = (state_stats['bio_completed'] / state_stats['total_enrolled'] * 100).fillna(0)
+    state_stats = state_stats.sort_values('total_enrolled', ascending=False)
+    return [
+        {
+            "state": row['state'],
+            "total_enrolled": int(row['total_enrolled']),
+            "demographic_rate": round(row['demo_rate'], 2),
+            "biometric_rate": round(row['bio_rate'], 2),
+            "pending_demographics": int(row['total_enrolled'] - row['demo_completed']),
+            "pending_biometrics": int(row['total_enrolled'] - row['bio_completed'])
+        }
+        for _, row in state_stats.iterrows()
+    ]
+
+
+def legacy_bottleneck_districts(df):
+    district_stats = df.groupby(['state', 'district'], observed=True).agg({c: 'sum' for c in ta.SUM_COLUMNS}).astype('int64').reset_index()
+    district_stats['total_enrolled'] = district_stats['age_0_5'] + district_stats['age_5_17'] + district_stats['age_18_greater']
+    district_stats['demo_completed'] = district_stats['demo_age_5_17'] + district_stats['demo_age_17_']
+    district_stats['bio_completed'] = district_stats['bio_age_5_17'] + district_stats['bio_age_17_']
+    district_stats['demo_rate'] = (district_stats['demo_completed'] / district_stats['total_enrolled'] * 100).fillna(0)
+    district_stats['bio_rate'] = (district_stats['bio_completed'] / district_stats['total_enrolled'] * 100).fillna(0)
+    bottlenecks = district_stats[
+        (district_stats['total_enrolled'] > 50) &
+        ((district_stats['bio_rate'] < 80) | (district_stats['demo_rate'] < 80))
+    ].sort_values('total_enrolled', ascending=False).head(20)
+    return [
+        {
+            "state": row['state'],
+            "district": row['district'],
+            "total_enrolled": int(row['total_enrolled']),
+            "demographic_rate": round(row['demo_rate'], 2),
+            "biometric_rate": round(row['bio_rate'], 2),
+            "issue": "Biometric Backlog" if row['bio_rate'] < row['demo_rate'] else "Demographic Backlog"
+        }
+        for _, row in bottlenecks.iterrows()
+    ]
+
+
+def legacy_high_volume_pincodes(df):
+    pincode_stats = df.groupby(['state', 'district', 'pincode'], observed=True).agg({
+        'age_0_5': 'sum', 'age_5_17': 'sum', 'age_18_greater': 'sum'
+    }).astype('int64').reset_index()
+    pincode_stats['total'] = pincode_stats['age_0_5'] + pincode_stats['age_5_17'] + pincode_stats['age_18_greater']
+    top_pincodes = pincode_stats.sort_values('total', ascending=False).head(30)
+    return [
+        {
+            "pincode": row['pincode'],
+            "district": row['district'],
+            "state": row['state'],
+            "total_enrollments": int(row['total']),
+            "children_0_5": int(row['age_0_5']),
+            "children_5_17": int(row['age_5_17']),
+            "adults": int(row['age_18_greater'])
+        }
+        for _, row in top_pincodes.iterrows()
+    ]
+
+
+CASES = [
+    ("state-performance", legacy_state_performance, ta.state_performance),
+    ("bottleneck-districts", legacy_bottleneck_districts, ta.bottleneck_districts),
+    ("high-volume-pincodes", legacy_high_volume_pincodes, ta.high_volume_pincodes),
+]
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - start) / repeats * 1000, result
+
+
+def main(repeats=20):
+    start = time.perf_counter()
+    ta.ensure_data_loaded()
+    df = ta.trend_state['data']
+    if df is None:
+        print("❌ No trend data loaded")
+        return
+    print(f"📂 {len(df)} merged rows, load + precompute {time.perf_counter() - start:.1f}s")
+    footprint = ta.trend_state['footprint']
+    if footprint:
+        print(f"🗜️ trend frame {footprint['merged_bytes'] / 2**20:.1f} MB merged -> "
+              f"{footprint['compact_bytes'] / 2**20:.1f} MB compact")
+    print()
+    print(f"{'endpoint':<24}{'before (ms)':>12}{'after (ms)':>12}{'speedup':>10}  same output")
+    for name, legacy, current in CASES:
+        before, expected = timed(lambda: legacy(df), repeats)
+        after, actual = timed(current, repeats)
+        print(f"{name:<24}{before:>12.2f}{after:>12.3f}{before / after:>9.0f}x  {expected == actual}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,56 @@
+"""
+Plan regression check for the query catalog (db/queries.py)
+    python check_plans.py [--dump plans] [name ...]
+
+EXPLAINs every catalog statement with its sample parameters and fails (exit
+code 1) when a plan contains a forbidden operator, e.g. a DELIM join from a
+correlated subquery or a nested loop join, or lacks an expected one. --dump
+writes each plan's text rendering to <dir>/<name>.txt for review or diffing.
+Uses uidai.duckdb, loading the data first if it has not been built; run it with
+the API stopped (DuckDB allows one writer process).
+"""
+import argparse
+import os
+import sys
+import time
+
+import duckdb
+from db import queries
+from db.duckdb_loader import load_data, get_connection, get_data_version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check query catalog plans for regressions")
+    parser.add_argument("names", nargs="*", help="catalog entries to check (default: all)")
+    parser.add_argument("--dump", metavar="DIR", help="write each plan's EXPLAIN text to DIR/<name>.txt")
+    args = parser.parse_args()
+    unknown = [n for n in args.names if n not in queries.CATALOG]
+    if unknown:
+        parser.error(f"unknown catalog entries: {', '.join(unknown)} (known: {', '.join(queries.CATALOG)})")
+
+    con = get_connection()
+    try:
+        get_data_version(con)
+    except duckdb.CatalogException:
+        load_data()
+    names = args.names or list(queries.CATALOG)
+    problems = queries.check(con, names)
+    for name in names:
+        start = time.perf_counter()
+        rows = len(queries.run(con, name, queries.CATALOG[name]["sample"]).fetchall())
+        elapsed = (time.perf_counter() - start) * 1000
+        ops = queries.operators(queries.plan(con, name))
+        joins = sorted({op for op in ops if "JOIN" in op}) or ["no joins"]
+        status = "❌" if name in problems else "✅"
+        print(f"{status} {name}: {rows} rows in {elapsed:.1f}ms, {len(ops)} operators ({', '.join(joins)})")
+        for problem in problems.get(name, []):
+            print(f"     {problem}")
+        if args.dump:
+            os.makedirs(args.dump, exist_ok=True)
+            with open(os.path.join(args.dump, f"{name}.txt"), "w") as f:
+                f.write(queries.explain(con, name))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
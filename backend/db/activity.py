@@ -0,0 +1,60 @@
+"""
+Last-activity index: per pincode, the latest enrollment, biometric and demographic date
+`pincode_activity` is built at load and moved forward by each ingested file, so
+"when was this pincode last touched" never needs MAX(date) over the raw tables.
+The `pincode_activity_status` view adds the last update (biometric or
+demographic) and rolling 12/24-month activity flags, evaluated against
+CURRENT_DATE when read. Any other threshold is a comparison on the same rows.
+"""
+import re
+
+DATASETS = ("enrollment", "biometric", "demographic")
+UNITS = {"d": "days", "w": "weeks", "m": "months", "y": "years"}
+PERIOD = re.compile(r"^\s*(\d+)\s*(d|days?|w|weeks?|m|months?|y|years?)\s*$", re.IGNORECASE)
+
+
+def latest_sql(source):
+    return f"SELECT pincode, MAX(date) AS date FROM {source} WHERE pincode IS NOT NULL GROUP BY pincode"
+
+
+def build(con):
+    """Last-activity index from the full tables"""
+    con.execute(f"""
+        CREATE OR REPLACE TABLE pincode_activity AS
+        SELECT pincode, {', '.join(f"MAX(date) FILTER (WHERE dataset = '{d}') AS last_{d}" for d in DATASETS)}
+        FROM ({' UNION ALL '.join(f"SELECT '{d}' AS dataset, * FROM ({latest_sql(d)})" for d in DATASETS)})
+        GROUP BY pincode
+    """)
+    con.execute("""
+        CREATE OR REPLACE VIEW pincode_activity_status AS
+        SELECT *, COALESCE(last_update >= CURRENT_DATE - INTERVAL '12 months', false) AS active_12m,
+                  COALESCE(last_update >= CURRENT_DATE - INTERVAL '24 months', false) AS active_24m
+        FROM (SELECT *, GREATEST(last_biometric, last_demographic) AS last_update FROM pincode_activity)
+    """)
+
+
+def on_ingest(con, dataset, staging, data_version):
+    """Ingestion hook: move the new file's pincodes' last dates forward"""
+    if dataset not in DATASETS:
+        return None
+    column = f"last_{dataset}"
+    con.execute(f"CREATE OR REPLACE TEMP TABLE activity_batch AS {latest_sql(staging)}")
+    updated = con.execute(f"""
+        UPDATE pincode_activity a SET {column} = GREATEST(a.{column}, b.date)
+        FROM activity_batch b WHERE a.pincode = b.pincode
+    """).fetchone()[0]
+    added = con.execute(f"""
+        INSERT INTO pincode_activity (pincode, {column})
+        SELECT pincode, date FROM activity_batch b
+        WHERE NOT EXISTS (SELECT 1 FROM pincode_activity a WHERE a.pincode = b.pincode)
+    """).fetchone()[0]
+    con.execute("DROP TABLE activity_batch")
+    return {"pincodes_updated": updated, "pincodes_added": added}
+
+
+def parse_period(text):
+    """'24 months', '2y', '90 days' -> an INTERVAL string DuckDB can cast"""
+    match = PERIOD.match(text or "")
+    if not match:
+        raise ValueError(f"Invalid period '{text}'. Use a number and a unit, e.g. 90d, 12 months or 2y")
+    return f"{int(match.group(1))} {UNITS[match.group(2)[0].lower()]}"
@@ -0,0 +1,303 @@
+"""
+Persisted fraud model with incremental scoring
+The trend analyser's IsolationForest is fitted once, saved next to the database,
+and every scored row is kept in `anomaly_scores`. Rows arriving through
+db/ingest.py are scored against the saved model and appended in O(new rows).
+The model is refitted on the whole table in the background when the alert rate
+of new rows drifts from the training rate, or once RETRAIN_INTERVAL_HOURS have
+passed since the last fit and new rows have arrived.
+"""
+import os
+import threading
+import time
+import numpy as np
+from db import coalesce, ingest, response_cache
+from db.duckdb_loader import get_connection, get_data_version
+
+FEATURES = ["age_18_greater", "fraud_spike_score", "bio_age_17_"]
+KEYS = ["date", "state", "district", "pincode"]
+CONTAMINATION = 0.01
+ROLLING_WINDOW = 7
+MODEL_PATH = os.environ.get("UIDAI_ANOMALY_MODEL", "anomaly_model.joblib")
+DRIFT_THRESHOLD = float(os.environ.get("UIDAI_ANOMALY_DRIFT", "0.02"))
+DRIFT_MIN_ROWS = 500
+RETRAIN_INTERVAL_HOURS = float(os.environ.get("UIDAI_ANOMALY_RETRAIN_HOURS", "24"))
+
+model_state = {
+    "model": None,
+    "version": 0,
+    "trained_at": None,
+    "trained_rows": 0,
+    "alert_rate": None,
+    "alerts": 0,
+    "rows_since_train": 0,
+    "alerts_since_train": 0,
+    "tails": {},          # district -> last ROLLING_WINDOW - 1 adult enrollment values
+    "retraining": False,
+    "last_retrain_reason": None,
+}
+_lock = threading.Lock()
+
+
+def fit(X):
+    from sklearn.ensemble import IsolationForest
+    return IsolationForest(contamination=CONTAMINATION, random_state=42).fit(X)
+
+
+def score(model, X):
+    """(anomaly score, label) per row; label -1 = anomaly, same as model.predict"""
+    scores = model.score_samples(X)
+    return scores, np.where(scores - model.offset_ < 0, -1, 1)
+
+
+def spike_scores(frame, tails):
+    """
+    adults / (7-row rolling mean of adults in the district + 1), continuing each
+    district's rolling window from its stored tail
+    """
+    import pandas as pd
+    history = pd.DataFrame([(d, v) for d in frame["district"].unique() for v in tails.get(d, [])],
+                           columns=["district", "age_18_greater"])
+    combined = pd.concat([history.assign(new=False), frame[["district", "age_18_greater"]].assign(new=True)],
+                         ignore_index=True)
+    rolling = combined.groupby("district")["age_18_greater"].transform(
+        lambda x: x.rolling(ROLLING_WINDOW).mean().fillna(0))
+    return frame["age_18_greater"].to_numpy(dtype=float) / (rolling[combined["new"]].to_numpy() + 1)
+
+
+def update_tails(frame):
+    for district, values in frame.groupby("district")["age_18_greater"]:
+        tail = model_state["tails"].get(district, []) + values.tolist()
+        model_state["tails"][district] = tail[-(ROLLING_WINDOW - 1):]
+
+
+def save_model(con, model, rows, alerts, data_version, since=(0, 0)):
+    """Install `model`, fitted on the first `rows` rows (`alerts` of them flagged); `since` = (rows, alerts) after them"""
+    import joblib
+    model_state.update(model=model, version=model_state["version"] + 1, trained_at=time.time(),
+                       trained_rows=rows, alert_rate=alerts / rows if rows else 0.0, alerts=alerts + since[1],
+                       rows_since_train=since[0], alerts_since_train=since[1])
+    joblib.dump(model, MODEL_PATH)
+    # fraud scores and counts changed under the same data version
+    response_cache.clear()
+    coalesce.clear_spool()
+    con.execute("""
+        CREATE OR REPLACE TABLE anomaly_model AS
+        SELECT ? AS model_version, to_timestamp(?) AS trained_at, ? AS trained_rows, ? AS alert_rate, ? AS data_version
+    """, [model_state["version"], model_state["trained_at"], rows, model_state["alert_rate"], data_version])
+
+
+def train(con, frame, data_version=None, model=None):
+    """Fit on the merged trend frame (with fraud_spike_score), or take `model` fitted on it, and rebuild `anomaly_scores`"""
+    import pandas as pd
+    X = frame[FEATURES].to_numpy(dtype=float)
+    model = fit(X) if model is None else model
+    scores, labels = score(model, X)
+    rows = pd.DataFrame({
+        "row_id": np.arange(len(frame), dtype=np.int64),
+        "date": pd.to_datetime(frame["date"], format="%d-%m-%Y").dt.date,
+        "state": frame["state"].to_numpy(),
+        "district": frame["district"].to_numpy(),
+        "pincode": frame["pincode"].to_numpy(),
+        "age_18_greater": X[:, 0],
+        "fraud_spike_score": X[:, 1],
+        "bio_age_17_": X[:, 2],
+        "score": scores,
+        "is_anomaly": labels.astype(np.int8),
+    })
+    con.register("anomaly_rows_df", rows)
+    con.execute("CREATE OR REPLACE TABLE anomaly_scores AS SELECT *, now() AS scored_at FROM anomaly_rows_df")
+    con.unregister("anomaly_rows_df")
+    model_state["tails"] = {}
+    update_tails(frame)
+    save_model(con, model, len(frame), int((labels == -1).sum()), data_version)
+    return model
+
+
+def restore(con, data_version=None):
+    """Load the saved model and its state; False if there is none (or it is for other data)"""
+    import joblib
+    if not os.path.exists(MODEL_PATH):
+        return False
+    try:
+        meta = con.execute("SELECT model_version, epoch(trained_at), trained_rows, alert_rate, data_version "
+                           "FROM anomaly_model").fetchone()
+    except Exception:
+        return False
+    if meta is None or (data_version is not None and meta[4] != data_version):
+        return False
+    tails = con.execute(f"""
+        SELECT district, LIST(age_18_greater ORDER BY row_id)
+        FROM (SELECT district, age_18_greater, row_id,
+                     ROW_NUMBER() OVER (PARTITION BY district ORDER BY row_id DESC) AS rn
+              FROM anomaly_scores)
+        WHERE rn < {ROLLING_WINDOW} GROUP BY district
+    """).fetchall()
+    alerts = con.execute("SELECT COUNT(*) FILTER (WHERE is_anomaly = -1) FROM anomaly_scores").fetchone()[0]
+    since = con.execute("SELECT COUNT(*), COUNT(*) FILTER (WHERE is_anomaly = -1) FROM anomaly_scores "
+                        "WHERE row_id >= ?", [meta[2]]).fetchone()
+    model_state.update(model=joblib.load(MODEL_PATH), version=meta[0], trained_at=meta[1], trained_rows=meta[2],
+                       alert_rate=meta[3], alerts=alerts, rows_since_train=since[0], alerts_since_train=since[1],
+                       tails={d: list(v) for d, v in tails})
+    return True
+
+
+def train_or_restore(con, frame):
+    """Reuse the saved model when it was trained on the current data, otherwise fit on `frame`"""
+    data_version = get_data_version(con)
+    with _lock:
+        if model_state["model"] is None and not restore(con, data_version):
+            train(con, frame, data_version)
+        return model_state["model"]
+
+
+def adopt(con, frame, model):
+    """Install a model fitted on `frame` in another process (a /jobs worker) and rescore every row"""
+    with ingest.write_lock, _lock:
+        return train(con, frame, get_data_version(con), model)
+
+
+def saved_model(con):
+    """The model trained on the current data (in memory or restored from disk), or None; never fits"""
+    with _lock:
+        if model_state["model"] is None and not restore(con, get_data_version(con)):
+            return None
+        return model_state["model"]
+
+
+def score_enrollment(con, staging):
+    """Score new enrollment rows (joined to biometric updates already loaded) and append them"""
+    rows = con.execute(f"""
+        SELECT s.date, s.state, s.district, s.pincode, s.age_18_greater::DOUBLE AS age_18_greater,
+               COALESCE(b.bio_age_17_, 0)::DOUBLE AS bio_age_17_
+        FROM {staging} s LEFT JOIN biometric b USING ({', '.join(KEYS)})
+        ORDER BY s.rowid
+    """).fetchdf()
+    if rows.empty:
+        return 0, 0
+    rows["fraud_spike_score"] = spike_scores(rows, model_state["tails"])
+    rows["score"], labels = score(model_state["model"], rows[FEATURES].to_numpy(dtype=float))
+    rows["is_anomaly"] = labels.astype(np.int8)
+    next_id = con.execute("SELECT COALESCE(MAX(row_id) + 1, 0) FROM anomaly_scores").fetchone()[0]
+    rows.insert(0, "row_id", np.arange(next_id, next_id + len(rows), dtype=np.int64))
+    con.register("anomaly_rows_df", rows)
+    con.execute("INSERT INTO anomaly_scores BY NAME SELECT *, now() AS scored_at FROM anomaly_rows_df")
+    con.unregister("anomaly_rows_df")
+    update_tails(rows)
+    return len(rows), int((labels == -1).sum())
+
+
+def rescore_biometric(con, staging):
+    """Add late-arriving biometric updates to the rows they match and rescore those rows"""
+    rows = con.execute(f"""
+        WITH new_bio AS (SELECT {', '.join(KEYS)}, SUM(bio_age_17_) AS bio FROM {staging} GROUP BY ALL)
+        SELECT a.row_id, a.age_18_greater, a.fraud_spike_score, a.bio_age_17_ + n.bio AS bio_age_17_,
+               a.is_anomaly AS previous
+        FROM anomaly_scores a JOIN new_bio n USING ({', '.join(KEYS)})
+    """).fetchdf()
+    if rows.empty:
+        return 0, 0
+    rows["score"], labels = score(model_state["model"], rows[FEATURES].to_numpy(dtype=float))
+    rows["is_anomaly"] = labels.astype(np.int8)
+    con.register("anomaly_rows_df", rows)
+    con.execute("""
+        UPDATE anomaly_scores a SET bio_age_17_ = r.bio_age_17_, score = r.score, is_anomaly = r.is_anomaly,
+                                    scored_at = now()
+        FROM anomaly_rows_df r WHERE a.row_id = r.row_id
+    """)
+    con.unregister("anomaly_rows_df")
+    return len(rows), int((labels == -1).sum() - (rows["previous"] == -1).sum())
+
+
+def on_ingest(con, dataset, staging, data_version):
+    """Ingestion hook: score what the new file adds, then check whether a refit is due"""
+    if dataset not in ("enrollment", "biometric"):
+        return None
+    with _lock:
+        if model_state["model"] is None and not restore(con):
+            return {"scored": 0, "note": "no trained model yet; rows are scored at the next fit"}
+        if dataset == "enrollment":
+            scored, new_alerts = score_enrollment(con, staging)
+            model_state["rows_since_train"] += scored
+        else:
+            scored, new_alerts = rescore_biometric(con, staging)
+        model_state["alerts"] += new_alerts
+        model_state["alerts_since_train"] += new_alerts
+        con.execute("UPDATE anomaly_model SET data_version = ?", [data_version])
+        reason = retrain_reason()
+    if reason:
+        start_retrain(reason)
+    return {"scored": scored, "new_alerts": new_alerts, "drift": drift(), "retrain": reason}
+
+
+def drift():
+    """|alert rate of rows scored since the last fit - training alert rate|"""
+    if model_state["rows_since_train"] == 0 or model_state["alert_rate"] is None:
+        return 0.0
+    return round(abs(model_state["alerts_since_train"] / model_state["rows_since_train"] - model_state["alert_rate"]), 4)
+
+
+def retrain_reason():
+    if model_state["retraining"] or model_state["rows_since_train"] == 0:
+        return None
+    if model_state["rows_since_train"] >= DRIFT_MIN_ROWS and drift() > DRIFT_THRESHOLD:
+        return "drift"
+    if time.time() - (model_state["trained_at"] or 0) > RETRAIN_INTERVAL_HOURS * 3600:
+        return "schedule"
+    return None
+
+
+def start_retrain(reason="manual"):
+    """Refit in a background thread unless one is already running"""
+    with _lock:
+        if model_state["retraining"]:
+            return False
+        model_state["retraining"] = True
+    threading.Thread(target=retrain, args=(reason,), daemon=True).start()
+    return True
+
+
+def retrain(reason="manual"):
+    """Refit on every scored row and rescore the table; runs in a background thread"""
+    try:
+        con = get_connection()
+        X = np.column_stack(list(con.execute(
+            f"SELECT {', '.join(FEATURES)} FROM anomaly_scores ORDER BY row_id").fetchnumpy().values()))
+        model = fit(X.astype(float))
+        with ingest.write_lock, _lock:
+            rows = con.execute(f"SELECT row_id, {', '.join(FEATURES)} FROM anomaly_scores").fetchdf()
+            rows["score"], labels = score(model, rows[FEATURES].to_numpy(dtype=float))
+            rows["is_anomaly"] = labels.astype(np.int8)
+            con.register("anomaly_rows_df", rows[["row_id", "score", "is_anomaly"]])
+            con.execute("""
+                UPDATE anomaly_scores a SET score = r.score, is_anomaly = r.is_anomaly, scored_at = now()
+                FROM anomaly_rows_df r WHERE a.row_id = r.row_id
+            """)
+            con.unregister("anomaly_rows_df")
+            # rows appended by ingests during the fit count as arrivals since it, as restore() counts them
+            trained = rows["row_id"].to_numpy() < len(X)
+            save_model(con, model, len(X), int((labels[trained] == -1).sum()), get_data_version(con),
+                       since=(int((~trained).sum()), int((labels[~trained] == -1).sum())))
+            model_state["last_retrain_reason"] = reason
+    finally:
+        model_state["retraining"] = False
+
+
+def status():
+    return {
+        "model_version": model_state["version"],
+        "trained_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(model_state["trained_at"]))
+        if model_state["trained_at"] else None,
+        "trained_rows": model_state["trained_rows"],
+        "training_alert_rate": round(model_state["alert_rate"], 4) if model_state["alert_rate"] is not None else None,
+        "alerts": model_state["alerts"],
+        "rows_since_train": model_state["rows_since_train"],
+        "alerts_since_train": model_state["alerts_since_train"],
+        "drift": drift(),
+        "drift_threshold": DRIFT_THRESHOLD,
+        "retraining": model_state["retraining"],
+        "last_retrain_reason": model_state["last_retrain_reason"],
+    }
+
+
+ingest.register_hook(on_ingest)
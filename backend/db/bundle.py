@@ -0,0 +1,156 @@
+"""
+Static metric bundles
+precompute.py evaluates every parameter-free GET route once and writes the
+responses to <out>/<data_version>/: one JSON file per route, precompressed .gz
+(and .br when the brotli package is installed) variants, a Parquet file for
+tabular results, and manifest.json. <out>/LATEST names the newest bundle. The
+files can be served by any static file server. With UIDAI_BUNDLE_DIR set, the
+API itself answers parameter-free requests from the bundle while its data
+version matches the loaded data.
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+
+try:
+    import brotli
+except ImportError:  # optional: bundles then carry .gz variants only
+    brotli = None
+
+BUNDLE_DIR = os.environ.get("UIDAI_BUNDLE_DIR") or None
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"} if brotli else {"gzip": ".gz"}
+
+_state = {"mtime": None, "dir": None, "manifest": None, "routes": {}}
+
+
+def static_routes(app, exclude=()):
+    """Paths of GET routes without path parameters or required query parameters"""
+    from fastapi.routing import APIRoute
+    paths = []
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods or route.path.startswith(tuple(exclude)):
+            continue
+        if route.dependant.path_params or any(p.required for p in route.dependant.query_params):
+            continue
+        paths.append(route.path)
+    return paths
+
+
+def route_file(path):
+    """/metrics/moran-i -> metrics/moran-i.json, / -> index.json"""
+    return (path.strip("/") or "index") + ".json"
+
+
+def compress(body, encoding, fast=False):
+    """Maximum compression for bundles written offline; fast=True for responses compressed while serving"""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6 if fast else 9, mtime=0)
+    return brotli.compress(body, quality=5 if fast else 11)
+
+
+def tabular_rows(payload):
+    """Rows of a list-of-records response (top level or under "data"), else None"""
+    rows = payload.get("data") if isinstance(payload, dict) else payload
+    if isinstance(rows, list) and rows and all(isinstance(r, dict) for r in rows):
+        return rows
+    return None
+
+
+def write_parquet(rows, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    try:
+        pq.write_table(pa.Table.from_pylist(rows), path)
+        return True
+    except (pa.ArrowException, TypeError, ValueError):
+        return False
+
+
+def write(out_dir, data_version, results, parquet=True):
+    """
+    results: [(path, status, content_type, body, compute_ms)]. Writes the bundle for
+    `data_version`, then points LATEST at it; returns the manifest
+    """
+    root = os.path.join(out_dir, data_version)
+    routes, failed = [], []
+    for path, status, content_type, body, compute_ms in sorted(results):
+        if status != 200:
+            failed.append({"path": path, "status": status})
+            continue
+        name = route_file(path)
+        target = os.path.join(root, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(body)
+        entry = {"path": path, "file": name, "content_type": content_type, "bytes": len(body),
+                 "sha256": hashlib.sha256(body).hexdigest(), "compute_ms": round(compute_ms, 1), "encodings": {},
+                 "parquet": None}
+        for encoding, suffix in ENCODINGS.items():
+            encoded = compress(body, encoding)
+            with open(target + suffix, "wb") as f:
+                f.write(encoded)
+            entry["encodings"][encoding] = {"file": name + suffix, "bytes": len(encoded)}
+        rows = tabular_rows(json.loads(body)) if parquet and content_type == "application/json" else None
+        if rows and write_parquet(rows, target[:-5] + ".parquet"):
+            entry["parquet"] = name[:-5] + ".parquet"
+        routes.append(entry)
+    manifest = {"data_version": data_version, "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "encodings": list(ENCODINGS), "routes": routes, "failed": failed}
+    with open(os.path.join(root, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    latest = os.path.join(out_dir, "LATEST")
+    with open(latest + ".tmp", "w") as f:
+        f.write(data_version)
+    os.replace(latest + ".tmp", latest)
+    return manifest
+
+
+def load():
+    """Manifest of the bundle LATEST points to, reloaded whenever LATEST changes"""
+    latest = os.path.join(BUNDLE_DIR, "LATEST")
+    try:
+        mtime = os.path.getmtime(latest)
+    except OSError:
+        return None
+    if mtime != _state["mtime"]:
+        with open(latest) as f:
+            root = os.path.join(BUNDLE_DIR, f.read().strip())
+        with open(os.path.join(root, "manifest.json")) as f:
+            manifest = json.load(f)
+        _state.update(mtime=mtime, dir=root, manifest=manifest, routes={r["path"]: r for r in manifest["routes"]})
+    return _state["manifest"]
+
+
+def negotiate(accept_encoding, available):
+    """First of `available` encodings (in preference order) that Accept-Encoding allows, else None"""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()[2:] if params.strip().startswith("q=") else "1"
+        try:
+            accepted[name.strip()] = float(q)
+        except ValueError:
+            continue
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def lookup(path, data_version, accept_encoding=None):
+    """(body, content type, content encoding) for `path` from a bundle of `data_version`, or None"""
+    if not BUNDLE_DIR:
+        return None
+    manifest = load()
+    if manifest is None or manifest["data_version"] != data_version:
+        return None
+    entry = _state["routes"].get(path)
+    if entry is None:
+        return None
+    encoding = negotiate(accept_encoding, list(entry["encodings"]))
+    name = entry["encodings"][encoding]["file"] if encoding else entry["file"]
+    with open(os.path.join(_state["dir"], name), "rb") as f:
+        return f.read(), entry["content_type"], encoding
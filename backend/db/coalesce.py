@@ -0,0 +1,125 @@
+"""
+Single-flight request coalescing and a shared result spool
+Identical GETs (same data version, path and query) that arrive while one of them
+is being computed wait for that computation instead of running their own SQL and
+model pipeline. With UIDAI_SPOOL_DIR set, finished responses are also written to
+a spool directory shared by every worker process. Each computation holds an
+exclusive file lock for its key, so N workers compute a response once and the
+others read it from the spool.
+"""
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): the spool stays off, in-process coalescing still works
+    fcntl = None
+
+SPOOL_DIR = os.environ.get("UIDAI_SPOOL_DIR") or None
+SPOOL_TTL_S = float(os.environ.get("UIDAI_CACHE_TTL_S", "21600"))
+SPOOL = bool(SPOOL_DIR and fcntl)
+# How long a request waits on an identical in-flight one before computing the response itself
+WAIT_S = float(os.environ.get("UIDAI_COALESCE_WAIT_S", "60"))
+
+_flights = {}   # (version, path, query) -> Future of (status, content type, body)
+_lock = threading.Lock()
+counts = {"computed": 0, "coalesced": 0, "fallbacks": 0, "spool_hits": 0, "spool_writes": 0}
+
+
+def join(key):
+    """(future, leader): the leader computes and calls land(); everyone else waits on the future"""
+    with _lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            counts["coalesced"] += 1
+            return flight, False
+        flight = _flights[key] = Future()
+        return flight, True
+
+
+class Abandoned(Exception):
+    """The leader stopped without a result (its client disconnected); waiting requests compute their own"""
+
+
+def land(key, result=None, error=None):
+    """Hand the leader's (status, content type, body) or exception to every waiting request"""
+    with _lock:
+        flight = _flights.pop(key)
+    if error is not None:
+        flight.set_exception(error)
+    else:
+        flight.set_result(result)
+
+
+def spool_path(key):
+    version, path, query = key
+    return os.path.join(SPOOL_DIR, f"{version}-{hashlib.sha1(f'{path}?{query}'.encode()).hexdigest()}")
+
+
+def spool_read(key):
+    """(status, content type, body) from the spool, or None"""
+    path = spool_path(key)
+    try:
+        if time.time() - os.path.getmtime(path) > SPOOL_TTL_S:
+            return None
+        with open(path, "rb") as f:
+            meta = json.loads(f.readline())
+            body = f.read()
+    except (OSError, ValueError):
+        return None
+    counts["spool_hits"] += 1
+    return meta["status"], meta["content_type"], body
+
+
+def spool_lock(key):
+    """Block until this process holds the key's file lock; returns the handle for spool_unlock"""
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    handle = open(spool_path(key) + ".lock", "a")
+    fcntl.flock(handle, fcntl.LOCK_EX)
+    return handle
+
+
+def spool_unlock(handle):
+    fcntl.flock(handle, fcntl.LOCK_UN)
+    handle.close()
+
+
+def spool_write(key, result):
+    """Publish a response atomically, and drop entries of other data versions"""
+    status, content_type, body = result
+    path = spool_path(key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(json.dumps({"status": status, "content_type": content_type}).encode() + b"\n")
+        f.write(body)
+    os.replace(tmp, path)
+    counts["spool_writes"] += 1
+    for stale in glob.glob(os.path.join(SPOOL_DIR, "*-*")):
+        if not os.path.basename(stale).startswith(f"{key[0]}-") and not stale.endswith(".tmp"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def clear_spool():
+    """Drop every spooled response (state behind them changed without a new data version)"""
+    if not SPOOL:
+        return
+    for path in glob.glob(os.path.join(SPOOL_DIR, "*-*")):
+        if not path.endswith((".lock", ".tmp")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def status():
+    with _lock:
+        in_flight = len(_flights)
+    return {**counts, "in_flight": in_flight, "spool_dir": SPOOL_DIR if SPOOL else None}
@@ -0,0 +1,150 @@
+"""
+Vectorized composite index engine (Metrics 26-27)
+Per-district component vectors are pulled from DuckDB once per data version and
+kept as NumPy arrays, together with each normalization of them. A request with
+custom weights is then a single matrix-vector product over every district.
+"""
+import numpy as np
+
+NORMALIZATIONS = ("default", "minmax", "zscore", "percentile")
+
+INDICES = {
+    "health": {
+        "components": ["volume", "freshness", "activity"],
+        "labels": ["Enrollment Volume", "Data Freshness", "Update Activity"],
+        "weights": [0.4, 0.3, 0.3],
+    },
+    "exclusion": {
+        "components": ["deficit", "staleness", "desert"],
+        "labels": ["Enrollment Deficit", "Data Staleness", "Update Deserts"],
+        "weights": [0.4, 0.35, 0.25],
+    },
+}
+
+COMPONENT_SQL = """
+    WITH enroll AS (
+        SELECT district, state, SUM(age_0_5 + age_5_17 + age_18_greater) AS enrolled, COUNT(DISTINCT pincode) AS pincodes
+        FROM enrollment GROUP BY district, state
+    ),
+    fresh AS (
+        SELECT district, state, 1.0 - (AVG(CURRENT_DATE - date)::FLOAT / 365.0) AS fresh_score
+        FROM biometric WHERE date IS NOT NULL GROUP BY district, state
+    ),
+    bio AS (SELECT district, state, COUNT(*) AS bio_updates FROM biometric GROUP BY district, state),
+    demo AS (SELECT district, state, COUNT(*) AS demo_updates FROM demographic GROUP BY district, state),
+    pin_demo AS (
+        -- the enrollment pincodes by their last demographic update (db/activity.py), as /demographic-staleness counts them
+        SELECT e.district, e.state,
+               COUNT(*) FILTER (WHERE a.last_demographic IS NULL OR a.last_demographic < CURRENT_DATE - INTERVAL '24 months')::FLOAT /
+                   NULLIF(COUNT(*), 0) AS stale_ratio,
+               COUNT(*) FILTER (WHERE a.last_demographic >= CURRENT_DATE - INTERVAL '12 months') AS active_pincodes
+        FROM (SELECT DISTINCT district, state, pincode FROM pincode_index WHERE dataset = 'enrollment') e
+        LEFT JOIN pincode_activity a ON e.pincode = a.pincode
+        GROUP BY e.district, e.state
+    )
+    SELECT e.district, e.state, e.enrolled::DOUBLE, e.pincodes, COALESCE(f.fresh_score, 0),
+           COALESCE(b.bio_updates, 0) + COALESCE(d.demo_updates, 0), COALESCE(p.stale_ratio, 0),
+           COALESCE(p.active_pincodes, 0)
+    FROM enroll e
+    LEFT JOIN fresh f ON e.district = f.district AND e.state = f.state
+    LEFT JOIN bio b ON e.district = b.district AND e.state = b.state
+    LEFT JOIN demo d ON e.district = d.district AND e.state = d.state
+    LEFT JOIN pin_demo p ON e.district = p.district AND e.state = p.state
+"""
+
+_cache = {}
+
+
+def load_components(con, data_version=None):
+    """
+    District keys and component matrices for both indices, cached per data version.
+    Component values match the original metric definitions (all in [0, 1]).
+    """
+    key = ("components", data_version)
+    components = _cache.get(key)
+    if components is None:
+        rows = con.execute(COMPONENT_SQL).fetchall()
+        districts = [r[0] for r in rows]
+        states = [r[1] for r in rows]
+        enrolled, pincodes, fresh, updates, stale, active = (
+            np.array([r[i] for r in rows], dtype=float) for i in range(2, 8))
+        max_enrolled = enrolled.max() if len(rows) else 1.0
+        volume = enrolled / max_enrolled
+        freshness = np.clip(fresh, 0, 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            activity = np.where(enrolled > 0, np.minimum(1, updates / enrolled), 0)
+            desert = np.where(pincodes > 0, (pincodes - active) / pincodes, 0)
+        components = {
+            "district": districts,
+            "state": states,
+            "enrolled": enrolled,
+            "health": np.column_stack([volume, freshness, activity]) if rows else np.empty((0, 3)),
+            "exclusion": np.column_stack([np.maximum(0, 1.0 - volume), stale, desert]) if rows else np.empty((0, 3)),
+        }
+        _cache.clear()
+        _cache[key] = components
+    return components
+
+
+def normalize(matrix, scheme):
+    """Column-wise normalization of a (districts, components) matrix"""
+    if scheme == "default" or len(matrix) == 0:
+        return matrix
+    if scheme == "minmax":
+        lo, hi = matrix.min(axis=0), matrix.max(axis=0)
+        return (matrix - lo) / np.where(hi > lo, hi - lo, 1)
+    if scheme == "zscore":
+        sd = matrix.std(axis=0)
+        return (matrix - matrix.mean(axis=0)) / np.where(sd > 0, sd, 1)
+    if scheme == "percentile":
+        from scipy.stats import rankdata
+        return rankdata(matrix, axis=0) / len(matrix)
+    raise ValueError(f"Unknown normalization '{scheme}'. Use one of: {', '.join(NORMALIZATIONS)}")
+
+
+def normalized(con, index, scheme, data_version=None):
+    """Normalized component matrix for `index`, cached alongside the raw components"""
+    components = load_components(con, data_version)
+    key = ("normalized", data_version, index, scheme)
+    matrix = _cache.get(key)
+    if matrix is None:
+        matrix = _cache[key] = normalize(components[index], scheme)
+    return components, matrix
+
+
+def parse_weights(index, weights=None):
+    """Comma-separated weights (rescaled to sum to 1), or the index's defaults"""
+    if weights is None:
+        return np.array(INDICES[index]["weights"])
+    try:
+        w = np.array([float(x) for x in weights.split(",")])
+    except ValueError:
+        raise ValueError(f"weights must be {len(INDICES[index]['components'])} comma-separated numbers")
+    if len(w) != len(INDICES[index]["components"]):
+        raise ValueError(f"Expected {len(INDICES[index]['components'])} weights for "
+                         f"{', '.join(INDICES[index]['components'])}, got {len(w)}")
+    if (w < 0).any() or w.sum() <= 0:
+        raise ValueError("weights must be non-negative and not all zero")
+    return w / w.sum()
+
+
+def describe(index, weights):
+    return " + ".join(f"{label} ({w * 100:g}%)" for label, w in zip(INDICES[index]["labels"], weights))
+
+
+def score(con, index, weights=None, normalization="default", data_version=None):
+    """
+    Index value per district, sorted descending: (components, raw matrix, scores, order, weights).
+    Scores are percentages for [0, 1] schemes and weighted z-scores for `zscore`.
+    """
+    if index not in INDICES:
+        raise ValueError(f"Unknown index '{index}'. Use one of: {', '.join(INDICES)}")
+    if normalization not in NORMALIZATIONS:
+        raise ValueError(f"Unknown normalization '{normalization}'. Use one of: {', '.join(NORMALIZATIONS)}")
+    w = parse_weights(index, weights)
+    components, matrix = normalized(con, index, normalization, data_version)
+    scores = matrix @ w
+    if normalization != "zscore":
+        scores = scores * 100
+    order = np.argsort(-scores, kind="stable")
+    return components, components[index], scores, order, w
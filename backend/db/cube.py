@@ -0,0 +1,130 @@
+"""
+Time-bucketed OLAP cube over the three datasets
+Cuboids: cube_daily   (dataset, state, district, day, age_band) -> value, records
+         cube_monthly (dataset, state, district, month, age_band) -> value, records
+
+`value` is the summed head-count of the age band, `records` the number of raw
+rows that fed it. Every (dataset, state, district, day) also gets an
+age_band = 'all' row holding the band total, so record counts are never
+double counted. Queries are answered from the smallest cuboid that can serve
+them, so temporal metrics cost a cube lookup instead of a raw table scan.
+"""
+
+AGE_BANDS = {
+    "enrollment": ["age_0_5", "age_5_17", "age_18_greater"],
+    "biometric": ["bio_age_5_17", "bio_age_17_"],
+    "demographic": ["demo_age_5_17", "demo_age_17_"],
+}
+
+GRAINS = {
+    "day": "day",
+    "week": "DATE_TRUNC('week', day)",
+    "month": "DATE_TRUNC('month', day)",
+    "quarter": "DATE_TRUNC('quarter', day)",
+    "year": "DATE_TRUNC('year', day)",
+}
+
+# Dimensions that need day resolution and can't be served from cube_monthly
+DAY_DIMENSIONS = {"day_of_week", "day_type"}
+
+DIMENSIONS = {
+    "dataset": "dataset",
+    "state": "state",
+    "district": "district",
+    "age_band": "age_band",
+    "year": "EXTRACT(YEAR FROM day)",
+    "month_of_year": "EXTRACT(MONTH FROM day)",
+    "day_of_week": "EXTRACT(DOW FROM day)",
+    "day_type": "CASE WHEN EXTRACT(DOW FROM day) IN (0, 6) THEN 'weekend' ELSE 'weekday' END",
+}
+
+MEASURES = {
+    "value": "SUM(value)",
+    "records": "SUM(records)",
+    "days": "COUNT(DISTINCT day)",
+}
+
+FILTERS = ("dataset", "state", "district", "age_band")
+
+
+def build(con):
+    """(Re)build both cuboids from the base tables"""
+    parts = []
+    for dataset, bands in AGE_BANDS.items():
+        band_rows = [f"('all', {' + '.join(bands)})"] + [f"('{b}', {b})" for b in bands]
+        parts.append(f"""
+            SELECT '{dataset}' AS dataset, state, district, date AS day,
+                   band.age_band, SUM(band.value)::BIGINT AS value, COUNT(*) AS records
+            FROM {dataset}, (VALUES {', '.join(band_rows)}) AS band(age_band, value)
+            WHERE date IS NOT NULL
+            GROUP BY state, district, date, band.age_band
+        """)
+    con.execute(f"CREATE OR REPLACE TABLE cube_daily AS {' UNION ALL '.join(parts)} ORDER BY dataset, day")
+    con.execute("""
+        CREATE OR REPLACE TABLE cube_monthly AS
+        SELECT dataset, state, district, DATE_TRUNC('month', day)::DATE AS day, age_band,
+               SUM(value)::BIGINT AS value, SUM(records)::BIGINT AS records
+        FROM cube_daily GROUP BY ALL ORDER BY dataset, day
+    """)
+
+
+def build_query(group_by=("period",), grain="month", measures=("value",), filters=None, start=None, end=None):
+    """
+    Compile a cube request into (sql, params).
+    group_by: dimension names, plus "period" for the time bucket at `grain`
+    filters:  {dimension: value} for dataset/state/district/age_band (case-insensitive)
+    start/end: inclusive date bounds on the day
+    """
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain '{grain}'. Use one of: {', '.join(GRAINS)}")
+    for dim in group_by:
+        if dim != "period" and dim not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dim}'. Use one of: period, {', '.join(DIMENSIONS)}")
+    for m in measures:
+        if m not in MEASURES:
+            raise ValueError(f"Unknown measure '{m}'. Use one of: {', '.join(MEASURES)}")
+    for f in filters:
+        if f not in FILTERS:
+            raise ValueError(f"Unknown filter '{f}'. Use one of: {', '.join(FILTERS)}")
+    if not group_by and not measures:
+        raise ValueError("Request at least one dimension or measure")
+
+    needs_days = (grain in ("day", "week") and "period" in group_by) or "days" in measures \
+        or DAY_DIMENSIONS.intersection(group_by) or start is not None or end is not None
+    table = "cube_daily" if needs_days else "cube_monthly"
+
+    where, params = [], []
+    for dim, value in filters.items():
+        where.append(f"LOWER({dim}) = LOWER(?)")
+        params.append(value)
+    # Record counts are carried on every band row; without an explicit band, read the totals
+    if "age_band" not in group_by and "age_band" not in filters:
+        where.append("age_band = 'all'")
+    elif "age_band" in group_by and "age_band" not in filters:
+        where.append("age_band <> 'all'")
+    if start is not None:
+        where.append("day >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("day <= ?")
+        params.append(end)
+
+    select = [f"{GRAINS[grain] if d == 'period' else DIMENSIONS[d]} AS {d}" for d in group_by]
+    select += [f"{MEASURES[m]} AS {m}" for m in measures]
+    sql = f"SELECT {', '.join(select)} FROM {table}"
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+    if group_by:
+        sql += f" GROUP BY {', '.join(str(i + 1) for i in range(len(group_by)))}"
+        sql += f" ORDER BY {', '.join(str(i + 1) for i in range(len(group_by)))}"
+    return sql, params
+
+
+def query(con, group_by=("period",), grain="month", measures=("value",), filters=None, start=None, end=None, limit=None):
+    sql, params = build_query(group_by, grain, measures, filters, start, end)
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    cur = con.execute(sql, params)
+    columns = [c[0] for c in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
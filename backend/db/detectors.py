@@ -0,0 +1,188 @@
+"""
+Streaming anomaly detectors over daily enrollment totals, per pincode and per district
+`detector_state` keeps, per series, Welford moments (n, mean, M2) and EWMA first
+and second moments of every day seen. `detector_window` keeps the last
+WINDOW_DAYS days of values. Both are built at load. db/ingest.py then merges each
+new file into them: Chan's parallel update for the moments, the closed-form
+k-step update for the EWMA. Z-scores of each series' latest day against its own
+history are computed from this state alone, never from the raw tables.
+Days without records are not observations (series are over active days), and
+an ingested file is expected to carry days after the ones already seen.
+"""
+
+LEVELS = ("pincode", "district")
+METHODS = ("welford", "ewma", "rolling")
+WINDOW_DAYS = 28
+EWMA_SPAN = 28
+ALPHA = 2 / (EWMA_SPAN + 1)
+KEY = "level, state, district, pincode"
+KEY_MATCH = " AND ".join(f"s.{k} IS NOT DISTINCT FROM b.{k}" for k in ("level", "state", "district", "pincode"))
+
+TOTAL = "(age_0_5 + age_5_17 + age_18_greater)"
+
+
+def daily_sql(source):
+    """Daily totals of `source` for both levels (district rows have a NULL pincode)"""
+    return f"""
+        SELECT 'pincode' AS level, state, district, pincode, date, SUM({TOTAL})::DOUBLE AS value
+        FROM {source} WHERE date IS NOT NULL GROUP BY ALL
+        UNION ALL
+        SELECT 'district', state, district, NULL::BIGINT, date, SUM({TOTAL})::DOUBLE
+        FROM {source} WHERE date IS NOT NULL GROUP BY ALL
+    """
+
+
+def batch_sql(daily):
+    """
+    Per-series summary of a batch of k ordered days: Welford moments, the EWMA
+    started from the first value (*_first) and the part of the EWMA added on top of
+    (1 - ALPHA)^k * previous EWMA when the series already exists (*_tail)
+    """
+    a = ALPHA
+    return f"""
+        WITH ordered AS (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY {KEY} ORDER BY date) AS i,
+                   COUNT(*) OVER (PARTITION BY {KEY}) AS k
+            FROM ({daily})
+        )
+        SELECT {KEY}, k AS n, AVG(value) AS mean, VAR_POP(value) * k AS m2,
+               SUM(value * CASE WHEN i = 1 THEN POW(1 - {a}, k - 1) ELSE {a} * POW(1 - {a}, k - i) END) AS ewma_first,
+               SUM(value * value * CASE WHEN i = 1 THEN POW(1 - {a}, k - 1) ELSE {a} * POW(1 - {a}, k - i) END) AS ewsq_first,
+               SUM(value * {a} * POW(1 - {a}, k - i)) AS ewma_tail,
+               SUM(value * value * {a} * POW(1 - {a}, k - i)) AS ewsq_tail,
+               MAX(date) AS last_date, ARG_MAX(value, date) AS last_value
+        FROM ordered GROUP BY {KEY}, k
+    """
+
+
+def build(con):
+    """Detector state and rolling window from the full enrollment history"""
+    con.execute(f"""
+        CREATE OR REPLACE TABLE detector_state AS
+        SELECT {KEY}, n, mean, m2, ewma_first AS ewma, ewsq_first AS ewma_sq, last_date, last_value
+        FROM ({batch_sql(daily_sql('enrollment'))})
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE detector_window AS
+        SELECT * FROM ({daily_sql('enrollment')})
+        WHERE date > (SELECT MAX(date) FROM enrollment) - INTERVAL '{WINDOW_DAYS} days'
+    """)
+
+
+def on_ingest(con, dataset, staging, data_version):
+    """Ingestion hook: merge the new file's daily totals into the state and window"""
+    if dataset != "enrollment":
+        return None
+    con.execute(f"CREATE OR REPLACE TEMP TABLE detector_batch AS {batch_sql(daily_sql(staging))}")
+    a = ALPHA
+    updated = con.execute(f"""
+        UPDATE detector_state s SET
+            mean = s.mean + (b.mean - s.mean) * b.n / (s.n + b.n),
+            m2 = s.m2 + b.m2 + POW(b.mean - s.mean, 2) * s.n * b.n / (s.n + b.n),
+            n = s.n + b.n,
+            ewma = POW(1 - {a}, b.n) * s.ewma + b.ewma_tail,
+            ewma_sq = POW(1 - {a}, b.n) * s.ewma_sq + b.ewsq_tail,
+            last_value = CASE WHEN b.last_date >= s.last_date THEN b.last_value ELSE s.last_value END,
+            last_date = GREATEST(s.last_date, b.last_date)
+        FROM detector_batch b WHERE {KEY_MATCH}
+    """).fetchone()[0]
+    added = con.execute(f"""
+        INSERT INTO detector_state
+        SELECT {KEY}, n, mean, m2, ewma_first, ewsq_first, last_date, last_value FROM detector_batch b
+        WHERE NOT EXISTS (SELECT 1 FROM detector_state s WHERE {KEY_MATCH})
+    """).fetchone()[0]
+    con.execute(f"CREATE OR REPLACE TEMP TABLE detector_days AS {daily_sql(staging)}")
+    con.execute(f"""
+        UPDATE detector_window s SET value = s.value + b.value
+        FROM detector_days b WHERE {KEY_MATCH} AND s.date = b.date
+    """)
+    con.execute(f"""
+        INSERT INTO detector_window SELECT * FROM detector_days b
+        WHERE NOT EXISTS (SELECT 1 FROM detector_window s WHERE {KEY_MATCH} AND s.date = b.date)
+    """)
+    con.execute(f"""
+        DELETE FROM detector_window
+        WHERE date <= (SELECT MAX(date) FROM detector_window) - INTERVAL '{WINDOW_DAYS} days'
+    """)
+    con.execute("DROP TABLE detector_batch")
+    con.execute("DROP TABLE detector_days")
+    return {"series_updated": updated, "series_added": added}
+
+
+def latest_sql(level, method, state=None, min_days=7):
+    """
+    (sql, params): each series' latest day scored against its history up to the
+    day before; the latest value is removed from the Welford/EWMA state analytically
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level '{level}'. Use one of: {', '.join(LEVELS)}")
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}'. Use one of: {', '.join(METHODS)}")
+    where, params = ["level = ?"], [level]
+    if state:
+        where.append("LOWER(state) = LOWER(?)")
+        params.append(state)
+    a = ALPHA
+    if method == "welford":
+        base = f"""
+            SELECT state, district, pincode, last_date AS date, last_value AS value, n - 1 AS days,
+                   (n * mean - last_value) / NULLIF(n - 1, 0) AS baseline,
+                   SQRT(GREATEST(m2 - (last_value - (n * mean - last_value) / NULLIF(n - 1, 0)) * (last_value - mean), 0)
+                        / NULLIF(n - 2, 0)) AS sd
+            FROM detector_state WHERE {' AND '.join(where)}
+        """
+    elif method == "ewma":
+        base = f"""
+            SELECT state, district, pincode, date, value, days, baseline,
+                   SQRT(GREATEST(sq - baseline * baseline, 0)) AS sd
+            FROM (SELECT state, district, pincode, last_date AS date, last_value AS value, n - 1 AS days,
+                         (ewma - {a} * last_value) / (1 - {a}) AS baseline,
+                         (ewma_sq - {a} * last_value * last_value) / (1 - {a}) AS sq
+                  FROM detector_state WHERE {' AND '.join(where)})
+        """
+    else:
+        base = f"""
+            SELECT state, district, pincode,
+                   MAX(date) FILTER (WHERE r = 1) AS date, ANY_VALUE(value) FILTER (WHERE r = 1) AS value,
+                   COUNT(*) FILTER (WHERE r > 1) AS days,
+                   AVG(value) FILTER (WHERE r > 1) AS baseline, STDDEV_SAMP(value) FILTER (WHERE r > 1) AS sd
+            FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY {KEY} ORDER BY date DESC) AS r
+                  FROM detector_window WHERE {' AND '.join(where)})
+            GROUP BY state, district, pincode
+        """
+    sql = f"""
+        SELECT state, district, pincode, date, value, baseline, sd, days,
+               CASE WHEN sd > 0 THEN (value - baseline) / sd END AS zscore
+        FROM ({base}) WHERE days >= ?
+    """
+    return sql, params + [min_days]
+
+
+def zscores(con, level="pincode", method="ewma", state=None, min_days=7, limit=100):
+    """Series ranked by |z| of their latest day"""
+    sql, params = latest_sql(level, method, state, min_days)
+    cur = con.execute(f"SELECT * FROM ({sql}) WHERE zscore IS NOT NULL ORDER BY ABS(zscore) DESC LIMIT ?",
+                      params + [limit])
+    return rows(cur)
+
+
+def spikes(con, level="pincode", method="ewma", threshold=3.0, recent_days=7, state=None, min_days=7, limit=100):
+    """Series whose latest day, within the last `recent_days` of data, is `threshold` sigma above normal"""
+    sql, params = latest_sql(level, method, state, min_days)
+    cur = con.execute(f"""
+        SELECT * FROM ({sql})
+        WHERE zscore >= ? AND date > (SELECT MAX(last_date) FROM detector_state) - INTERVAL '{int(recent_days)} days'
+        ORDER BY zscore DESC LIMIT ?
+    """, params + [threshold, limit])
+    return rows(cur)
+
+
+def rows(cur):
+    result = []
+    for r in cur.fetchall():
+        row = {"state": r[0], "district": r[1], "pincode": r[2], "date": str(r[3]), "value": r[4],
+               "baseline": round(r[5], 2), "sd": round(r[6], 2), "days": r[7], "zscore": round(r[8], 2)}
+        if row["pincode"] is None:
+            del row["pincode"]
+        result.append(row)
+    return result
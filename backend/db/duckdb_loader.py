@@ -1,35 +1,128 @@
 from pathlib import Path
+import hashlib
+import os
 import duckdb
+from db import (parquet_store, cube, sampling, forecast, features, detectors, pincode_sets, activity, startup, resources,
+                staging)
 
-def load_data():
-    BASE_DIR = Path(__file__).resolve().parent.parent  # backend/
-    DATA_DIR = BASE_DIR / "data"  # backend/data/
-    
-    con = duckdb.connect("uidai.duckdb")
-    
-    # ---- Enrollment (all parts) ----
-    enrollment_pattern = str(DATA_DIR / "enrollment_*.csv")
-    con.execute(f"""
-        CREATE OR REPLACE TABLE enrollment AS
-        SELECT * FROM read_csv_auto('{enrollment_pattern}')
-    """)
-    
-    # ---- Biometric (all parts) ----
-    biometric_pattern = str(DATA_DIR / "biomterics_*.csv")
-    con.execute(f"""
-        CREATE OR REPLACE TABLE biometric AS
-        SELECT * FROM read_csv_auto('{biometric_pattern}')
-    """)
-    
-    # ---- Demographic (all parts) ----
-    demographic_pattern = str(DATA_DIR / "demographic_*.csv")
-    con.execute(f"""
-        CREATE OR REPLACE TABLE demographic AS
-        SELECT * FROM read_csv_auto('{demographic_pattern}')
-    """)
-    
+BASE_DIR = Path(__file__).resolve().parent.parent  # backend/
+DATA_DIR = Path(os.environ.get("UIDAI_DATA_DIR", BASE_DIR / "data"))  # backend/data/ by default
+
+# "duckdb" keeps everything in uidai.duckdb; "parquet" writes hive-partitioned
+# files (state / year_month) and exposes them to the routes as views
+STORAGE_BACKEND = os.environ.get("UIDAI_STORAGE", "duckdb").lower()
+PARQUET_DIR = Path(os.environ.get("UIDAI_PARQUET_DIR", BASE_DIR / "parquet"))
+
+# table -> (csv pattern, columns)
+DATASETS = {
+    "enrollment": ("enrollment_*.csv",
+                   ["date", "state", "district", "pincode", "age_0_5", "age_5_17", "age_18_greater"]),
+    "biometric": ("biomterics_*.csv",
+                  ["date", "state", "district", "pincode", "bio_age_5_17", "bio_age_17_"]),
+    "demographic": ("demographic_*.csv",
+                    ["date", "state", "district", "pincode", "demo_age_5_17", "demo_age_17_"]),
+}
+
+
+def source_paths():
+    """(dataset, path) of every CSV currently in data/, in load order"""
+    return [(table, path) for table, (pattern, _) in DATASETS.items() for path in sorted(DATA_DIR.glob(pattern))]
+
+
+def loaded_sources(con):
+    """(dataset, file name, size, mtime_ns) of every file loaded into `con`'s database without error"""
+    return con.execute("""
+        SELECT dataset, file, size, mtime_ns FROM loaded_files WHERE error IS NULL ORDER BY dataset, file
+    """).fetchall()
+
+
+def compute_data_version(con):
+    """
+    Fingerprint of the files loaded into `con`'s database (name, size and mtime in `loaded_files`);
+    changes whenever a file is loaded or appended. Files still waiting in data/ don't count
+    """
+    digest = hashlib.sha1(STORAGE_BACKEND.encode())
+    for dataset, name, size, mtime_ns in loaded_sources(con):
+        digest.update(f"{dataset}/{name}:{size}:{mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+
+def get_data_version(con=None):
+    """Version of the data currently loaded, as recorded by load_data()"""
+    con = con or get_connection()
+    row = con.execute("SELECT version FROM data_version").fetchone()
+    return row[0] if row else None
+
+
+def drop_relation(con, name, kind):
+    """Drop `name` if it exists as the given kind ('BASE TABLE' or 'VIEW')"""
+    found = con.execute("""
+        SELECT table_type FROM information_schema.tables WHERE table_schema = 'main' AND table_name = ?
+    """, [name]).fetchone()
+    if found and found[0] == kind:
+        con.execute(f"DROP {'VIEW' if kind == 'VIEW' else 'TABLE'} {name}")
+
+
+@resources.workload("ingestion")
+def load_data(background=False):
+    """
+    (Re)build every table from the source files. With background=True the model-backed
+    tables (forecasts, district features) are built by startup warm-up tasks instead
+    """
+    con = get_connection()
+
+    # every part file is parsed into its own staging table in parallel (db/staging.py), then
+    # the dataset tables are replaced in one transaction
+    stats = staging.stage_files(get_connection, [(table, path, DATASETS[table][1]) for table, path in source_paths()])
+    con.begin()
+    try:
+        for table, (pattern, columns) in DATASETS.items():
+            staged = [s for s in stats if s["dataset"] == table and s["table"]]
+            if not staged:
+                raise ValueError(f"No loadable files for '{table}' ({DATA_DIR / pattern})")
+            if STORAGE_BACKEND == "parquet":
+                parquet_store.export_table(con, table, staging.union_sql(staged), PARQUET_DIR)
+                drop_relation(con, table, "BASE TABLE")
+                parquet_store.attach_view(con, table, columns + ["year_month"], PARQUET_DIR)
+            else:
+                drop_relation(con, table, "VIEW")
+                staging.merge(con, table, staged)
+        staging.create_log(con)
+        staging.record(con, stats, "full")
+        version = compute_data_version(con)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        staging.drop(con, stats)
+
+    cube.build(con)
+    detectors.build(con)
+    pincode_sets.build(con)
+    activity.build(con)
+    sampling.build(con)
+    if not background:
+        forecast.build(con, version)
+        features.build(con, version)
+    con.execute("CREATE OR REPLACE TABLE data_version AS SELECT ? AS version, now() AS loaded_at", [version])
+
+    if STORAGE_BACKEND == "parquet":
+        files = sum(parquet_store.partition_count(t, PARQUET_DIR) for t in DATASETS)
+        print(f"✅ Parquet partitions written to {PARQUET_DIR} ({files} files)")
     print("✅ DuckDB tables created successfully")
+    if background:
+        startup.background("forecast", lambda: forecast.build(get_connection(), version))
+        startup.background("district_features", lambda: features.build(get_connection(), version))
     return con
 
+_database = None
+
+
 def get_connection():
-    return duckdb.connect("uidai.duckdb")
\ No newline at end of file
+    """Cursor on one process-wide database handle, so requests don't reopen the file"""
+    global _database
+    if _database is None:
+        _database = duckdb.connect("uidai.duckdb")
+        resources.configure(_database)
+    return resources.track(_database.cursor())
@@ -0,0 +1,122 @@
+"""
+Per-district feature store
+One wide row per district in `district_features`, rebuilt once per data version:
+enrollment mix, health index and exclusion risk components, biometric staleness,
+child-adult transition, phantom children, seasonality, nearest twin, cluster
+label and national/state rank. Profile and compare pages read single rows from
+it instead of downloading every district-level metric.
+"""
+import numpy as np
+from db import startup
+
+N_CLUSTERS = 5
+CLUSTER_FEATURES = ["health_index", "exclusion_risk", "avg_days_since_update", "transition_rate", "staleness_pct"]
+
+
+def build(con, data_version=None):
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
+    df = con.execute("""
+        WITH enroll AS (
+            SELECT district, state, SUM(age_0_5 + age_5_17 + age_18_greater)::BIGINT AS enrolled,
+                   SUM(age_0_5)::BIGINT AS age_0_5, SUM(age_5_17)::BIGINT AS age_5_17, SUM(age_18_greater)::BIGINT AS age_18_plus,
+                   COUNT(DISTINCT pincode) AS pincodes
+            FROM enrollment GROUP BY district, state
+        ),
+        bio AS (
+            SELECT district, state, COUNT(*) AS bio_updates, SUM(bio_age_5_17)::BIGINT AS bio_5_17, SUM(bio_age_17_)::BIGINT AS bio_17,
+                   AVG(CURRENT_DATE - date) FILTER (WHERE date IS NOT NULL) AS avg_days
+            FROM biometric GROUP BY district, state
+        ),
+        demo AS (SELECT district, state, COUNT(*) AS demo_updates FROM demographic GROUP BY district, state),
+        pin_demo AS (
+            -- the enrollment pincodes by their last demographic update (db/activity.py), as /demographic-staleness counts them
+            SELECT e.district, e.state,
+                   COUNT(*) FILTER (WHERE a.last_demographic IS NULL OR a.last_demographic < CURRENT_DATE - INTERVAL '24 months') AS stale_pincodes,
+                   COUNT(*) FILTER (WHERE a.last_demographic >= CURRENT_DATE - INTERVAL '12 months') AS active_pincodes,
+                   stale_pincodes::DOUBLE / NULLIF(COUNT(*), 0) AS stale_ratio
+            FROM (SELECT DISTINCT district, state, pincode FROM pincode_index WHERE dataset = 'enrollment') e
+            LEFT JOIN pincode_activity a ON e.pincode = a.pincode
+            GROUP BY e.district, e.state
+        ),
+        seasonality AS (
+            SELECT district, state, CASE WHEN MIN(records) > 0 THEN MAX(records)::DOUBLE / MIN(records) END AS seasonality_index
+            FROM (SELECT district, state, EXTRACT(MONTH FROM day) AS month, SUM(records) AS records
+                  FROM cube_monthly WHERE dataset = 'biometric' AND age_band = 'all' GROUP BY ALL)
+            GROUP BY district, state
+        ),
+        joined AS (
+            SELECT e.*, MAX(e.enrolled) OVER () AS max_enrolled,
+                   COALESCE(b.bio_updates, 0) AS bio_updates, COALESCE(d.demo_updates, 0) AS demo_updates,
+                   COALESCE(b.bio_5_17, 0) AS bio_5_17, COALESCE(b.bio_17, 0) AS bio_17, b.avg_days,
+                   COALESCE(p.stale_ratio, 0) AS stale_ratio, COALESCE(p.stale_pincodes, 0) AS stale_pincodes,
+                   COALESCE(p.active_pincodes, 0) AS active_pincodes, s.seasonality_index
+            FROM enroll e
+            LEFT JOIN bio b ON e.district = b.district AND e.state = b.state
+            LEFT JOIN demo d ON e.district = d.district AND e.state = d.state
+            LEFT JOIN pin_demo p ON e.district = p.district AND e.state = p.state
+            LEFT JOIN seasonality s ON e.district = s.district AND e.state = s.state
+        ),
+        scored AS (
+            SELECT *,
+                   GREATEST(0, LEAST(1, COALESCE(1.0 - avg_days::DOUBLE / 365.0, 0))) AS fresh_score,
+                   CASE WHEN enrolled > 0 THEN LEAST(1, (bio_updates + demo_updates)::DOUBLE / enrolled) ELSE 0 END AS update_ratio,
+                   GREATEST(0, 1.0 - enrolled::DOUBLE / max_enrolled) AS deficit,
+                   CASE WHEN pincodes > 0 THEN (pincodes - active_pincodes)::DOUBLE / pincodes ELSE 0 END AS desert_ratio
+            FROM joined
+        )
+        SELECT state, district, enrolled, age_0_5, age_5_17, age_18_plus, pincodes,
+               bio_updates, demo_updates,
+               ROUND(fresh_score * 100, 2) AS freshness_pct,
+               ROUND(update_ratio * 100, 2) AS update_pct,
+               ROUND((0.4 * enrolled::DOUBLE / max_enrolled + 0.3 * fresh_score + 0.3 * update_ratio) * 100, 2) AS health_index,
+               ROUND(deficit * 100, 2) AS deficit_pct,
+               ROUND(stale_ratio * 100, 2) AS stale_ratio_pct,
+               ROUND(desert_ratio * 100, 2) AS desert_pct,
+               ROUND((deficit * 0.4 + stale_ratio * 0.35 + desert_ratio * 0.25) * 100, 2) AS exclusion_risk,
+               ROUND(avg_days, 2) AS avg_days_since_update,
+               ROUND(stale_pincodes::DOUBLE / pincodes * 100, 2) AS staleness_pct,
+               CASE WHEN age_5_17 > 0 THEN ROUND(bio_17::DOUBLE / age_5_17, 4) ELSE 0 END AS transition_rate,
+               age_0_5 - bio_5_17 AS phantom_children,
+               ROUND((age_0_5 - bio_5_17)::DOUBLE / NULLIF(age_0_5, 0) * 100, 2) AS phantom_pct,
+               ROUND(seasonality_index, 2) AS seasonality_index
+        FROM scored
+    """).fetchdf()
+
+    if not df.empty:
+        # Nearest twin by age-mix cosine similarity (same profile as /metrics/district-twins)
+        mix = df[["age_0_5", "age_5_17", "age_18_plus"]].to_numpy(dtype=float)
+        mix = mix / np.maximum(np.linalg.norm(mix, axis=1, keepdims=True), 1e-12)
+        sim = mix @ mix.T
+        np.fill_diagonal(sim, -1)
+        twin = sim.argmax(axis=1)
+        df["twin_district"] = df["district"].to_numpy()[twin]
+        df["twin_state"] = df["state"].to_numpy()[twin]
+        df["twin_similarity"] = np.round(sim[np.arange(len(df)), twin], 4)
+
+        X = StandardScaler().fit_transform(df[CLUSTER_FEATURES].fillna(0).to_numpy(dtype=float))
+        k = min(N_CLUSTERS, len(df))
+        df["cluster"] = KMeans(n_clusters=k, random_state=42, n_init=10).fit_predict(X)
+
+        df["national_rank"] = df["health_index"].rank(ascending=False, method="min").astype(int)
+        df["state_rank"] = df.groupby("state")["health_index"].rank(ascending=False, method="min").astype(int)
+
+    df["data_version"] = data_version
+    con.register("district_features_df", df)
+    con.execute("CREATE OR REPLACE TABLE district_features AS SELECT * FROM district_features_df ORDER BY state, district")
+    con.unregister("district_features_df")
+
+
+def fetch(con, names, state=None):
+    """Feature rows for the given district names (case-insensitive), optionally within one state"""
+    if not names:
+        return []
+    startup.wait("district_features")
+    where = [f"LOWER(district) IN ({', '.join('LOWER(?)' for _ in names)})"]
+    params = list(names)
+    if state:
+        where.append("LOWER(state) = LOWER(?)")
+        params.append(state)
+    cur = con.execute(f"SELECT * FROM district_features WHERE {' AND '.join(where)} ORDER BY national_rank", params)
+    columns = [c[0] for c in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
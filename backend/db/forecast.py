@@ -0,0 +1,141 @@
+"""
+Vectorized multi-series forecasting
+Daily series per (level, state, district) are pulled from cube_daily and fitted
+all at once with one least-squares solve: every series shares the same design
+matrix (intercept, trend, day-of-week dummies and, with two years of history,
+annual Fourier terms), so fitting 800 districts costs one matrix factorisation
+instead of 800 model fits. Forecasts and their standard errors are stored in the
+`forecast` table at load time, once per data version; requests only slice it.
+"""
+from statistics import NormalDist
+import numpy as np
+from db import startup
+
+# (dataset, age_band) series that get forecasts
+TARGETS = [("biometric", "bio_age_17_"), ("biometric", "all"), ("demographic", "all"), ("enrollment", "all")]
+LEVELS = ("national", "state", "district")
+MAX_HORIZON = 90
+FIT_WINDOW_DAYS = 365
+FOURIER_TERMS = 2
+
+
+def design_matrix(t, weekday, annual):
+    """Shared regressors for day offsets `t` with weekday 0-6"""
+    cols = [np.ones_like(t, dtype=float), t.astype(float)]
+    cols += [(weekday == d).astype(float) for d in range(1, 7)]
+    if annual:
+        for k in range(1, FOURIER_TERMS + 1):
+            cols += [np.sin(2 * np.pi * k * t / 365.25), np.cos(2 * np.pi * k * t / 365.25)]
+    return np.column_stack(cols)
+
+
+def fit_predict(Y, start, horizon):
+    """
+    Y: (days, series) matrix of daily values starting at `start` (a date).
+    Returns (future dates, yhat (horizon, series), se (horizon, series), slope per series).
+    """
+    import pandas as pd
+    n_days, n_series = Y.shape
+    days = pd.date_range(start, periods=n_days + horizon, freq="D")
+    t = np.arange(n_days + horizon)
+    X_all = design_matrix(t, days.weekday.values, annual=n_days >= 730)
+    # Too little history for the seasonal model: fall back to level + trend, or level only
+    if n_days < X_all.shape[1] + 2:
+        X_all = X_all[:, :2] if n_days >= 4 else X_all[:, :1]
+    X, X_future = X_all[:n_days], X_all[n_days:]
+
+    beta, _, rank, _ = np.linalg.lstsq(X, Y, rcond=None)
+    resid = Y - X @ beta
+    dof = max(n_days - rank, 1)
+    sigma2 = (resid ** 2).sum(axis=0) / dof
+    leverage = np.einsum("ij,jk,ik->i", X_future, np.linalg.pinv(X.T @ X), X_future)
+    yhat = X_future @ beta
+    se = np.sqrt(sigma2[None, :] * (1 + leverage[:, None]))
+    slope = beta[1] if X.shape[1] > 1 else np.zeros(n_series)
+    return days[n_days:], yhat, se, slope
+
+
+def daily_matrix(con, level, dataset, age_band):
+    """Dense (days, series) matrix over the last FIT_WINDOW_DAYS days, zero-filled"""
+    import pandas as pd
+    keys = {"national": "NULL::VARCHAR, NULL::VARCHAR", "state": "state, NULL::VARCHAR", "district": "state, district"}[level]
+    df = con.execute(f"""
+        WITH bounds AS (SELECT MAX(day) AS last_day FROM cube_daily WHERE dataset = ?)
+        SELECT {keys}, day, SUM(value) AS value
+        FROM cube_daily, bounds
+        WHERE dataset = ? AND age_band = ? AND day > last_day - INTERVAL '{FIT_WINDOW_DAYS} days'
+        GROUP BY ALL
+    """, [dataset, dataset, age_band]).fetchdf()
+    if df.empty:
+        return None, None, None
+    df.columns = ["state", "district", "day", "value"]
+    df["day"] = pd.to_datetime(df["day"])
+    df[["state", "district"]] = df[["state", "district"]].fillna("")
+    wide = df.set_index(["day", "state", "district"])["value"].unstack(["state", "district"])
+    wide = wide.reindex(pd.date_range(wide.index.min(), wide.index.max(), freq="D")).fillna(0)
+    keys = [(s or None, d or None) for s, d in wide.columns]
+    return wide.values.astype(float), wide.index[0], keys
+
+
+def build(con, data_version=None):
+    """Fit every target/level and store MAX_HORIZON days of forecasts in the `forecast` table"""
+    import pandas as pd
+    frames = []
+    for dataset, age_band in TARGETS:
+        for level in LEVELS:
+            Y, start, keys = daily_matrix(con, level, dataset, age_band)
+            if Y is None:
+                continue
+            dates, yhat, se, slope = fit_predict(Y, start, MAX_HORIZON)
+            n_series = len(keys)
+            frames.append(pd.DataFrame({
+                "dataset": dataset,
+                "age_band": age_band,
+                "level": level,
+                "state": np.tile([k[0] for k in keys], MAX_HORIZON),
+                "district": np.tile([k[1] for k in keys], MAX_HORIZON),
+                "step": np.repeat(np.arange(1, MAX_HORIZON + 1), n_series),
+                "date": np.repeat(dates.date, n_series),
+                "yhat": yhat.ravel(),
+                "se": se.ravel(),
+                "slope": np.tile(slope, MAX_HORIZON),
+            }))
+    forecast_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["dataset", "age_band", "level", "state", "district", "step", "date", "yhat", "se", "slope"])
+    forecast_df["data_version"] = data_version
+    con.register("forecast_df", forecast_df)
+    con.execute("CREATE OR REPLACE TABLE forecast AS SELECT * FROM forecast_df ORDER BY dataset, age_band, level, state, district, step")
+    con.unregister("forecast_df")
+
+
+def query(con, level="national", dataset="biometric", age_band="bio_age_17_", state=None, district=None,
+          horizon=7, confidence=0.95):
+    """Forecast rows for the requested series with `confidence` prediction intervals"""
+    startup.wait("forecast")
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level '{level}'. Use one of: {', '.join(LEVELS)}")
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}")
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    z = float(NormalDist().inv_cdf(0.5 + confidence / 2))
+    where = ["dataset = ?", "age_band = ?", "level = ?", "step <= ?"]
+    params = [dataset, age_band, level, horizon]
+    if state:
+        where.append("LOWER(state) = LOWER(?)")
+        params.append(state)
+    if district:
+        where.append("LOWER(district) = LOWER(?)")
+        params.append(district)
+    rows = con.execute(f"""
+        SELECT state, district, date, GREATEST(yhat, 0), GREATEST(yhat - ? * se, 0), GREATEST(yhat + ? * se, 0), slope, data_version
+        FROM forecast WHERE {' AND '.join(where)}
+        ORDER BY state, district, step
+    """, [z, z] + params).fetchall()
+    series = {}
+    for r in rows:
+        s = series.setdefault((r[0], r[1]), {"state": r[0], "district": r[1], "trend_per_day": round(r[6], 3),
+                                             "data_version": r[7], "points": []})
+        s["points"].append({"date": str(r[2]), "predicted": round(r[3], 2),
+                            "lower": round(r[4], 2), "upper": round(r[5], 2)})
+    return list(series.values())
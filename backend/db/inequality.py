@@ -0,0 +1,77 @@
+"""
+Inequality statistics (Gini, Theil, Lorenz curve, quantiles) of per-row enrollment totals
+Computed inside DuckDB with window functions, so no row ever reaches Python.
+National, state and district levels come out of a single scan: each row is
+fanned out to the requested levels and ranked once per (level, state, district).
+"""
+import numpy as np
+
+LEVELS = ("national", "state", "district")
+QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+LORENZ_POINTS = 10
+
+TOTAL = "(age_0_5 + age_5_17 + age_18_greater)"
+
+
+def summary(con, levels=("national",), state=None):
+    """
+    One row per (level, state, district) group with n, total, min, max, gini, theil,
+    quantiles and Lorenz points [(population share, enrollment share), ...].
+    Only positive totals are counted, matching the original pincode Gini metric.
+    """
+    for level in levels:
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level '{level}'. Use one of: {', '.join(LEVELS)}")
+    where, params = [f"{TOTAL} > 0"], []
+    if state:
+        where.append("LOWER(state) = LOWER(?)")
+        params.append(state)
+    level_rows = ", ".join(f"('{lvl}')" for lvl in levels)
+    cur = con.execute(f"""
+        WITH base AS (SELECT state, district, {TOTAL}::DOUBLE AS x FROM enrollment WHERE {' AND '.join(where)}),
+        expanded AS (
+            SELECT l.level,
+                   CASE WHEN l.level <> 'national' THEN b.state END AS state,
+                   CASE WHEN l.level = 'district' THEN b.district END AS district,
+                   b.x
+            FROM base b, (VALUES {level_rows}) AS l(level)
+        ),
+        ranked AS (
+            SELECT level, state, district, x,
+                   ROW_NUMBER() OVER w AS rk,
+                   SUM(x) OVER (w ROWS UNBOUNDED PRECEDING) AS cum,
+                   COUNT(*) OVER g AS n,
+                   SUM(x) OVER g AS s
+            FROM expanded
+            WINDOW g AS (PARTITION BY level, state, district),
+                   w AS (PARTITION BY level, state, district ORDER BY x)
+        )
+        SELECT level, state, district, COUNT(*) AS n, SUM(x) AS total, MIN(x), MAX(x),
+               2 * SUM(rk * x) / (ANY_VALUE(n) * ANY_VALUE(s)) - (ANY_VALUE(n) + 1.0) / ANY_VALUE(n) AS gini,
+               AVG((x * n / s) * LN(x * n / s)) AS theil,
+               QUANTILE_CONT(x, {QUANTILES}) AS quantiles,
+               LIST([rk::DOUBLE / n, cum / s] ORDER BY rk)
+                   FILTER (WHERE FLOOR(rk * {LORENZ_POINTS} / n) > FLOOR((rk - 1) * {LORENZ_POINTS} / n)) AS lorenz
+        FROM ranked
+        GROUP BY level, state, district
+        ORDER BY level, gini DESC
+    """, params)
+    columns = ["level", "state", "district", "n", "total", "min", "max", "gini", "theil", "quantiles", "lorenz"]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+def weighted_gini(values, weights):
+    """Gini coefficient of a weighted sample, values sorted ascending"""
+    cum_w = np.cumsum(weights)
+    cum_x = np.cumsum(weights * values)
+    if cum_x[-1] == 0:
+        return 0.0
+    p = np.concatenate(([0.0], cum_w / cum_w[-1]))
+    lorenz = np.concatenate(([0.0], cum_x / cum_x[-1]))
+    return float(1 - np.sum((p[1:] - p[:-1]) * (lorenz[1:] + lorenz[:-1])))
+
+
+def weighted_quantile(values, weights, q):
+    """Quantile of a weighted sample, values sorted ascending"""
+    cum_w = np.cumsum(weights)
+    return values[min(np.searchsorted(cum_w, q * cum_w[-1]), len(values) - 1)]
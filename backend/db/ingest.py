@@ -0,0 +1,124 @@
+"""
+Append-only ingestion of new source files
+A CSV dropped into data/ (e.g. the next day's enrollment extract) is appended to
+its table without reloading the rest; a batch (a month's backfill) is staged in
+parallel by db/staging.py and appended in one transaction. Modules that keep
+derived state register a hook; hooks receive the new rows as a staging table and
+update in O(new rows). Load-time tables (cube, samples, forecasts, district
+features) are refreshed by the next full load.
+"""
+import fnmatch
+import threading
+import time
+from db import parquet_store, staging
+from db.duckdb_loader import (DATA_DIR, DATASETS, STORAGE_BACKEND, PARQUET_DIR, compute_data_version,
+                              get_connection)
+
+HOOKS = []
+# Held for the whole append transaction; background writers to derived tables take it too
+write_lock = threading.Lock()
+
+
+def register_hook(fn):
+    """fn(con, dataset, staging_table, data_version) -> dict | None, run after new rows are appended"""
+    if fn not in HOOKS:
+        HOOKS.append(fn)
+    return fn
+
+
+def resolve(name):
+    """Path of a file directly inside data/ and the dataset its name belongs to"""
+    path = (DATA_DIR / name).resolve()
+    if path.parent != DATA_DIR.resolve():
+        raise ValueError("Only files directly inside data/ can be ingested")
+    if not path.is_file():
+        raise ValueError(f"File '{name}' not found in data/")
+    for table, (pattern, _) in DATASETS.items():
+        if fnmatch.fnmatch(path.name, pattern):
+            return path, table
+    raise ValueError(f"'{name}' does not match any dataset pattern "
+                     f"({', '.join(p for p, _ in DATASETS.values())})")
+
+
+def pending(pattern):
+    """Names of the files in data/ matching `pattern` that are not loaded yet"""
+    loaded = {r[0] for r in get_connection().execute("SELECT file FROM loaded_files WHERE error IS NULL").fetchall()}
+    return sorted(p.name for p in DATA_DIR.glob(pattern) if p.is_file() and p.name not in loaded)
+
+
+def summary(stats):
+    """What the ingest endpoints report about one staged file"""
+    return {"file": stats["file"], "dataset": stats["dataset"], "size": stats["size"], "rows": stats["rows"],
+            "rejected": stats["rejected"], "parse_ms": stats["parse_ms"], "missing_columns": stats["missing"],
+            "extra_columns": stats["extra"]}
+
+
+def ingest_files(names, con=None):
+    """Append new CSVs from data/ to their tables (staged in parallel, appended in one transaction)"""
+    con = con or get_connection()
+    files = [resolve(name) for name in dict.fromkeys(names)]
+    if not files:
+        raise ValueError("No files to ingest")
+    start = time.perf_counter()
+    with write_lock:
+        for path, _ in files:
+            stat = path.stat()
+            seen = con.execute("SELECT size, mtime_ns FROM loaded_files WHERE file = ? AND error IS NULL",
+                               [path.name]).fetchone()
+            if seen == (stat.st_size, stat.st_mtime_ns):
+                raise ValueError(f"'{path.name}' is already loaded")
+            if seen:
+                raise ValueError(f"'{path.name}' changed since it was loaded; restart to reload it")
+        stats = staging.stage_files(get_connection, [(table, path, DATASETS[table][1]) for path, table in files])
+        failed = [s for s in stats if s["error"]]
+        if failed:
+            staging.drop(con, stats)
+            raise ValueError("; ".join(f"'{s['file']}': {s['error']}" for s in failed))
+        version, hooks = append(con, stats)
+    return {"files": [summary(s) for s in stats], "rows": sum(s["rows"] for s in stats),
+            "rejected": sum(s["rejected"] for s in stats), "data_version": version,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1), "hooks": hooks}
+
+
+def ingest_file(name, con=None):
+    """Append one new CSV from data/ to its table and run the registered hooks"""
+    result = ingest_files([name], con)
+    file = result["files"][0]
+    return {**file, "data_version": result["data_version"], "elapsed_ms": result["elapsed_ms"],
+            "hooks": result["hooks"][file["dataset"]]}
+
+
+def append(con, stats):
+    """
+    Record the staged files, then append them per dataset and run hooks, in one transaction.
+    Returns the new data version (of the files now loaded) and the hooks' results
+    """
+    hooks = {}
+    written = []  # Parquet files are written outside the transaction: deleted again on rollback
+    con.begin()
+    try:
+        staging.record(con, stats, "append")
+        version = compute_data_version(con)
+        for table in DATASETS:
+            staged = [s for s in stats if s["dataset"] == table]
+            if not staged:
+                continue
+            rows = f"staging_{table}"
+            con.execute(f"CREATE OR REPLACE TEMP TABLE {rows} AS {staging.union_sql(staged)}")
+            if STORAGE_BACKEND == "parquet":
+                written += parquet_store.export_table(con, table, f"SELECT * FROM {rows}", PARQUET_DIR, append=True)
+            else:
+                con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM {rows}")
+            hooks[table] = {hook.__module__.split(".")[-1]: hook(con, table, rows, version) for hook in HOOKS}
+        con.execute("UPDATE data_version SET version = ?, loaded_at = now()", [version])
+        con.commit()
+    except Exception:
+        con.rollback()
+        for path in written:
+            path.unlink(missing_ok=True)
+        raise
+    finally:
+        for table in DATASETS:
+            con.execute(f"DROP TABLE IF EXISTS staging_{table}")
+        staging.drop(con, stats)
+    return version, hooks
@@ -0,0 +1,351 @@
+"""
+Asynchronous jobs for long-running analyses
+POST /jobs queues an analysis (clustering, district twins, Moran's I, fraud model
+training) and returns at once. GET /jobs/{id} reports its progress and timing.
+A job type has three steps. prepare(con, params) runs the SQL in the API process,
+which owns the DuckDB handle. compute(inputs, params, progress) runs the model
+work in one of WORKERS worker processes. publish(con, output) runs back in the
+API process and installs the output or turns it into the stored result.
+Finished jobs are kept in the `jobs` table for RETAIN_HOURS and leave memory once
+saved there. A submission with the same type, parameters and data version as a
+queued, running or finished job returns that job instead of running again. A
+running job is cancelled by terminating its worker process, and a fresh one
+replaces it for the next job.
+"""
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from db import resources
+from db.duckdb_loader import get_connection, get_data_version
+
+WORKERS = int(os.environ.get("UIDAI_JOB_WORKERS", "2"))
+RETAIN_HOURS = float(os.environ.get("UIDAI_JOB_RETAIN_HOURS", "168"))
+POLL_S = 0.2
+
+# name -> {"prepare", "compute", "publish", "defaults"}
+TYPES = {}
+FINISHED = ("done", "failed", "cancelled")
+
+_jobs = {}            # id -> job dict of the queued and running jobs
+_by_key = {}          # (type, params json, data version) -> id of the queued/running job
+_queue = queue.Queue()
+_slots = []
+_lock = threading.Lock()
+_table_ready = False
+_context = multiprocessing.get_context("spawn")  # workers never inherit the DuckDB handle or server threads
+
+
+class Cancelled(Exception):
+    """The job was cancelled before its worker finished"""
+
+
+def register(name, prepare, compute, publish=None, defaults=None):
+    """
+    Job type `name`: prepare(con, params) -> inputs in the API process; compute(inputs, params,
+    progress) -> output in a worker (a module-level function, so it pickles by name);
+    publish(con, output) -> JSON-ready result back in the API process (default: output as is)
+    """
+    TYPES[name] = {"prepare": prepare, "compute": compute, "publish": publish, "defaults": defaults or {}}
+
+
+def normalize(name, params):
+    """Parameters of a `name` job with defaults filled in and values cast to the defaults' types"""
+    if name not in TYPES:
+        raise ValueError(f"Unknown job type '{name}' (expected one of {', '.join(TYPES)})")
+    defaults = TYPES[name]["defaults"]
+    unknown = sorted(set(params or {}) - set(defaults))
+    if unknown:
+        raise ValueError(f"Unknown parameters for '{name}': {', '.join(unknown)} "
+                         f"(accepted: {', '.join(defaults) or 'none'})")
+    normalized = dict(defaults)
+    for key, value in (params or {}).items():
+        try:
+            normalized[key] = type(defaults[key])(value) if defaults[key] is not None else value
+        except (TypeError, ValueError):
+            raise ValueError(f"Parameter '{key}' must be {type(defaults[key]).__name__}, got {value!r}")
+    return normalized
+
+
+def run_inline(name, params=None):
+    """Run a job type synchronously in the calling thread, as the plain GET routes do"""
+    spec = TYPES[name]
+    params = normalize(name, params)
+    con = get_connection()
+    output = spec["compute"](spec["prepare"](con, params), params, _ignore_progress)
+    return spec["publish"](con, output) if spec["publish"] else output
+
+
+def _ignore_progress(fraction, stage):
+    pass
+
+
+# ---------------------------------------------------------------- persistence
+
+def _ensure_table(con):
+    """Create `jobs` once; jobs left queued or running by a previous process are marked failed"""
+    global _table_ready
+    if _table_ready:
+        return
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id VARCHAR, type VARCHAR, params VARCHAR, data_version VARCHAR, status VARCHAR,
+            submitted_at TIMESTAMP, started_at TIMESTAMP, finished_at TIMESTAMP, result VARCHAR, error VARCHAR
+        )
+    """)
+    con.execute("UPDATE jobs SET status = 'failed', error = 'Interrupted by a restart', finished_at = now() "
+                "WHERE status IN ('queued', 'running')")
+    _table_ready = True
+
+
+def _save(con, job, result=None):
+    con.execute("DELETE FROM jobs WHERE id = ?", [job["id"]])
+    con.execute("""
+        INSERT INTO jobs VALUES (?, ?, ?, ?, ?, to_timestamp(?), to_timestamp(?), to_timestamp(?), ?, ?)
+    """, [job["id"], job["type"], json.dumps(job["params"], sort_keys=True), job["data_version"], job["status"],
+          job["submitted_at"], job["started_at"], job["finished_at"],
+          json.dumps(result, default=str) if result is not None else None, job["error"]])
+
+
+def _load(con, where, params, limit=None):
+    """Job dicts (with stored results) from the `jobs` table, newest first"""
+    rows = con.execute(f"""
+        SELECT id, type, params, data_version, status, epoch(submitted_at), epoch(started_at), epoch(finished_at),
+               result, error
+        FROM jobs WHERE {where} ORDER BY submitted_at DESC {f'LIMIT {int(limit)}' if limit else ''}
+    """, params).fetchall()
+    return [{"id": r[0], "type": r[1], "params": json.loads(r[2]), "data_version": r[3], "status": r[4],
+             "submitted_at": r[5], "started_at": r[6], "finished_at": r[7], "progress": 1.0 if r[4] == "done" else None,
+             "stage": None, "error": r[9], "result": json.loads(r[8]) if r[8] is not None else None} for r in rows]
+
+
+def _purge(con):
+    con.execute("DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') "
+                "AND finished_at < now() - to_seconds(?)", [RETAIN_HOURS * 3600])
+
+
+# ---------------------------------------------------------------- submission and status
+
+def submit(name, params=None):
+    """(job, created): a new queued job, or the matching queued/running/finished one"""
+    params = normalize(name, params)
+    con = get_connection()
+    version = get_data_version(con)
+    key = (name, json.dumps(params, sort_keys=True), version)
+    with _lock:
+        _ensure_table(con)
+        existing = _by_key.get(key)
+        if existing:
+            return _jobs[existing], False
+        _purge(con)
+        stored = _load(con, "type = ? AND params = ? AND data_version = ? AND status = 'done'", list(key), 1)
+        if stored:
+            return stored[0], False
+        job = {"id": uuid.uuid4().hex[:16], "type": name, "params": params, "data_version": version,
+               "status": "queued", "submitted_at": time.time(), "started_at": None, "finished_at": None,
+               "progress": 0.0, "stage": "queued", "error": None, "result": None, "cancel": False}
+        _jobs[job["id"]] = job
+        _by_key[key] = job["id"]
+        _save(con, job)
+        _start_workers()
+    _queue.put(job["id"])
+    return job, True
+
+
+def get(job_id):
+    """The job with id `job_id` (result included once done), or None"""
+    job = _jobs.get(job_id)
+    if job is not None:
+        return job
+    con = get_connection()
+    with _lock:
+        _ensure_table(con)
+        _purge(con)
+    found = _load(con, "id = ?", [job_id])
+    return found[0] if found else None
+
+
+def recent(limit=50):
+    """Queued and running jobs of this process plus stored ones, newest first (without results)"""
+    con = get_connection()
+    with _lock:
+        _ensure_table(con)
+        _purge(con)
+        live = dict(_jobs)
+    stored = {j["id"]: j for j in _load(con, "TRUE", [], limit)}
+    merged = sorted({**stored, **live}.values(), key=lambda j: j["submitted_at"], reverse=True)[:limit]
+    return [describe(j, result=False) for j in merged]
+
+
+def cancel(job_id):
+    """Cancel a queued or running job; returns the job, or None if there is no such job"""
+    job = get(job_id)
+    if job is None or job["status"] in FINISHED:
+        return job
+    with _lock:
+        job["cancel"] = True
+        if job["status"] == "queued":
+            _finish(job, "cancelled")
+    return job
+
+
+def describe(job, result=True):
+    """JSON view of a job: status, progress, timing in ms and, when asked, its result"""
+    now = time.time()
+    started, finished = job["started_at"], job["finished_at"]
+    view = {"id": job["id"], "type": job["type"], "params": job["params"], "status": job["status"],
+            "progress": round(job["progress"], 3) if job["progress"] is not None else None, "stage": job["stage"],
+            "data_version": job["data_version"],
+            "submitted_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job["submitted_at"])),
+            "queued_ms": round(((started or finished or now) - job["submitted_at"]) * 1000, 1),
+            "run_ms": round(((finished or now) - started) * 1000, 1) if started else None,
+            "error": job["error"]}
+    if result and job["status"] == "done":
+        view["result"] = job["result"]
+    return view
+
+
+def status():
+    with _lock:
+        states = [j["status"] for j in _jobs.values()]
+    return {"workers": WORKERS, "busy": sum(1 for s in _slots if s.job is not None),
+            "queued": states.count("queued"), "running": states.count("running"), "types": list(TYPES)}
+
+
+# ---------------------------------------------------------------- worker processes
+
+def _serve(conn):
+    """Worker process loop: run (compute, inputs, params) requests, streaming progress back"""
+    def progress(fraction, stage):
+        conn.send(("progress", fraction, stage))
+
+    while True:
+        try:
+            compute, inputs, params = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send(("done", compute(inputs, params, progress)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Slot:
+    """One worker process, started on first use and replaced after a cancellation or crash"""
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.job = None
+        self.thread = None
+
+    def run(self, job, inputs):
+        if self.process is None or not self.process.is_alive():
+            self.conn, child = _context.Pipe()
+            self.process = _context.Process(target=_serve, args=(child,), name=f"job-worker-{self.index}",
+                                            daemon=True)
+            self.process.start()
+            child.close()
+        self.conn.send((TYPES[job["type"]]["compute"], inputs, job["params"]))
+        while True:
+            if job["cancel"]:
+                self.stop()
+                raise Cancelled()
+            try:
+                if not self.conn.poll(POLL_S):
+                    continue
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                self.stop()
+                raise RuntimeError("Worker process exited")
+            if message[0] == "progress":
+                # the worker covers 10%..90%; preparing and publishing take the ends
+                job["progress"], job["stage"] = 0.1 + 0.8 * min(max(message[1], 0.0), 1.0), message[2]
+            elif message[0] == "error":
+                raise RuntimeError(message[1])
+            else:
+                return message[1]
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(5)
+        self.process = self.conn = None
+
+
+def _finish(job, state, result=None, error=None):
+    """Record the outcome in `jobs` and drop the job from memory; get() reads it back from the table"""
+    job.update(status=state, finished_at=time.time(), error=error,
+               stage=state, progress=1.0 if state == "done" else job["progress"])
+    job["result"] = result
+    _save(get_connection(), job, result)
+    _jobs.pop(job["id"], None)
+    _by_key.pop((job["type"], json.dumps(job["params"], sort_keys=True), job["data_version"]), None)
+
+
+def _dispatch(slot):
+    """Take queued jobs one at a time and run them on `slot`; a None from the queue stops it"""
+    while True:
+        job_id = _queue.get()
+        if job_id is None:
+            return
+        job = _jobs.get(job_id)
+        with _lock:
+            if job is None or job["status"] != "queued":  # cancelled while queued
+                continue
+            job.update(status="running", started_at=time.time(), stage="preparing")
+            _save(get_connection(), job)
+        spec = TYPES[job["type"]]
+        slot.job = job
+        try:
+            with resources.running("heavy"):
+                inputs = spec["prepare"](get_connection(), job["params"])
+            if job["cancel"]:
+                raise Cancelled()
+            job["progress"], job["stage"] = 0.1, "computing"
+            output = slot.run(job, inputs)
+            job["progress"], job["stage"] = 0.9, "publishing"
+            result = spec["publish"](get_connection(), output) if spec["publish"] else output
+            with _lock:
+                _finish(job, "done", result)
+        except Cancelled:
+            with _lock:
+                _finish(job, "cancelled")
+        except Exception as e:
+            with _lock:
+                _finish(job, "failed", error=str(e) or type(e).__name__)
+        finally:
+            slot.job = None
+
+
+def _start_workers():
+    """Start the dispatcher threads on the first submission (called with _lock held)"""
+    if _slots:
+        return
+    for index in range(WORKERS):
+        slot = _Slot(index)
+        slot.thread = threading.Thread(target=_dispatch, args=(slot,), name=f"jobs-{index}", daemon=True)
+        _slots.append(slot)
+        slot.thread.start()
+
+
+def shutdown(timeout=30):
+    """
+    Cancel queued and running jobs, then stop the dispatchers and worker processes. Waits for
+    a job still in prepare or publish (a thread killed inside a DuckDB query aborts the process)
+    """
+    with _lock:
+        for job in list(_jobs.values()):
+            if job["status"] in ("queued", "running"):
+                job["cancel"] = True
+                if job["status"] == "queued":
+                    _finish(job, "cancelled")
+    for slot in _slots:
+        _queue.put(None)
+    for slot in _slots:
+        slot.thread.join(timeout)
+        slot.stop()
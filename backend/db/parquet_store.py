@@ -0,0 +1,49 @@
+"""
+Hive-partitioned Parquet storage backend
+Layout: <root>/<table>/state=<state>/year_month=<YYYY-MM>/data_*.parquet
+
+Each table is exposed to the routes as a DuckDB view over its partitions, so a
+filter on `state` or `year_month` (including `LOWER(state) = LOWER(?)`) only
+opens the matching files. Rows are sorted by district/pincode/date inside each
+partition so the per-row-group min/max statistics (zone maps) written by DuckDB
+let it skip row groups on pincode and date predicates as well.
+"""
+from pathlib import Path
+
+PARTITION_COLUMNS = ("state", "year_month")
+ROW_GROUP_SIZE = 122880
+
+
+def table_path(root, table):
+    return Path(root) / table
+
+
+def export_table(con, table, source_sql, root, append=False):
+    """
+    Write `source_sql` (must expose state and year_month) as partitioned Parquet.
+    append=True adds new files next to the existing ones instead of replacing the table, and
+    returns the files it added (the caller deletes them if its transaction rolls back)
+    """
+    target = table_path(root, table)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    existing = set(target.rglob("*.parquet")) if append else set()
+    con.execute(f"""
+        COPY (SELECT * FROM ({source_sql}) ORDER BY state, year_month, district, pincode, date)
+        TO '{target}' (FORMAT PARQUET, PARTITION_BY ({', '.join(PARTITION_COLUMNS)}),
+                       {'APPEND' if append else 'OVERWRITE'}, ROW_GROUP_SIZE {ROW_GROUP_SIZE})
+    """)
+    return sorted(set(target.rglob("*.parquet")) - existing) if append else []
+
+
+def attach_view(con, table, columns, root):
+    """(Re)create `table` as a view over its partitions, keeping the original column order"""
+    files = str(table_path(root, table) / "**" / "*.parquet")
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {table} AS
+        SELECT {', '.join(columns)}
+        FROM read_parquet('{files}', hive_partitioning = true)
+    """)
+
+
+def partition_count(table, root):
+    return sum(1 for _ in table_path(root, table).rglob("*.parquet"))
@@ -0,0 +1,101 @@
+"""
+Distinct pincodes known to each dataset, for orphan / coverage checks
+`pincode_index` holds one row per (dataset, pincode, district, state) with its
+record count. It is built at load and merged with each ingested file by
+db/ingest.py, so it never needs another pass over the raw tables. Per data
+version it is pulled into NumPy: a sorted array of distinct pincodes per dataset
+(the set) and the entries themselves. "Pincodes of A missing from B" is then a
+binary-search membership test of A's entries against B's sorted array.
+"""
+import numpy as np
+
+DATASETS = ("enrollment", "biometric", "demographic")
+KEY_MATCH = " AND ".join(f"s.{k} IS NOT DISTINCT FROM b.{k}" for k in ("pincode", "district", "state"))
+# Entries with a NULL pincode never match another dataset (as in the LEFT JOIN they replace)
+NO_PINCODE = -1
+
+
+def index_sql(dataset, source):
+    return f"""
+        SELECT '{dataset}' AS dataset, pincode, district, state, COUNT(*) AS records
+        FROM {source} GROUP BY pincode, district, state
+    """
+
+
+def build(con):
+    """Pincode index of every dataset from the full tables"""
+    con.execute(f"""
+        CREATE OR REPLACE TABLE pincode_index AS
+        {' UNION ALL '.join(index_sql(d, d) for d in DATASETS)}
+    """)
+
+
+def on_ingest(con, dataset, staging, data_version):
+    """Ingestion hook: add the new file's record counts to the index"""
+    if dataset not in DATASETS:
+        return None
+    con.execute(f"CREATE OR REPLACE TEMP TABLE pincode_batch AS {index_sql(dataset, staging)}")
+    new_pincodes = con.execute("""
+        SELECT COUNT(DISTINCT pincode) FROM pincode_batch b
+        WHERE pincode NOT IN (SELECT pincode FROM pincode_index WHERE dataset = ? AND pincode IS NOT NULL)
+    """, [dataset]).fetchone()[0]
+    updated = con.execute(f"""
+        UPDATE pincode_index s SET records = s.records + b.records
+        FROM pincode_batch b WHERE s.dataset = b.dataset AND {KEY_MATCH}
+    """).fetchone()[0]
+    added = con.execute(f"""
+        INSERT INTO pincode_index SELECT * FROM pincode_batch b
+        WHERE NOT EXISTS (SELECT 1 FROM pincode_index s WHERE s.dataset = b.dataset AND {KEY_MATCH})
+    """).fetchone()[0]
+    con.execute("DROP TABLE pincode_batch")
+    return {"entries_updated": updated, "entries_added": added, "new_pincodes": new_pincodes}
+
+
+_cache = {}
+
+
+def load(con, data_version=None):
+    """Per dataset: sorted distinct pincodes and the index entries, cached per data version"""
+    sets = _cache.get(data_version)
+    if sets is None:
+        rows = con.execute("SELECT dataset, pincode, district, state, records FROM pincode_index").fetchall()
+        sets = {}
+        for dataset in DATASETS:
+            entries = [r for r in rows if r[0] == dataset]
+            pincodes = np.array([NO_PINCODE if r[1] is None else r[1] for r in entries], dtype=np.int64)
+            sets[dataset] = {
+                "pincodes": np.unique(pincodes[pincodes != NO_PINCODE]),
+                "entry_pincode": pincodes,
+                "district": [r[2] for r in entries],
+                "state": [r[3] for r in entries],
+                "records": np.array([r[4] for r in entries], dtype=np.int64),
+            }
+        _cache.clear()
+        _cache[data_version] = sets
+    return sets
+
+
+def contains(sorted_set, values):
+    """Boolean mask of `values` found in `sorted_set` (binary search)"""
+    if not len(sorted_set):
+        return np.zeros(len(values), dtype=bool)
+    idx = np.searchsorted(sorted_set, values).clip(max=len(sorted_set) - 1)
+    return sorted_set[idx] == values
+
+
+def missing(con, dataset, against, limit=50, data_version=None):
+    """
+    (entries, pincodes): entries of `dataset` whose pincode is in none of the `against`
+    datasets, by record count, and how many distinct pincodes that is
+    """
+    sets = load(con, data_version)
+    side = sets[dataset]
+    found = np.zeros(len(side["entry_pincode"]), dtype=bool)
+    for other in against:
+        found |= contains(sets[other]["pincodes"], side["entry_pincode"])
+    idx = np.flatnonzero(~found)
+    idx = idx[np.lexsort((side["entry_pincode"][idx], -side["records"][idx]))]
+    entries = [{"pincode": None if side["entry_pincode"][i] == NO_PINCODE else int(side["entry_pincode"][i]),
+                "district": side["district"][i], "state": side["state"][i], "count": int(side["records"][i])}
+               for i in idx[:limit]]
+    return entries, len(np.unique(side["entry_pincode"][idx]))
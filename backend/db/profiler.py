@@ -0,0 +1,290 @@
+"""
+On-demand per-request profiler
+Set UIDAI_PROFILE_TOKEN and send a request with `x-profile-token: <token>` to profile
+that one request. It bypasses the response cache and is recorded as:
+    - a sampling CPU profile of the threads running the route, every INTERVAL_MS, with
+      time inside DuckDB shown as a "[duckdb] <statement>" frame on top of the Python stack
+    - per-statement DuckDB execute and fetch time
+    - allocations made during the request (tracemalloc, top lines by size, and the peak)
+Profiles are written to PROFILE_DIR as speedscope JSON, collapsed stacks (for
+flamegraph.pl / inferno) and a summary, and served by GET /profiles. Without the
+token nothing is installed. A profile is active only while a profiled request
+runs, so other requests pay at most one check of `active`.
+"""
+import contextvars
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # backend/
+
+TOKEN = os.environ.get("UIDAI_PROFILE_TOKEN") or None
+ENABLED = bool(TOKEN)
+HEADER = "x-profile-token"
+INTERVAL_MS = float(os.environ.get("UIDAI_PROFILE_INTERVAL_MS", "2"))
+MEMORY = os.environ.get("UIDAI_PROFILE_MEMORY", "1") != "0"
+PROFILE_DIR = Path(os.environ.get("UIDAI_PROFILE_DIR", BASE_DIR / "profiles"))
+KEEP = int(os.environ.get("UIDAI_PROFILE_KEEP", "50"))
+TOP_ALLOCATIONS = 25
+
+active = 0            # profiled requests in flight; the hooks in db/resources.py check this first
+_session = contextvars.ContextVar("profile_session", default=None)
+_lock = threading.Lock()
+_tracing = 0          # sessions sharing tracemalloc
+
+
+def authorized(token):
+    return ENABLED and token is not None and hmac.compare_digest(token, TOKEN)
+
+
+def requested(headers):
+    """Whether a request asks (with the right token) to be profiled"""
+    return authorized(headers.get(HEADER))
+
+
+class Session:
+    """One profiled request: sampled stacks, DuckDB statement times and allocations"""
+
+    def __init__(self, method, path, query):
+        self.id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        self.method, self.path, self.query = method, path, query
+        self.threads = set()
+        self.in_query = {}      # thread id -> statement label while DuckDB runs it
+        self.stacks = Counter()     # stack -> samples
+        self.stack_ms = Counter()   # stack -> ms since the previous sample (the sampler waits for the GIL)
+        self.statements = {}    # statement -> {"execute_ms", "fetch_ms", "calls"}
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.id}", daemon=True)
+
+    def _sample(self):
+        interval = INTERVAL_MS / 1000
+        me = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            elapsed_ms, last = (now - last) * 1000, now
+            for tid in list(self.threads):
+                frame = frames.get(tid)
+                if frame is None or tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.reverse()
+                statement = self.in_query.get(tid)
+                if statement:
+                    stack.append((f"[duckdb] {statement}", "duckdb", 0))
+                self.stacks[tuple(stack)] += 1
+                self.stack_ms[tuple(stack)] += elapsed_ms
+
+    def record(self, statement, phase, ms):
+        entry = self.statements.setdefault(statement, {"execute_ms": 0.0, "fetch_ms": 0.0, "calls": 0})
+        entry[f"{phase}_ms"] += ms
+        if phase == "execute":
+            entry["calls"] += 1
+
+
+def start(method, path, query):
+    """Begin profiling the current request (call from the middleware, before call_next)"""
+    global active, _tracing
+    session = Session(method, path, query)
+    _session.set(session)
+    with _lock:
+        active += 1
+        if MEMORY:
+            if _tracing == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(1)
+                tracemalloc.reset_peak()
+            _tracing += 1
+    session._sampler.start()
+    return session
+
+
+def attach():
+    """Sample the calling thread for the current request's session; the session or None"""
+    session = _session.get()
+    if session is not None:
+        session.threads.add(threading.get_ident())
+    return session
+
+
+def detach(session):
+    session.threads.discard(threading.get_ident())
+
+
+def instrument(cursor):
+    """A cursor timing each statement for the current request's session (the cursor itself otherwise)"""
+    session = _session.get()
+    return _TimedCursor(cursor, session) if session is not None else cursor
+
+
+class _TimedCursor:
+    """Times execute() and fetch*() per statement and marks the thread as inside DuckDB meanwhile"""
+    FETCHES = ("fetchall", "fetchone", "fetchmany", "fetchdf", "fetch_df", "df", "fetchnumpy", "fetch_arrow_table", "arrow", "pl")
+
+    def __init__(self, cursor, session):
+        self._cursor = cursor
+        self._session = session
+        self._statement = None
+
+    def _timed(self, phase, fn, *args):
+        tid = threading.get_ident()
+        self._session.in_query[tid] = self._statement
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._session.in_query.pop(tid, None)
+            self._session.record(self._statement, phase, (time.perf_counter() - start) * 1000)
+
+    def execute(self, query, parameters=None):
+        self._statement = " ".join(query.split())[:240]
+        args = (query,) if parameters is None else (query, parameters)
+        self._timed("execute", self._cursor.execute, *args)
+        return self
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name in self.FETCHES and self._statement is not None:
+            return lambda *args: self._timed("fetch", attr, *args)
+        return attr
+
+
+def finish(session, status=None):
+    """Stop sampling and write the profile files; returns the summary"""
+    global active, _tracing
+    session._stop.set()
+    session._sampler.join()
+    wall_ms = (time.perf_counter() - session.started) * 1000
+    cpu_ms = (time.process_time() - session.cpu_started) * 1000
+    memory = None
+    with _lock:
+        active -= 1
+        if MEMORY:
+            memory = _allocations()
+            _tracing -= 1
+            if _tracing == 0:
+                tracemalloc.stop()
+    samples = sum(session.stacks.values())
+    summary = {
+        "id": session.id, "method": session.method, "path": session.path, "query": session.query, "status": status,
+        "wall_ms": round(wall_ms, 1), "process_cpu_ms": round(cpu_ms, 1), "interval_ms": INTERVAL_MS,
+        "samples": samples, "sampled_ms": round(sum(session.stack_ms.values()), 1),
+        "duckdb_ms": round(sum(s["execute_ms"] + s["fetch_ms"] for s in session.statements.values()), 1),
+        "statements": sorted(({"sql": sql, "calls": s["calls"], "execute_ms": round(s["execute_ms"], 2),
+                               "fetch_ms": round(s["fetch_ms"], 2)} for sql, s in session.statements.items()),
+                             key=lambda s: -(s["execute_ms"] + s["fetch_ms"])),
+        "memory": memory,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{session.id}.json").write_text(json.dumps(summary, indent=1))
+    (PROFILE_DIR / f"{session.id}.speedscope.json").write_text(json.dumps(speedscope(session)))
+    (PROFILE_DIR / f"{session.id}.collapsed.txt").write_text(collapsed(session))
+    _prune()
+    return summary
+
+
+def _allocations():
+    """Peak traced memory and the lines that allocated the most, since tracing started"""
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")])
+    current, peak = tracemalloc.get_traced_memory()
+    top = snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    return {"traced_kb": round(current / 1024, 1), "peak_kb": round(peak / 1024, 1),
+            "top": [{"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "kb": round(s.size / 1024, 1),
+                     "blocks": s.count} for s in top]}
+
+
+def _label(frame):
+    name, filename, line = frame
+    if filename == "duckdb":
+        return name
+    return f"{name} ({short_path(filename)}:{line})"
+
+
+def short_path(filename):
+    """backend/ files relative to it, library files from their site-packages/stdlib directory"""
+    try:
+        return str(Path(filename).relative_to(BASE_DIR))
+    except ValueError:
+        parts = Path(filename).parts
+        for marker in ("site-packages", "dist-packages"):
+            if marker in parts:
+                return "/".join(parts[parts.index(marker) + 1:])
+        return "/".join(parts[-2:])
+
+
+def collapsed(session):
+    """Brendan Gregg's collapsed-stack format: one `frame;frame;frame count` line per stack"""
+    return "".join(f"{';'.join(_label(f).replace(';', ',') for f in stack)} {count}\n"
+                   for stack, count in session.stacks.most_common())
+
+
+def speedscope(session):
+    """speedscope's sampled-profile file format (https://www.speedscope.app)"""
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, count in session.stacks.most_common():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                name, filename, line = frame
+                frames.append({"name": _label(frame)} if filename == "duckdb" else
+                              {"name": name, "file": short_path(filename), "line": line})
+            ids.append(index[frame])
+        samples.append(ids)
+        weights.append(round(session.stack_ms[stack], 3))
+    return {"$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{session.method} {session.path}{'?' + session.query if session.query else ''}",
+            "exporter": "uidai-profiler", "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{"type": "sampled", "name": session.path, "unit": "milliseconds", "startValue": 0,
+                          "endValue": sum(weights), "samples": samples, "weights": weights}]}
+
+
+def _prune():
+    summaries = sorted((p for p in PROFILE_DIR.glob("*.json") if not p.name.endswith(".speedscope.json")),
+                       key=lambda p: p.stat().st_mtime)
+    for stale in summaries[:-KEEP] if KEEP else []:
+        profile_id = stale.name[:-len(".json")]
+        for suffix in (".json", ".speedscope.json", ".collapsed.txt"):
+            (PROFILE_DIR / f"{profile_id}{suffix}").unlink(missing_ok=True)
+
+
+def listing():
+    """Summaries of the stored profiles, newest first (without statements and allocations)"""
+    if not PROFILE_DIR.exists():
+        return []
+    found = []
+    for path in PROFILE_DIR.glob("*.json"):
+        if path.name.endswith(".speedscope.json"):
+            continue
+        summary = json.loads(path.read_text())
+        found.append({k: summary[k] for k in ("id", "method", "path", "query", "status", "wall_ms", "samples",
+                                              "duckdb_ms", "created_at")})
+    return sorted(found, key=lambda s: s["id"], reverse=True)
+
+
+def path_of(profile_id, kind):
+    """File of one stored profile: kind is "summary", "speedscope" or "collapsed"; None if missing"""
+    suffix = {"summary": ".json", "speedscope": ".speedscope.json", "collapsed": ".collapsed.txt"}[kind]
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = PROFILE_DIR / f"{profile_id}{suffix}"
+    return path if path.is_file() else None
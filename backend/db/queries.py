@@ -0,0 +1,106 @@
+"""
+Query catalog
+Named, parameterized statements shared by the route modules, so one query is
+written (and tuned) once instead of being pasted per route. Each entry has
+sample parameters and plan rules: operators its physical plan must not contain
+(FORBIDDEN everywhere, plus per-entry extras) and operators it must contain.
+check() runs EXPLAIN for every entry and reports rule violations. It is the
+plan regression check behind check_plans.py.
+"""
+import json
+
+# Correlated subqueries are planned as DELIM joins; nested loops / cross products mean a lost join key
+FORBIDDEN = ("DELIM_JOIN", "NESTED_LOOP_JOIN", "BLOCKWISE_NL_JOIN", "CROSS_PRODUCT")
+
+# (pincode, district, state, updates, enrolled) per enrollment pincode entry; update counts
+# come from the pincode index (db/pincode_sets.py) rather than per-row subqueries
+PINCODE_UPDATES = """
+    SELECT e.pincode, e.district, e.state, COALESCE(u.updates, 0) AS updates, e.enrolled
+    FROM (SELECT pincode, district, state, SUM(age_0_5 + age_5_17 + age_18_greater) AS enrolled
+          FROM enrollment GROUP BY pincode, district, state) e
+    LEFT JOIN (SELECT pincode, SUM(records) AS updates FROM pincode_index
+               WHERE dataset IN ('biometric', 'demographic') GROUP BY pincode) u ON u.pincode = e.pincode
+"""
+
+DISTRICT_ENROLLMENT = """
+    SELECT district, state, SUM(age_0_5) AS age_0_5, SUM(age_5_17) AS age_5_17,
+           SUM(age_18_greater) AS age_18_greater, SUM(age_0_5 + age_5_17 + age_18_greater) AS total
+    FROM enrollment GROUP BY district, state
+"""
+
+# name -> {"sql", "sample": parameters used for EXPLAIN, "expect": operators required, "forbid": extra forbidden}
+CATALOG = {
+    "district_enrollment": {
+        "sql": f"SELECT * FROM ({DISTRICT_ENROLLMENT}) ORDER BY state, district",
+        "sample": [], "expect": ("HASH_GROUP_BY",), "forbid": ("HASH_JOIN",),
+    },
+    "district_enrollment_vs_state": {
+        "sql": f"""
+            WITH dist_total AS ({DISTRICT_ENROLLMENT}),
+                 state_avg AS (SELECT state, AVG(total) AS avg_total FROM dist_total GROUP BY state)
+            SELECT d.district, d.state, d.total, s.avg_total,
+                   ABS(d.total - s.avg_total) / NULLIF(s.avg_total, 0) * 100 AS deviation,
+                   CASE WHEN ABS(d.total - s.avg_total) / NULLIF(s.avg_total, 0) <= ? THEN 1 ELSE 0 END AS contiguous
+            FROM dist_total d JOIN state_avg s ON d.state = s.state ORDER BY d.state
+        """,
+        "sample": [0.1], "expect": ("HASH_JOIN",), "forbid": (),
+    },
+    "hot_pincodes": {
+        "sql": f"""
+            SELECT pincode, district, state, updates, enrolled FROM ({PINCODE_UPDATES})
+            WHERE updates > 0 ORDER BY updates DESC, pincode, district, state LIMIT ?
+        """,
+        "sample": [300], "expect": ("HASH_JOIN",), "forbid": (),
+    },
+    "district_update_penalty": {
+        "sql": f"""
+            SELECT district, state, COUNT(*) AS total,
+                   SUM(CASE WHEN updates >= ? THEN 1 ELSE 0 END) AS high_update,
+                   ROUND(SUM(CASE WHEN updates >= ? THEN 1 ELSE 0 END)::FLOAT / COUNT(*) * 100, 2) AS penalty_pct
+            FROM ({PINCODE_UPDATES}) GROUP BY district, state ORDER BY 5 DESC
+        """,
+        "sample": [3, 3], "expect": ("HASH_JOIN",), "forbid": (),
+    },
+}
+
+
+def run(con, name, params=()):
+    """Execute catalog statement `name`; returns the cursor for fetchall()/fetchone()"""
+    return con.execute(CATALOG[name]["sql"], list(params))
+
+
+def plan(con, name, params=None):
+    """Physical plan of `name` as a nested dict (EXPLAIN (FORMAT json))"""
+    entry = CATALOG[name]
+    row = con.execute(f"EXPLAIN (FORMAT json) {entry['sql']}", entry["sample"] if params is None else list(params)).fetchone()
+    return json.loads(row[1])
+
+
+def operators(node):
+    """Every operator name in a plan, depth first"""
+    nodes = node if isinstance(node, list) else [node]
+    found = []
+    for n in nodes:
+        found.append(n["name"])
+        found.extend(operators(n.get("children", [])))
+    return found
+
+
+def explain(con, name):
+    """Plan of `name` as DuckDB's text rendering, for dumping"""
+    entry = CATALOG[name]
+    return con.execute(f"EXPLAIN {entry['sql']}", entry["sample"]).fetchone()[1]
+
+
+def check(con, names=None):
+    """{name: [problems]} for every entry whose plan breaks its rules (empty when all pass)"""
+    problems = {}
+    for name in names or CATALOG:
+        entry = CATALOG[name]
+        ops = operators(plan(con, name))
+        found = [f"forbidden operator {op}" for op in dict.fromkeys(ops)
+                 if any(bad in op for bad in FORBIDDEN + entry["forbid"])]
+        found += [f"missing operator {op}" for op in entry["expect"] if op not in ops]
+        if found:
+            problems[name] = found
+    return problems
@@ -0,0 +1,195 @@
+"""
+DuckDB resource governance
+Database-wide limits are applied when the process opens its handle:
+UIDAI_DB_MEMORY_LIMIT, UIDAI_DB_THREADS, UIDAI_DB_TEMP_DIR (spill directory),
+UIDAI_DB_MAX_TEMP_SIZE and UIDAI_DB_PRESERVE_INSERTION_ORDER. DuckDB only sets these
+per database, not per query (SET preserve_insertion_order on a cursor changes it for
+every cursor), so each workload class is governed at admission instead. A class has
+a number of concurrent slots, a queue wait and a per-request query deadline (running
+queries are interrupted). Routes declare their class
+with @workload("interactive" | "heavy" | "ingestion"); the API admits a route's request
+with admit() on the event loop, so requests queued for a slot don't hold the threads
+that sync routes of every class run on. Any of these settings can be
+overridden with UIDAI_DB_<CLASS>_<SETTING>, e.g. UIDAI_DB_HEAVY_SLOTS=4.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+import duckdb
+from db import profiler
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # backend/
+
+# DuckDB setting -> value; None keeps DuckDB's default
+DATABASE = {
+    "memory_limit": os.environ.get("UIDAI_DB_MEMORY_LIMIT"),
+    "threads": os.environ.get("UIDAI_DB_THREADS"),
+    "temp_directory": os.environ.get("UIDAI_DB_TEMP_DIR", str(BASE_DIR / "duckdb_tmp")),
+    "max_temp_directory_size": os.environ.get("UIDAI_DB_MAX_TEMP_SIZE"),
+    # off lets DuckDB return unordered scans sooner, but staging (db/staging.py) relies on it to
+    # keep each file's row order
+    "preserve_insertion_order": os.environ.get("UIDAI_DB_PRESERVE_INSERTION_ORDER"),
+}
+
+ADMIT_POLL_S = 0.02  # how often a request queued by admit() retries for a slot
+
+# slots: requests of the class running at once; queue_s: how long a request waits for a slot;
+# timeout_s: deadline for the request's queries (None: no deadline)
+DEFAULTS = {
+    "interactive": {"slots": 32, "queue_s": 5.0, "timeout_s": 15.0},
+    "heavy": {"slots": 2, "queue_s": 120.0, "timeout_s": 300.0},
+    "ingestion": {"slots": 1, "queue_s": 600.0, "timeout_s": None},
+}
+
+
+class Overloaded(RuntimeError):
+    """A request found no free slot within its queue wait, or ran past its deadline"""
+
+
+def _setting(name, key, default):
+    """UIDAI_DB_<CLASS>_<KEY> if set (timeout 0 or none: no deadline), else the default"""
+    raw = os.environ.get(f"UIDAI_DB_{name.upper()}_{key.upper()}")
+    if raw is None:
+        return default
+    if key == "timeout_s":
+        return float(raw) if raw.lower() not in ("", "0", "none") else None
+    return int(raw) if key == "slots" else float(raw)
+
+
+PROFILES = {name: {key: _setting(name, key, value) for key, value in profile.items()}
+            for name, profile in DEFAULTS.items()}
+_slots = {name: threading.BoundedSemaphore(p["slots"]) for name, p in PROFILES.items()}
+_current = contextvars.ContextVar("workload", default=None)
+_admitted = contextvars.ContextVar("admitted", default=None)  # class whose slot admit() holds for this request
+_lock = threading.Lock()
+counts = {name: {"admitted": 0, "running": 0, "rejected": 0, "timed_out": 0, "out_of_memory": 0} for name in PROFILES}
+
+
+def configure(database):
+    """Apply the database-wide limits to a freshly opened handle"""
+    for key, value in DATABASE.items():
+        if value is not None:
+            database.execute(f"SET {key} = ?", [int(value) if key == "threads" else value])
+
+
+def track(cursor):
+    """Register a new cursor with the running workload (deadline interrupt)"""
+    run = _current.get()
+    if run is not None:
+        if run["expired"]:
+            raise duckdb.InterruptException("Workload deadline passed before the query started")
+        run["cursors"].append(cursor)
+    if profiler.active:
+        return profiler.instrument(cursor)
+    return cursor
+
+
+def _expire(run):
+    run["expired"] = True
+    for cursor in list(run["cursors"]):
+        cursor.interrupt()
+
+
+def _reject(name):
+    with _lock:
+        counts[name]["rejected"] += 1
+    profile = PROFILES[name]
+    return Overloaded(f"No free '{name}' slot within {profile['queue_s']}s ({profile['slots']} running)")
+
+
+@asynccontextmanager
+async def admit(name):
+    """
+    Take a slot of workload class `name` for a request before it is handed to a thread;
+    running(name) inside the request then uses this slot instead of taking another
+    """
+    deadline = time.monotonic() + PROFILES[name]["queue_s"]
+    while not _slots[name].acquire(blocking=False):
+        if time.monotonic() >= deadline:
+            raise _reject(name)
+        await asyncio.sleep(ADMIT_POLL_S)
+    token = _admitted.set(name)
+    try:
+        yield
+    finally:
+        _admitted.reset(token)
+        _slots[name].release()
+
+
+@contextmanager
+def running(name):
+    """
+    Hold a slot of workload class `name` for the enclosed work. Nested use joins the
+    outer workload, so a heavy route calling an ingestion helper does not queue twice
+    """
+    if _current.get() is not None:
+        yield
+        return
+    profile = PROFILES[name]
+    stats = counts[name]
+    held = _admitted.get() == name
+    if not held and not _slots[name].acquire(timeout=profile["queue_s"]):
+        raise _reject(name)
+    run = {"profile": profile, "cursors": [], "expired": False}
+    token = _current.set(run)
+    timer = None
+    if profile["timeout_s"]:
+        timer = threading.Timer(profile["timeout_s"], _expire, [run])
+        timer.daemon = True
+        timer.start()
+    with _lock:
+        stats["admitted"] += 1
+        stats["running"] += 1
+    session = profiler.attach() if profiler.active else None
+    try:
+        yield
+    except duckdb.InterruptException:
+        if not run["expired"]:
+            raise
+        with _lock:
+            stats["timed_out"] += 1
+        raise Overloaded(f"'{name}' request exceeded its {profile['timeout_s']}s deadline")
+    except duckdb.OutOfMemoryException as e:
+        with _lock:
+            stats["out_of_memory"] += 1
+        raise Overloaded(f"'{name}' request exceeded the database memory limit: {e}")
+    finally:
+        if session:
+            profiler.detach(session)
+        if timer:
+            timer.cancel()
+        _current.reset(token)
+        with _lock:
+            stats["running"] -= 1
+        if not held:
+            _slots[name].release()
+
+
+def workload(name):
+    """Declare the workload class of a route (or any function): it runs inside running(name)"""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown workload class '{name}' (expected one of {', '.join(PROFILES)})")
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with running(name):
+                return fn(*args, **kwargs)
+        wrapper.workload = name
+        return wrapper
+    return decorate
+
+
+def status(con):
+    settings = dict(con.execute("""
+        SELECT name, value FROM duckdb_settings()
+        WHERE name IN ('memory_limit', 'threads', 'temp_directory', 'max_temp_directory_size', 'preserve_insertion_order')
+    """).fetchall())
+    with _lock:
+        classes = {name: {**PROFILES[name], **counts[name]} for name in PROFILES}
+    return {"database": settings, "classes": classes}
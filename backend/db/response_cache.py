@@ -0,0 +1,165 @@
+"""
+Response cache with popularity-driven prewarming
+GET responses are cached per (data version, path, query). Every request is
+counted in memory, together with the cost of computing it. The counts are
+flushed to the `endpoint_stats` table, so popularity survives restarts. When the
+data version changes (startup, /ingest), prewarm() recomputes the hottest
+PREWARM_TOP responses in a small thread pool, within PREWARM_BUDGET_S. Runs as
+the "prewarm" startup task, so /ready only reports ready once the cache is warm.
+Bodies of at least COMPRESS_MIN_BYTES are compressed once, when they are cached,
+and the gzip/brotli bytes are kept next to the plain body, so serving a
+compressed response costs no compression work.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urlencode
+from db import startup, bundle
+from db.duckdb_loader import get_connection, get_data_version
+
+MAX_ENTRIES = int(os.environ.get("UIDAI_CACHE_ENTRIES", "1000"))
+TTL_S = float(os.environ.get("UIDAI_CACHE_TTL_S", "21600"))
+PREWARM_TOP = int(os.environ.get("UIDAI_PREWARM_TOP", "20"))
+PREWARM_WORKERS = int(os.environ.get("UIDAI_PREWARM_WORKERS", "4"))
+PREWARM_BUDGET_S = float(os.environ.get("UIDAI_PREWARM_BUDGET_S", "60"))
+COMPRESS_MIN_BYTES = int(os.environ.get("UIDAI_COMPRESS_MIN_BYTES", "1024"))
+# Live state, not a function of the data version
+NO_CACHE = ("/startup", "/ready", "/cache", "/resources", "/shards", "/jobs", "/profiles", "/ingest", "/api/trends/fraud/model",
+            "/docs", "/redoc", "/openapi.json")
+# Warmed on a first start, before any traffic has been recorded
+SEED = [("/map/states", ""), ("/metrics/aadhaar-health-index", ""), ("/api/trends/summary", "")]
+
+_entries = OrderedDict()   # (version, path, query) -> (stored_at, body, media_type, {encoding: bytes})
+_stats = {}                # (path, query) -> [hits, computes, compute_ms] since the last flush
+_lock = threading.Lock()
+last_prewarm = {}
+_fetch = None
+
+
+def cacheable(method, path):
+    return MAX_ENTRIES > 0 and method == "GET" and not path.startswith(NO_CACHE)
+
+
+def normalize(query):
+    """Query string with parameters in a stable order"""
+    return urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def get(version, path, query):
+    """(body, media type, {encoding: compressed body}) or None"""
+    with _lock:
+        entry = _entries.get((version, path, query))
+        if entry is None or time.time() - entry[0] > TTL_S:
+            return None
+        _entries.move_to_end((version, path, query))
+        return entry[1], entry[2], entry[3]
+
+
+def encode(body):
+    """Compressed variants of a body worth compressing, in bundle.ENCODINGS preference order"""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return {}
+    return {encoding: bundle.compress(body, encoding, fast=True) for encoding in bundle.ENCODINGS}
+
+
+def put(version, path, query, body, media_type):
+    """Cache a response with its compressed variants; returns the variants"""
+    encoded = encode(body)
+    with _lock:
+        stale = [k for k in _entries if k[0] != version]
+        for k in stale:
+            del _entries[k]
+        _entries[(version, path, query)] = (time.time(), body, media_type, encoded)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return encoded
+
+
+def clear():
+    """Drop every cached response (state behind them changed without a new data version)"""
+    with _lock:
+        _entries.clear()
+
+
+def record(path, query, compute_ms=None):
+    """Count one request; compute_ms is set when the response was computed rather than served from cache"""
+    with _lock:
+        s = _stats.setdefault((path, query), [0, 0, 0.0])
+        s[0] += 1
+        if compute_ms is not None:
+            s[1] += 1
+            s[2] += compute_ms
+
+
+def flush(con):
+    """Add the in-memory counts to `endpoint_stats`"""
+    with _lock:
+        rows = [(p, q, h, c, ms) for (p, q), (h, c, ms) in _stats.items()]
+        _stats.clear()
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS endpoint_stats (path VARCHAR, query VARCHAR, hits BIGINT, computes BIGINT,
+                                                   compute_ms DOUBLE, last_seen TIMESTAMP, PRIMARY KEY (path, query))
+    """)
+    if rows:
+        con.executemany("""
+            INSERT INTO endpoint_stats VALUES (?, ?, ?, ?, ?, now())
+            ON CONFLICT DO UPDATE SET hits = hits + excluded.hits, computes = computes + excluded.computes,
+                                      compute_ms = compute_ms + excluded.compute_ms, last_seen = now()
+        """, rows)
+
+
+def hottest(con, limit=PREWARM_TOP):
+    """Most requested (path, query) pairs with their hit count and mean compute cost"""
+    flush(con)
+    return con.execute("""
+        SELECT path, query, hits, compute_ms / NULLIF(computes, 0) AS mean_ms
+        FROM endpoint_stats ORDER BY hits DESC, mean_ms DESC NULLS LAST LIMIT ?
+    """, [limit]).fetchall()
+
+
+def prewarm(con, fetch, version):
+    """
+    Compute the hottest responses for `version` with fetch(path, query) -> status code,
+    PREWARM_WORKERS at a time; whatever has not started after PREWARM_BUDGET_S is dropped
+    """
+    start = time.perf_counter()
+    targets = [(r[0], r[1]) for r in hottest(con)] or SEED
+    todo = [t for t in targets if get(version, *t) is None]
+    warmed, failed = [], []
+    pool = ThreadPoolExecutor(max_workers=PREWARM_WORKERS, thread_name_prefix="prewarm")
+    futures = {pool.submit(fetch, path, query): (path, query) for path, query in todo}
+    done, _ = wait(futures, timeout=PREWARM_BUDGET_S)
+    # Over budget: drop what has not started; requests already running finish on their own
+    pool.shutdown(wait=False, cancel_futures=True)
+    for future in done:
+        (warmed if future.exception() is None and future.result() == 200 else failed).append(futures[future])
+    last_prewarm.update(version=version, targets=len(targets), warmed=len(warmed), already_cached=len(targets) - len(todo),
+                        failed=[f"{p}?{q}" if q else p for p, q in failed], skipped=len(todo) - len(warmed) - len(failed),
+                        elapsed_ms=round((time.perf_counter() - start) * 1000, 1))
+    return last_prewarm
+
+
+def set_fetcher(fn):
+    """fn(path, query) -> status code, a GET through the app that lands in this cache"""
+    global _fetch
+    _fetch = fn
+
+
+def schedule(version=None):
+    """Prewarm the cache for the current data version in the background (startup task 'prewarm')"""
+    if _fetch is None or MAX_ENTRIES <= 0 or PREWARM_TOP <= 0:
+        return
+    version = version or get_data_version()
+    startup.background("prewarm", lambda: prewarm(get_connection(), _fetch, version), required=False)
+
+
+def status():
+    with _lock:
+        size = len(_entries)
+        plain = sum(len(e[1]) for e in _entries.values())
+        stored = sum(len(e[1]) + sum(map(len, e[3].values())) for e in _entries.values())
+    return {"entries": size, "bytes": plain, "bytes_with_encodings": stored, "encodings": list(bundle.ENCODINGS),
+            "compress_min_bytes": COMPRESS_MIN_BYTES, "max_entries": MAX_ENTRIES, "ttl_s": TTL_S, "prewarm_top": PREWARM_TOP,
+            "prewarm_workers": PREWARM_WORKERS, "prewarm_budget_s": PREWARM_BUDGET_S, "last_prewarm": last_prewarm}
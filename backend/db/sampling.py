@@ -0,0 +1,102 @@
+"""
+Stratified samples for approximate ("fast preview") queries
+Tables: enrollment_sample    bottom-k hash sample of enrollment rows, k per state
+        enrollment_strata    per-state row counts, sample sizes and HLL distinct counts
+        enrollment_extremes  per-district and national top/bottom rows, the candidates for outlier lists
+
+The sample is keyed on hash(pincode, date), so it is a uniform sample without
+replacement inside each state, is reproducible across reloads and only changes
+where rows change. Sample size per state is capped, so approximate queries cost
+the same no matter how much history sits behind them.
+"""
+import os
+import numpy as np
+
+SAMPLE_PER_STATE = int(os.environ.get("UIDAI_SAMPLE_PER_STATE", 2000))
+EXTREMES_PER_DISTRICT = 10
+EXTREMES_NATIONAL = 100
+Z_95 = 1.96
+# Relative standard error of DuckDB's approx_count_distinct (HyperLogLog, 64 registers)
+HLL_RSE = 1.04 / np.sqrt(64)
+
+TOTAL = "(age_0_5 + age_5_17 + age_18_greater)"
+
+
+def build(con):
+    con.execute(f"""
+        CREATE OR REPLACE TABLE enrollment_sample AS
+        SELECT date, state, district, pincode, {TOTAL} AS total
+        FROM enrollment
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY state ORDER BY hash(pincode, date)) <= {SAMPLE_PER_STATE}
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE enrollment_strata AS
+        SELECT e.state, e.rows, s.sampled, e.enrolled, e.districts, e.pincodes_hll
+        FROM (SELECT state, COUNT(*) AS rows, SUM({TOTAL}) AS enrolled, COUNT(DISTINCT district) AS districts,
+                     approx_count_distinct(pincode) AS pincodes_hll
+              FROM enrollment GROUP BY state) e
+        JOIN (SELECT state, COUNT(*) AS sampled FROM enrollment_sample GROUP BY state) s ON e.state = s.state
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE enrollment_extremes AS
+        SELECT pincode, district, state, {TOTAL} AS total
+        FROM enrollment
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY district, state ORDER BY {TOTAL} DESC) <= {EXTREMES_PER_DISTRICT}
+             OR ROW_NUMBER() OVER (PARTITION BY district, state ORDER BY {TOTAL} ASC) <= {EXTREMES_PER_DISTRICT}
+             OR ROW_NUMBER() OVER (ORDER BY {TOTAL} DESC) <= {EXTREMES_NATIONAL}
+             OR ROW_NUMBER() OVER (ORDER BY {TOTAL} ASC) <= {EXTREMES_NATIONAL}
+    """)
+
+
+def interval(estimate, se, digits=2):
+    """95% normal-approximation confidence interval"""
+    if estimate is None or se is None:
+        return None
+    return [round(float(estimate - Z_95 * se), digits), round(float(estimate + Z_95 * se), digits)]
+
+
+def mean_se(std, n, population):
+    """Standard error of a sample mean with finite population correction"""
+    if std is None or not n or n < 2:
+        return None
+    fpc = max(0.0, 1 - n / population) if population else 1.0
+    return std / np.sqrt(n) * np.sqrt(fpc)
+
+
+def stddev_se(std, n):
+    """Large-sample standard error of a sample standard deviation"""
+    if std is None or not n or n < 2:
+        return None
+    return std / np.sqrt(2 * (n - 1))
+
+
+def stratified_mean(con):
+    """Population mean of row totals and its standard error from the stratified sample"""
+    rows = con.execute("""
+        SELECT t.rows, t.sampled, AVG(s.total), STDDEV(s.total)
+        FROM enrollment_sample s JOIN enrollment_strata t ON s.state = t.state
+        GROUP BY t.state, t.rows, t.sampled
+    """).fetchall()
+    population = sum(r[0] for r in rows)
+    if not population:
+        return None, None, 0
+    mean = sum(r[0] * r[2] for r in rows) / population
+    var = sum((r[0] / population) ** 2 * (mean_se(r[3], r[1], r[0]) or 0) ** 2 for r in rows)
+    return mean, float(np.sqrt(var)), sum(r[1] for r in rows)
+
+
+def weighted_sample(con):
+    """Sample totals with their inverse-inclusion weights and stratum labels"""
+    return con.execute("""
+        SELECT s.total, t.rows::DOUBLE / t.sampled AS weight, s.state
+        FROM enrollment_sample s JOIN enrollment_strata t ON s.state = t.state
+        WHERE s.total > 0
+        ORDER BY s.total
+    """).fetchnumpy()
+
+
+def replicate_se(values, weights, statistic, groups=20):
+    """Random-groups standard error: the spread of `statistic` over disjoint replicate sub-samples"""
+    labels = np.random.default_rng(42).integers(0, groups, len(values))
+    reps = [statistic(values[labels == g], weights[labels == g]) for g in range(groups) if (labels == g).sum() > 1]
+    return float(np.std(reps, ddof=1) / np.sqrt(len(reps))) if len(reps) > 1 else None
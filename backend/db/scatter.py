@@ -0,0 +1,252 @@
+"""
+Scatter-gather over state-partitioned shard workers
+A shard worker (shard_worker.py) loads only its share of the states and answers
+partial aggregates over a line-delimited JSON socket protocol. With
+UIDAI_SHARDS=host:port,... set, the coordinator (this API) sends the same partial
+request to every shard in parallel and merges the answers:
+    count, sum, min, max  combine directly
+    moments               Welford (n, mean, M2) triples, merged with Chan's formula (AVG, STDDEV)
+    distinct              exact count plus a HyperLogLog sketch (2^HLL_P registers); a group
+                          answered by a single shard keeps its exact count, a group split over
+                          shards gets the estimate of the merged sketch
+The merge does not assume each state lives on one shard, so shards can also be
+cut by time or file. Workers on other nodes just need a reachable address and the
+same data/ directory (and UIDAI_STORAGE), since every partial request carries the
+coordinator's data version and the files behind it: a shard on another version (after
+an /ingest append) reloads exactly those files, and refuses if it can't reproduce the
+version from them.
+"""
+import base64
+import json
+import math
+import os
+import socket
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+SHARDS = [s.strip() for s in os.environ.get("UIDAI_SHARDS", "").split(",") if s.strip()]
+ENABLED = bool(SHARDS)
+TIMEOUT_S = float(os.environ.get("UIDAI_SHARD_TIMEOUT_S", "60"))
+HLL_P = 12
+HLL_M = 1 << HLL_P
+
+TOTAL = "(age_0_5 + age_5_17 + age_18_greater)"
+
+# name -> source table, group keys, value expression, aggregates over it and distinct-count columns
+PARTIALS = {
+    "state_enrollment": {"table": "enrollment", "keys": ["state"], "value": TOTAL,
+                         "aggs": ["count", "sum", "min", "max", "moments"], "distinct": ["district", "pincode"]},
+    "district_enrollment": {"table": "enrollment", "keys": ["state", "district"], "value": TOTAL,
+                            "aggs": ["count", "sum"], "distinct": []},
+}
+
+_AGG_SQL = {"count": "COUNT(*)", "sum": "SUM({v})", "min": "MIN({v})", "max": "MAX({v})",
+            "moments": "COUNT({v}), AVG({v}), VAR_POP({v}) * COUNT({v})"}
+
+
+class ShardError(RuntimeError):
+    """A shard could not be reached or answered with an error"""
+
+
+# ---------------------------------------------------------------- HyperLogLog
+
+def hll_registers(hashes):
+    """Dense HLL registers from 64-bit hashes: top HLL_P bits pick the register, the rest give the rank"""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    registers = np.zeros(HLL_M, dtype=np.uint8)
+    if len(hashes):
+        idx = (hashes >> np.uint64(64 - HLL_P)).astype(np.int64)
+        rest = (hashes & np.uint64((1 << (64 - HLL_P)) - 1)).astype(np.float64)  # < 2^52: exact in a double
+        rank = (64 - HLL_P + 1 - np.frexp(rest)[1]).astype(np.uint8)          # leading zeros + 1
+        np.maximum.at(registers, idx, rank)
+    return registers
+
+
+def hll_estimate(registers):
+    """Cardinality estimate with the small-range (linear counting) correction"""
+    alpha = 0.7213 / (1 + 1.079 / HLL_M)
+    estimate = alpha * HLL_M ** 2 / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * HLL_M and zeros:
+        estimate = HLL_M * math.log(HLL_M / zeros)
+    return int(round(estimate))
+
+
+# ---------------------------------------------------------------- shard side
+
+def compute(con, name):
+    """Partial aggregates of `name` over the local tables: [[*keys, *partials]] (JSON-ready)"""
+    spec = PARTIALS[name]
+    keys = ", ".join(spec["keys"])
+    aggs = ", ".join(_AGG_SQL[a].format(v=spec["value"]) for a in spec["aggs"])
+    rows = {tuple(r[:len(spec["keys"])]): list(r) for r in con.execute(
+        f"SELECT {keys}, {aggs} FROM {spec['table']} GROUP BY {keys}").fetchall()}
+    for column in spec["distinct"]:
+        # numpy groups the per-key hashes; DuckDB's hash() is stable across processes of one version
+        data = con.execute(f"""
+            SELECT {keys}, list(hash({column})) AS hashes, COUNT(*) AS exact
+            FROM (SELECT DISTINCT {keys}, {column} FROM {spec['table']} WHERE {column} IS NOT NULL) GROUP BY {keys}
+        """).fetchall()
+        found = {tuple(r[:len(spec["keys"])]): r for r in data}
+        for key, row in rows.items():
+            hit = found.get(key)
+            registers = hll_registers(hit[-2] if hit else [])
+            row.append({"exact": hit[-1] if hit else 0, "hll": base64.b64encode(registers.tobytes()).decode()})
+    return list(rows.values())
+
+
+def serve(con_factory, host, port, info, ensure_version):
+    """
+    Answer partial requests on host:port until interrupted. con_factory() gives a cursor per
+    request, info() the shard's description; ensure_version(version, files) runs before each
+    partial and raises if the shard can't answer for the coordinator's data version
+    """
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                request = json.loads(line)
+                try:
+                    if request.get("partial") in PARTIALS:
+                        ensure_version(request.get("version"), request.get("files"))
+                        reply = {"rows": compute(con_factory(), request["partial"])}
+                    elif request.get("op") == "info":
+                        reply = info()
+                    else:
+                        reply = {"error": f"Unknown request {request}"}
+                except Exception as e:
+                    reply = {"error": f"{type(e).__name__}: {e}"}
+                self.wfile.write(json.dumps(reply, default=str).encode() + b"\n")
+                self.wfile.flush()
+
+    class Server(socketserver.ThreadingTCPServer):
+        allow_reuse_address = True
+        daemon_threads = True
+
+    with Server((host, port), Handler) as server:
+        server.serve_forever()
+
+
+# ---------------------------------------------------------------- coordinator side
+
+_local = threading.local()
+
+
+def _request(address, payload):
+    """One request/response on a kept-alive connection to `address` (per calling thread)"""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    for attempt in range(2):
+        stream = connections.get(address)
+        try:
+            if stream is None:
+                host, port = address.rsplit(":", 1)
+                stream = socket.create_connection((host, int(port)), timeout=TIMEOUT_S).makefile("rwb")
+                connections[address] = stream
+            stream.write(json.dumps(payload).encode() + b"\n")
+            stream.flush()
+            line = stream.readline()
+            if not line:
+                raise ConnectionError("connection closed")
+            reply = json.loads(line)
+            break
+        except (OSError, ValueError) as e:
+            connections.pop(address, None)
+            if attempt:
+                raise ShardError(f"Shard {address} unreachable: {e}")
+    if "error" in reply:
+        raise ShardError(f"Shard {address}: {reply['error']}")
+    return reply
+
+
+_pool = ThreadPoolExecutor(max_workers=max(4, 2 * len(SHARDS)), thread_name_prefix="scatter")
+
+
+def scatter(payload):
+    """Send `payload` to every shard at once; replies in shard order"""
+    return list(_pool.map(lambda address: _request(address, payload), SHARDS))
+
+
+def merge(name, partials):
+    """
+    {key tuple: {"count", "sum", "min", "max", "avg", "stddev", "<distinct column>", "shards"}}
+    from every shard's partial rows
+    """
+    spec = PARTIALS[name]
+    n_keys = len(spec["keys"])
+    merged = {}
+    for rows in partials:
+        for row in rows:
+            key, values = tuple(row[:n_keys]), row[n_keys:]
+            state = merged.setdefault(key, {"shards": 0, "count": 0, "sum": None, "min": None, "max": None,
+                                            "moments": (0, 0.0, 0.0), "distinct": {}})
+            state["shards"] += 1
+            i = 0
+            for agg in spec["aggs"]:
+                if agg == "moments":
+                    n, mean, m2 = values[i], values[i + 1], values[i + 2]
+                    i += 3
+                    if n:
+                        na, mean_a, m2_a = state["moments"]
+                        total = na + n
+                        delta = mean - mean_a
+                        state["moments"] = (total, mean_a + delta * n / total, m2_a + m2 + delta ** 2 * na * n / total)
+                    continue
+                value = values[i]
+                i += 1
+                if agg == "count":
+                    state["count"] += value
+                elif value is not None:
+                    previous = state[agg]
+                    state[agg] = value if previous is None else (
+                        previous + value if agg == "sum" else min(previous, value) if agg == "min" else max(previous, value))
+            for column, sketch in zip(spec["distinct"], values[i:]):
+                registers = np.frombuffer(base64.b64decode(sketch["hll"]), dtype=np.uint8)
+                seen = state["distinct"].get(column)
+                state["distinct"][column] = (sketch["exact"], registers) if seen is None else \
+                    (None, np.maximum(seen[1], registers))
+    result = {}
+    for key, state in merged.items():
+        n, mean, m2 = state["moments"]
+        out = {"shards": state["shards"], "count": state["count"], "sum": state["sum"], "min": state["min"],
+               "max": state["max"], "avg": mean if n else None,
+               "stddev": math.sqrt(m2 / (n - 1)) if n > 1 else None}
+        for column, (exact, registers) in state["distinct"].items():
+            out[column] = exact if exact is not None else hll_estimate(registers)
+            out[f"{column}_exact"] = exact is not None
+        result[key] = out
+    return result
+
+
+def sql_round(value, digits):
+    """ROUND() as DuckDB does it (half away from zero), for values finalized outside SQL"""
+    if value is None:
+        return None
+    scale = 10 ** digits
+    return math.copysign(math.floor(abs(value) * scale + 0.5) / scale, value)
+
+
+def gather(name):
+    """Merged partial aggregates of `name` from every shard, for the data version (and files) this API has loaded"""
+    from db.duckdb_loader import get_connection, get_data_version, loaded_sources
+    con = get_connection()
+    request = {"partial": name, "version": get_data_version(con), "files": loaded_sources(con)}
+    return merge(name, [reply["rows"] for reply in scatter(request)])
+
+
+def status():
+    if not ENABLED:
+        return {"enabled": False, "shards": []}
+    from db.duckdb_loader import get_data_version
+    version = get_data_version()
+    shards = []
+    for address in SHARDS:
+        try:
+            info = _request(address, {"op": "info"})
+            shards.append({"address": address, **info, "current": info.get("data_version") == version})
+        except ShardError as e:
+            shards.append({"address": address, "error": str(e)})
+    return {"enabled": True, "shards": shards}
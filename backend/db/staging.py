@@ -0,0 +1,227 @@
+"""
+Parallel staging of source CSV part files
+Every file is parsed on its own cursor by a pool of UIDAI_INGEST_WORKERS threads
+(default: one per core; DuckDB releases the GIL while it reads) into its own table
+in the `staging` schema, so a backfill of hundreds of files keeps every core busy.
+Columns are matched to the dataset's columns by name, case, surrounding spaces and
+space/hyphen-vs-underscore ignored, whatever their order in the file:
+    - a missing count column is loaded as 0, so row totals (age_0_5 + age_5_17 + ...)
+      stay defined; a missing date/state/district/pincode fails the file
+    - columns the dataset doesn't have are dropped
+and both are reported as drift. Rows with a blank key, a date, pincode or count that
+doesn't parse, or a malformed CSV line are rejected; the first REJECT_SAMPLES of each
+file are kept with their reason. Callers merge the staged tables into the dataset tables
+in one transaction (duckdb_loader.load_data, ingest.ingest_files) and drop them.
+"""
+import contextvars
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+WORKERS = int(os.environ.get("UIDAI_INGEST_WORKERS", os.cpu_count() or 4))
+REJECT_SAMPLES = 20
+SCHEMA = "staging"
+KEYS = ["date", "state", "district", "pincode"]
+TYPES = {"date": "DATE", "state": "VARCHAR", "district": "VARCHAR"}  # every other column is a BIGINT count
+DATE_FORMAT = "%d-%m-%Y"
+
+
+def normalize(name):
+    return re.sub(r"[\s-]+", "_", name.strip().lower())
+
+
+def reconcile(header, columns):
+    """Source column for each dataset column (None if missing) and the file's extra columns"""
+    by_name = {}
+    for source in header:
+        by_name.setdefault(normalize(source), source)
+    mapping = {c: by_name.get(normalize(c)) for c in columns}
+    extra = [s for s in header if normalize(s) not in {normalize(c) for c in columns}]
+    return mapping, extra
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _parsed(column, source):
+    """SQL for one dataset column from its VARCHAR source column (0 for a count the file lacks)"""
+    kind = TYPES.get(column, "BIGINT")
+    if source is None:
+        return f"0::{kind}"
+    if kind == "DATE":
+        return f"COALESCE(try_strptime({source}, '{DATE_FORMAT}')::DATE, TRY_CAST({source} AS DATE))"
+    return f"TRY_CAST({source} AS {kind})"
+
+
+def stage_file(connect, dataset, path, columns, table):
+    """Parse one CSV into staging.<table>; returns its stats (rows, rejects, drift, parse time)"""
+    stat = path.stat()
+    stats = {"dataset": dataset, "file": path.name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+             "rows": 0, "rejected": 0, "parse_ms": 0.0, "missing": [], "extra": [], "error": None,
+             "table": None, "samples": []}
+    start = time.perf_counter()
+    con = None
+    try:
+        con = connect()
+        raw = f"raw_{table}"
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE {raw} AS
+            SELECT row_number() OVER () AS _row, *
+            FROM read_csv('{path}', header = true, delim = ',', quote = '"', all_varchar = true, ignore_errors = true,
+                          store_rejects = true, rejects_table = 'rejects_{table}', rejects_scan = 'scan_{table}')
+        """)
+        header = [r[0] for r in con.execute(f"DESCRIBE {raw}").fetchall()][1:]
+        mapping, stats["extra"] = reconcile(header, columns)
+        stats["missing"] = [c for c, source in mapping.items() if source is None]
+        missing_keys = [c for c in KEYS if mapping[c] is None]
+        if missing_keys:
+            raise ValueError(f"no {', '.join(missing_keys)} column")
+        sources = {c: _quote(s) for c, s in mapping.items() if s is not None}
+        parsed = {c: _parsed(c, sources.get(c)) for c in columns}
+        reasons = [f"WHEN {sources[c]} IS NULL THEN 'no {c}'" for c in KEYS]
+        reasons += [f"WHEN {s} IS NOT NULL AND {parsed[c]} IS NULL THEN 'unparseable {c}'" for c, s in sources.items()]
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE checked_{table} AS
+            SELECT {', '.join(f'{parsed[c]} AS {c}' for c in columns)},
+                   CASE {' '.join(reasons)} END AS _reason, _row,
+                   array_to_string([{', '.join(f"coalesce({_quote(h)}, '')" for h in header)}], ',') AS _record
+            FROM {raw}
+        """)
+        con.execute(f"""
+            CREATE OR REPLACE TABLE {SCHEMA}.{table} AS
+            SELECT {', '.join(columns)}, strftime(date, '%Y-%m') AS year_month
+            FROM checked_{table} WHERE _reason IS NULL ORDER BY _row
+        """)
+        stats["table"] = f"{SCHEMA}.{table}"
+        stats["rows"] = con.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{table}").fetchone()[0]
+        # parse rejects carry their row among the parsed rows; malformed lines only their text
+        rejects = f"""
+            SELECT _row AS row, _reason AS reason, _record AS record FROM checked_{table} WHERE _reason IS NOT NULL
+            UNION ALL
+            SELECT NULL, 'malformed line: ' || any_value(error_type), trim(any_value(csv_line), chr(10) || chr(13)) FROM rejects_{table} GROUP BY line
+        """
+        stats["rejected"] = con.execute(f"SELECT COUNT(*) FROM ({rejects})").fetchone()[0]
+        stats["samples"] = con.execute(f"SELECT * FROM ({rejects}) ORDER BY row NULLS LAST LIMIT {REJECT_SAMPLES}").fetchall()
+    except Exception as e:  # the file is reported, the rest of the batch still loads
+        stats["error"] = str(e).splitlines()[0] if str(e) else type(e).__name__
+    finally:
+        for temp in (f"raw_{table}", f"checked_{table}", f"rejects_{table}", f"scan_{table}"):
+            if con is not None:
+                con.execute(f"DROP TABLE IF EXISTS {temp}")
+    stats["parse_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return stats
+
+
+def stage_files(connect, files):
+    """
+    Stage [(dataset, path, columns)] in parallel; `connect()` gives each file its own cursor.
+    Stats come back in the order of `files`, which is the order the merge appends them in
+    """
+    connect().execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(WORKERS, len(files))), thread_name_prefix="ingest") as pool:
+        # each task gets its own copy of the context, so cursors join the caller's workload
+        futures = [pool.submit(contextvars.copy_context().run, stage_file, connect, dataset, path, columns,
+                               f"{dataset}_{i:05d}")
+                   for i, (dataset, path, columns) in enumerate(files)]
+        stats = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+    rows = sum(s["rows"] for s in stats)
+    rejected = sum(s["rejected"] for s in stats)
+    print(f"📥 [INGEST] Staged {len(stats)} files ({sum(s['size'] for s in stats) / 2**20:.1f} MB, "
+          f"{rows} rows, {rejected} rejected) in {elapsed:.1f}s on {min(WORKERS, len(files))} workers")
+    for s in stats:
+        if s["error"]:
+            print(f"❌ [INGEST] {s['file']}: {s['error']}")
+        elif s["missing"] or s["extra"]:
+            print(f"⚠️ [INGEST] {s['file']}: missing {s['missing'] or '-'} (loaded as 0), extra {s['extra'] or '-'}")
+    return stats
+
+
+def union_sql(stats):
+    """The staged rows of these files, in file order"""
+    return " UNION ALL ".join(f"SELECT * FROM {s['table']}" for s in stats if s["table"])
+
+
+def merge(con, table, stats):
+    """(Re)create `table` from its staged files; inserting file by file keeps the files' row order"""
+    staged = [s for s in stats if s["table"]]
+    con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {staged[0]['table']}")
+    for s in staged[1:]:
+        con.execute(f"INSERT INTO {table} SELECT * FROM {s['table']}")
+
+
+def record(con, stats, mode):
+    """Add the files to loaded_files and their sampled rejects to ingest_rejects"""
+    con.executemany("""
+        INSERT INTO loaded_files (dataset, file, size, mtime_ns, rows, rejected, parse_ms, missing_columns,
+                                  extra_columns, error, mode, loaded_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, now())
+    """, [[s["dataset"], s["file"], s["size"], s["mtime_ns"], s["rows"], s["rejected"], s["parse_ms"],
+           s["missing"], s["extra"], s["error"], mode] for s in stats])
+    samples = [[s["dataset"], s["file"], *sample] for s in stats for sample in s["samples"]]
+    if samples:
+        con.executemany("INSERT INTO ingest_rejects VALUES (?, ?, ?, ?, ?, now())", samples)
+
+
+def create_log(con):
+    """Empty loaded_files and ingest_rejects (a full load starts them over)"""
+    con.execute("""
+        CREATE OR REPLACE TABLE loaded_files (dataset VARCHAR, file VARCHAR, size BIGINT, mtime_ns BIGINT,
+                                              rows BIGINT, rejected BIGINT, parse_ms DOUBLE,
+                                              missing_columns VARCHAR[], extra_columns VARCHAR[], error VARCHAR,
+                                              mode VARCHAR, loaded_at TIMESTAMP)
+    """)
+    con.execute("""
+        CREATE OR REPLACE TABLE ingest_rejects (dataset VARCHAR, file VARCHAR, row BIGINT, reason VARCHAR,
+                                                record VARCHAR, loaded_at TIMESTAMP)
+    """)
+
+
+def drop(con, stats):
+    for s in stats:
+        if s["table"]:
+            con.execute(f"DROP TABLE IF EXISTS {s['table']}")
+
+
+def read_frames(paths, columns):
+    """
+    The pandas counterpart for readers outside the database (the trend analyser's worker
+    process): the files read in parallel, reconciled the same way, concatenated in order.
+    Rows with a blank key or an unparseable pincode/count and malformed lines are dropped
+    (dates stay text); files that fail to read or lack a key column are skipped. Returns
+    the frame and one message per skipped file or file with rejects
+    """
+    import pandas as pd
+
+    def read(path):
+        try:
+            df = pd.read_csv(path, on_bad_lines="skip")
+        except Exception as e:
+            return None, f"{path.name}: {str(e).strip()}"
+        mapping, _ = reconcile(list(df.columns), columns)
+        missing_keys = [c for c in KEYS if mapping[c] is None]
+        if missing_keys:
+            return None, f"{path.name}: no {', '.join(missing_keys)} column"
+        df = df.rename(columns={s: c for c, s in mapping.items() if s is not None}).reindex(columns=columns, fill_value=0)
+        bad = df[KEYS].isna().any(axis=1)
+        for c in columns:
+            if TYPES.get(c) is None and not pd.api.types.is_numeric_dtype(df[c]):
+                parsed = pd.to_numeric(df[c], errors="coerce")
+                bad |= parsed.isna() & df[c].notna()
+                df[c] = parsed
+        if not bad.any():
+            return df, None
+        df = df[~bad].reset_index(drop=True)
+        for c in columns:  # columns that only held integers besides the rejected rows
+            if TYPES.get(c) is None and df[c].notna().all() and (df[c] % 1 == 0).all():
+                df[c] = df[c].astype("int64")
+        return df, f"{path.name}: rejected {int(bad.sum())} of {len(bad)} rows"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(WORKERS, len(paths))), thread_name_prefix="ingest") as pool:
+        results = list(pool.map(read, paths))
+    frames = [df for df, _ in results if df is not None]
+    messages = [message for _, message in results if message]
+    return (pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()), messages
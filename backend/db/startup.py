@@ -0,0 +1,100 @@
+"""
+Startup timeline and background warm-up
+Phases (imports, DB attach, ingest, warm-up tasks) are recorded with their offset
+from process start and duration, and served by GET /startup. The API starts
+serving once the tables are loaded. Model-backed tables (forecasts, district
+features) and the trend analyser are built by background tasks afterwards. This
+keeps pandas, scipy and scikit-learn off the cold-start path. An endpoint that
+reads one of them calls wait(name) and blocks only until that task is done.
+The process is ready once no phase is running and no required phase has failed.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+PROCESS_START = time.perf_counter()
+WAIT_TIMEOUT = 300
+
+phases = {}
+_tasks = {}
+_optional = set()  # phases whose failure doesn't make the process unready
+_threads = []
+_lock = threading.Lock()
+
+
+def _offset_ms(t):
+    return round((t - PROCESS_START) * 1000, 1)
+
+
+def record(name, started, status="done", error=None):
+    """Record a finished phase that began at perf_counter() value `started`"""
+    with _lock:
+        phases[name] = {"phase": name, "start_ms": _offset_ms(started),
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                        "status": status, "error": error}
+
+
+@contextmanager
+def phase(name):
+    started = time.perf_counter()
+    with _lock:
+        phases[name] = {"phase": name, "start_ms": _offset_ms(started), "duration_ms": None,
+                        "status": "running", "error": None}
+    try:
+        yield
+    except Exception as e:
+        record(name, started, "failed", str(e))
+        raise
+    record(name, started)
+
+
+def background(name, fn, *args, required=True):
+    """
+    Run fn(*args) as phase `name` in a daemon thread; wait(name) blocks until it finishes.
+    A failed required task keeps report() from turning ready
+    """
+    done = threading.Event()
+    _tasks[name] = done
+    if required:
+        _optional.discard(name)
+    else:
+        _optional.add(name)
+
+    def run():
+        try:
+            with phase(name):
+                fn(*args)
+        except Exception as e:
+            print(f"❌ [STARTUP] {name} failed: {e}")
+        finally:
+            done.set()
+
+    thread = threading.Thread(target=run, name=f"warmup-{name}", daemon=True)
+    _threads.append(thread)
+    thread.start()
+
+
+def wait(name, timeout=WAIT_TIMEOUT):
+    """Block until background task `name` has finished; no-op if it was never started"""
+    done = _tasks.get(name)
+    if done is not None and not done.wait(timeout):
+        raise TimeoutError(f"Warm-up task '{name}' still running after {timeout}s")
+    if phases.get(name, {}).get("status") == "failed":
+        raise RuntimeError(f"Warm-up task '{name}' failed: {phases[name]['error']}")
+
+
+def join(timeout=WAIT_TIMEOUT):
+    """Let running warm-up tasks finish (a thread killed inside a DuckDB query aborts the process)"""
+    for thread in _threads:
+        thread.join(timeout)
+
+
+def report():
+    with _lock:
+        timeline = sorted(phases.values(), key=lambda p: p["start_ms"])
+    running = [p["phase"] for p in timeline if p["status"] == "running"]
+    failed = [p["phase"] for p in timeline if p["status"] == "failed" and p["phase"] not in _optional]
+    ends = [p["start_ms"] + p["duration_ms"] for p in timeline if p["duration_ms"] is not None]
+    return {"ready": not running and not failed, "running": running, "failed": failed,
+            "elapsed_ms": _offset_ms(time.perf_counter()),
+            "completed_at_ms": max(ends) if ends and not running else None, "phases": timeline}
@@ -0,0 +1,115 @@
+"""
+Compact, memory-mapped layout of the trend analyser's merged frame
+The merged frame (routes/trend_analyser.py) comes out of the CSV merge with
+object-dtype geography, float64 counts (fillna after the left merges) and
+float64 features. compact() keeps the same rows and columns but stores:
+geography as categoricals with sorted categories (pincode only where its rows
+repeat enough to pay for the category table), the date as days since
+1970-01-01, whole-number columns in the smallest integer type that holds them
+(uint8/uint16 for the bundled counts), and everything fractional as float32. pandas sums them without wrapping but may hand a sum back in the
+column's own dtype, so aggregates are widened to int64 before any arithmetic.
+save() writes it as one .npy file per column (category codes for categoricals)
+under TREND_DIR/<data version>. load() maps those files read-only, so every
+worker process serving the same data version shares one copy through the page
+cache, and a restart maps the frame instead of re-reading and merging the CSVs.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # backend/
+TREND_DIR = Path(os.environ.get("UIDAI_TREND_DIR", BASE_DIR / "trend_frame"))
+
+EPOCH = np.datetime64("1970-01-01", "D")
+FLOAT_COLUMNS = ["rolling_adult_enr", "fraud_spike_score", "bio_failure_ratio"]
+NUMERIC_KEYS = ["pincode"]  # categorical when that is smaller than the narrowest integers
+
+
+def smallest_int(values):
+    """Integer array in the narrowest dtype that holds every value (unsigned if none is negative)"""
+    values = np.asarray(values, dtype=np.int64)
+    if not len(values):
+        return values.astype(np.uint8)
+    return values.astype(np.result_type(np.min_scalar_type(values.min()), np.min_scalar_type(values.max())))
+
+
+def compact(df):
+    """The merged frame in the compact layout (a new frame; `df` is left as it is)"""
+    import pandas as pd
+    columns = {}
+    for name in df.columns:
+        column = df[name]
+        if name == "date":
+            dates = column if pd.api.types.is_datetime64_any_dtype(column) else \
+                pd.to_datetime(column, format="%d-%m-%Y")
+            columns[name] = smallest_int((dates.to_numpy().astype("datetime64[D]") - EPOCH).astype(np.int64))
+        elif not pd.api.types.is_numeric_dtype(column):
+            columns[name] = column.astype(pd.CategoricalDtype(sorted(column.dropna().unique())))
+        elif name in NUMERIC_KEYS:
+            codes = column.astype(pd.CategoricalDtype(sorted(column.dropna().unique())))
+            narrow = smallest_int(column)
+            columns[name] = codes if codes.memory_usage(deep=True, index=False) < narrow.nbytes else narrow
+        elif name in FLOAT_COLUMNS or (pd.api.types.is_float_dtype(column) and (column % 1 != 0).any()):
+            columns[name] = column.astype(np.float32)
+        else:
+            columns[name] = smallest_int(column)
+    return pd.DataFrame(columns)
+
+
+def to_datetime(days):
+    """DatetimeIndex from int day numbers of the compact `date` column"""
+    import pandas as pd
+    return pd.DatetimeIndex(EPOCH + np.asarray(days, dtype=np.int64).astype("timedelta64[D]"))
+
+
+def nbytes(df):
+    """In-memory size of a frame, object strings included"""
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def save(frame, version):
+    """Write a compact frame under TREND_DIR/<version>; a concurrent writer of the same version wins"""
+    import pandas as pd
+    target = TREND_DIR / version
+    staging = TREND_DIR / f".{version}-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    meta = {"rows": len(frame), "columns": []}
+    for i, name in enumerate(frame.columns):
+        column = frame[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            np.save(staging / f"{i}.npy", column.cat.codes.to_numpy())
+            meta["columns"].append({"name": name, "categories": column.cat.categories.tolist()})
+        else:
+            np.save(staging / f"{i}.npy", column.to_numpy())
+            meta["columns"].append({"name": name})
+    (staging / "meta.json").write_text(json.dumps(meta))
+    try:
+        os.rename(staging, target)
+    except OSError:  # already written by another worker
+        shutil.rmtree(staging, ignore_errors=True)
+    for stale in TREND_DIR.iterdir():
+        if stale.is_dir() and stale.name != version and not stale.name.startswith("."):
+            shutil.rmtree(stale, ignore_errors=True)  # processes still mapping it keep their pages
+
+
+def load(version):
+    """The frame saved for `version` with its columns memory-mapped read-only, or None"""
+    import pandas as pd
+    directory = TREND_DIR / version
+    try:
+        meta = json.loads((directory / "meta.json").read_text())
+    except (OSError, ValueError):
+        return None
+    columns = {}
+    for i, column in enumerate(meta["columns"]):
+        data = np.load(directory / f"{i}.npy", mmap_mode="r")
+        if "categories" in column:
+            # the codes are copied (1-2 bytes a row); numeric columns stay views of the mapping
+            columns[column["name"]] = pd.Categorical.from_codes(
+                data, dtype=pd.CategoricalDtype(column["categories"]), validate=False)
+        else:
+            columns[column["name"]] = data
+    return pd.DataFrame(columns, copy=False)
@@ -3,9 +3,19 @@ Aadhaar Insight API - Main Application
 FastAPI backend with 32 analytics endpoints for UIDAI data analysis
 """
 
-from fastapi import FastAPI
+from db import startup  # first import: the startup timeline is measured from here
+import asyncio
+import hmac
+import os
+import secrets
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from db.duckdb_loader import load_data, get_connection
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+from db.duckdb_loader import load_data, get_connection, get_data_version
+from db import response_cache, coalesce, bundle, resources, scatter, jobs, profiler
 
 # Import all route modules
 from routes.data_insights import router as data_insights_router
@@ -15,8 +25,13 @@ from routes.temporal import router as temporal_router
 from routes.anomaly import router as anomaly_router
 from routes.composite import router as composite_router
 from routes.crazy_insights import router as crazy_insights_router
-from routes.trend_analyser import router as trend_analyser_router
+from routes.trend_analyser import router as trend_analyser_router, ensure_data_loaded as load_trend_analyser
 from routes.map_data import router as map_data_router
+from routes.cube import router as cube_router
+from routes.districts import router as districts_router
+from routes.ingest import router as ingest_router
+from routes.jobs import router as jobs_router
+from routes.profiles import router as profiles_router
 
 app = FastAPI(
     title="Aadhaar Insight API",
@@ -33,6 +48,177 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Requests the app sends itself (prewarm, precompute.py): always computed, not counted as traffic.
+# The header carries a per-process secret, so clients can't use it to skip the cache
+INTERNAL_HEADER = "x-internal-request"
+INTERNAL_TOKEN = secrets.token_hex(16)
+
+
+def route_workload(scope):
+    """Workload class declared by the route `scope` goes to (@workload), or None"""
+    for route in app.router.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return getattr(route.endpoint, "workload", None)
+    return None
+
+
+# Added before the cache middleware, so it runs inside it: cache hits are never queued
+@app.middleware("http")
+async def admit_workload(request: Request, call_next):
+    """Queue a request for its workload slot on the event loop, not in one of the threads sync routes share"""
+    name = route_workload(request.scope)
+    if name is None:
+        return await call_next(request)
+    try:
+        async with resources.admit(name):
+            return await call_next(request)
+    except resources.Overloaded as e:  # raised before the route's exception handlers apply
+        return overloaded(request, e)
+
+
+@app.middleware("http")
+async def cache_responses(request: Request, call_next):
+    """Serve GETs from the response cache and record what is requested (db/response_cache.py)"""
+    path = request.url.path
+    if not response_cache.cacheable(request.method, path):
+        return await call_next(request)
+    query = response_cache.normalize(request.url.query)
+    # profiled requests are always computed so the profile shows the work
+    internal = hmac.compare_digest(request.headers.get(INTERNAL_HEADER, ""), INTERNAL_TOKEN) or \
+        profiler.requested(request.headers)
+    version = get_data_version()
+    accept = request.headers.get("accept-encoding")
+    if not internal and not query:
+        static = bundle.lookup(path, version, accept)
+        if static:
+            response_cache.record(path, query)
+            body, content_type, encoding = static
+            headers = {"content-type": content_type, "x-cache": "BUNDLE", "vary": "accept-encoding"}
+            return Response(body, headers={**headers, "content-encoding": encoding} if encoding else headers)
+    cached = None if internal else response_cache.get(version, path, query)
+    if cached:
+        response_cache.record(path, query)
+        return encoded_response(200, *cached, accept, "HIT")
+    # Single flight: identical requests arriving meanwhile share this computation (db/coalesce.py)
+    key = (version, path, query)
+    flight, leader = coalesce.join(key)
+    encoded = {}
+    result = None
+    if not leader:
+        waiting = asyncio.wrap_future(flight)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(waiting), coalesce.WAIT_S)
+            source, compute_ms = "COALESCED", None
+            stored = response_cache.get(version, path, query) if result[0] == 200 else None
+            encoded = stored[2] if stored else {}
+        except (asyncio.TimeoutError, coalesce.Abandoned):
+            coalesce.counts["fallbacks"] += 1  # the leader is stuck or gone: compute it here
+            waiting.add_done_callback(lambda f: f.cancelled() or f.exception())
+    if result is None:
+        start = time.perf_counter()
+        try:
+            result, source = await compute_shared(key, request, call_next)
+            compute_ms = (time.perf_counter() - start) * 1000 if source == "MISS" else None
+            if result[0] == 200:
+                encoded = await run_in_threadpool(response_cache.put, version, path, query, result[2], result[1])
+        except BaseException as e:  # a client disconnect cancels the leader; the flight must still land
+            if leader:
+                coalesce.land(key, error=e if isinstance(e, Exception) else coalesce.Abandoned())
+            raise
+        if leader:
+            coalesce.land(key, result)
+    status, content_type, body = result
+    if not internal and status == 200:
+        response_cache.record(path, query, compute_ms)
+    return encoded_response(status, body, content_type, encoded, accept, source)
+
+
+async def profile_request(request: Request, call_next):
+    """Profile requests carrying the x-profile-token header (db/profiler.py); installed only with a token set"""
+    if not profiler.requested(request.headers):
+        return await call_next(request)
+    session = profiler.start(request.method, request.url.path, request.url.query)
+    status = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        await run_in_threadpool(profiler.finish, session, status)
+    response.headers["x-profile-id"] = session.id
+    return response
+
+
+if profiler.ENABLED:  # outermost, so the profile also covers the cache middleware
+    app.middleware("http")(profile_request)
+
+
+def encoded_response(status, body, content_type, encoded, accept, source):
+    """Response with the stored variant Accept-Encoding prefers, or the plain body"""
+    headers = {"content-type": content_type, "x-cache": source}
+    if encoded:
+        headers["vary"] = "accept-encoding"
+        encoding = bundle.negotiate(accept, list(encoded))
+        if encoding:
+            body = encoded[encoding]
+            headers["content-encoding"] = encoding
+    return Response(body, status_code=status, headers=headers)
+
+
+async def compute_shared(key, request, call_next):
+    """
+    ((status, content type, body), source): computed here ("MISS"), or read from the spool
+    shared with other workers ("SPOOL") when one of them computed it first
+    """
+    if not coalesce.SPOOL:
+        return await compute(request, call_next), "MISS"
+    spooled = coalesce.spool_read(key)
+    if spooled:
+        return spooled, "SPOOL"
+    handle = await run_in_threadpool(coalesce.spool_lock, key)
+    try:
+        spooled = coalesce.spool_read(key)
+        if spooled:
+            return spooled, "SPOOL"
+        result = await compute(request, call_next)
+        if result[0] == 200:
+            coalesce.spool_write(key, result)
+        return result, "MISS"
+    finally:
+        coalesce.spool_unlock(handle)
+
+
+async def compute(request, call_next):
+    response = await call_next(request)
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    coalesce.counts["computed"] += 1
+    return response.status_code, response.headers.get("content-type"), body
+
+
+def internal_get(path, query=""):
+    """GET path?query through the app (and its middleware) from a worker thread: (status, content type, body)"""
+    messages = []
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+             "headers": [(b"host", b"internal"), (INTERNAL_HEADER.encode(), INTERNAL_TOKEN.encode())],
+             "client": ("127.0.0.1", 0), "server": ("internal", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    return start["status"], headers.get("content-type"), body
+
+
+def prewarm_fetch(path, query):
+    return internal_get(path, query)[0]
+
+
 # Register all routers
 app.include_router(data_insights_router)      # Metrics 1-5
 app.include_router(update_health_router)      # Metrics 6-10
@@ -43,12 +229,84 @@ app.include_router(composite_router)          # Metrics 26-27
 app.include_router(crazy_insights_router)     # Metrics 28-32
 app.include_router(trend_analyser_router)     # ML-based Trend Analysis
 app.include_router(map_data_router)           # Map visualization data
+app.include_router(cube_router)               # OLAP cube slicing
+app.include_router(districts_router)          # District profiles (feature store)
+app.include_router(ingest_router)             # Append new source files
+app.include_router(jobs_router)               # Asynchronous long-running analyses
+app.include_router(profiles_router)           # Stored per-request profiles
+
+# Set UIDAI_WARMUP=0 to train the trend analyser on its first request instead of right after startup
+WARM_UP = os.environ.get("UIDAI_WARMUP", "1") != "0"
+startup.record("import", startup.PROCESS_START)
 
 
 @app.on_event("startup")
-def startup():
-    """Load data into DuckDB on startup"""
-    load_data()
+def load_on_startup():
+    """Load data into DuckDB on startup; model-backed tables and the trend analyser warm up in the background"""
+    with startup.phase("db_attach"):
+        get_connection()
+    with startup.phase("ingest"):
+        load_data(background=True)
+    if WARM_UP:
+        startup.background("trend_analyser", load_trend_analyser)
+    # Recompute the most requested responses before /ready reports ready
+    response_cache.set_fetcher(prewarm_fetch)
+    response_cache.schedule()
+
+
+@app.on_event("shutdown")
+def finish_warm_up():
+    startup.join()
+    jobs.shutdown()
+    response_cache.flush(get_connection())
+
+
+@app.get("/startup")
+def startup_timeline():
+    """Startup phases (import, DB attach, ingest, warm-up tasks) with offsets and durations in ms"""
+    return startup.report()
+
+
+@app.get("/ready")
+def readiness():
+    """200 once tables are loaded and warm-up (including cache prewarm) has finished without a failed task, else 503"""
+    report = startup.report()
+    if not report["ready"]:
+        return JSONResponse(status_code=503, content={"ready": False, "running": report["running"],
+                                                      "failed": report["failed"]})
+    return {"ready": True}
+
+
+@app.exception_handler(resources.Overloaded)
+def overloaded(request: Request, exc: resources.Overloaded):
+    """No free slot for the route's workload class, deadline passed or memory limit hit: fail fast"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"retry-after": "5"})
+
+
+@app.exception_handler(scatter.ShardError)
+def shard_failed(request: Request, exc: scatter.ShardError):
+    """A scatter-gather endpoint could not reach one of its shards"""
+    return JSONResponse(status_code=502, content={"detail": str(exc)})
+
+
+@app.get("/shards")
+def shard_status():
+    """Scatter-gather shards (UIDAI_SHARDS) with the states and rows each one holds"""
+    return scatter.status()
+
+
+@app.get("/resources")
+def resource_status():
+    """DuckDB limits in effect and, per workload class, its profile and admission counts"""
+    return resources.status(get_connection())
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Response cache size, last prewarm, coalescing counts and the most requested endpoints with their compute cost"""
+    return {**response_cache.status(), "coalescing": coalesce.status(),
+            "hottest": [{"path": r[0], "query": r[1], "hits": r[2], "mean_compute_ms": round(r[3], 2) if r[3] else None}
+                        for r in response_cache.hottest(get_connection())]}
 
 
 @app.get("/")
@@ -0,0 +1,53 @@
+"""
+Offline precompute: snapshot every parameter-free endpoint into a static bundle
+    python precompute.py [--out bundle] [--workers 8] [--no-parquet]
+
+Loads the data, evaluates each parameter-free GET route in parallel and writes
+<out>/<data_version>/ with JSON, .gz/.br variants, Parquet for tabular metrics
+and manifest.json (see db/bundle.py). Serve that directory statically, or start
+the API with UIDAI_BUNDLE_DIR=<out> to answer those routes from the files.
+Run it with the API stopped (DuckDB allows one writer process).
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from db import bundle, response_cache
+from db.duckdb_loader import load_data, get_data_version
+
+
+def evaluate(path):
+    start = time.perf_counter()
+    status, content_type, body = main.internal_get(path)
+    return path, status, content_type, body, (time.perf_counter() - start) * 1000
+
+
+def precompute(out="bundle", workers=8, parquet=True):
+    start = time.perf_counter()
+    load_data()
+    main.load_trend_analyser()
+    version = get_data_version()
+    paths = bundle.static_routes(main.app, exclude=response_cache.NO_CACHE)
+    print(f"⏳ Evaluating {len(paths)} endpoints with {workers} workers...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(evaluate, paths))
+    manifest = bundle.write(out, version, results, parquet)
+    size = sum(r["bytes"] for r in manifest["routes"])
+    gz = sum(r["encodings"]["gzip"]["bytes"] for r in manifest["routes"])
+    print(f"✅ Bundle {out}/{version}: {len(manifest['routes'])} endpoints, "
+          f"{sum(1 for r in manifest['routes'] if r['parquet'])} as Parquet, "
+          f"{size / 1e6:.1f} MB JSON ({gz / 1e6:.1f} MB gzip), encodings {', '.join(manifest['encodings'])}, "
+          f"{time.perf_counter() - start:.1f}s")
+    for failure in manifest["failed"]:
+        print(f"❌ {failure['path']} returned {failure['status']}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot every parameter-free endpoint into a static bundle")
+    parser.add_argument("--out", default="bundle", help="bundle root directory (default: bundle)")
+    parser.add_argument("--workers", type=int, default=8, help="endpoints evaluated in parallel (default: 8)")
+    parser.add_argument("--no-parquet", action="store_true", help="skip Parquet copies of tabular metrics")
+    args = parser.parse_args()
+    precompute(args.out, args.workers, not args.no_parquet)
@@ -1,19 +1,26 @@
 """
 Anomaly Analytics Endpoints (Metrics 21-25)
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 import numpy as np
-import sys
-sys.path.append('..')
-from db.duckdb_loader import get_connection
+from db.duckdb_loader import get_connection, get_data_version
+from db import sampling, detectors, ingest, pincode_sets, queries
+from db.resources import workload
 
 router = APIRouter(prefix="/metrics", tags=["Anomaly"])
 
+# Keep the per-pincode/district detector state and the pincode index current as new files are ingested
+ingest.register_hook(detectors.on_ingest)
+ingest.register_hook(pincode_sets.on_ingest)
+
 
 @router.get("/enrollment-zscore")
-def enrollment_zscore():
+@workload("heavy")
+def enrollment_zscore(approx: bool = False):
     """Metric 21: Enrollment Z-score by pincode vs district avg"""
     con = get_connection()
+    if approx:
+        return approx_enrollment_zscore(con)
     result = con.execute("""
         WITH pincode_totals AS (SELECT pincode, district, state, (age_0_5 + age_5_17 + age_18_greater) AS total FROM enrollment),
              district_stats AS (SELECT district, state, AVG(total) AS avg_total, STDDEV(total) AS std_total FROM pincode_totals GROUP BY district, state)
@@ -27,6 +34,7 @@ def enrollment_zscore():
 
 
 @router.get("/bulk-enrollment-days")
+@workload("heavy")
 def bulk_enrollment_days():
     """Metric 22: Days with >3σ above normal enrollments"""
     con = get_connection()
@@ -40,34 +48,63 @@ def bulk_enrollment_days():
             "data": [{"date": str(r[0]), "total": r[1], "avg": round(r[2], 2), "sigma": r[4]} for r in result]}
 
 
+@router.get("/streaming-zscore")
+@workload("interactive")
+def streaming_zscore(level: str = "pincode", method: str = "ewma", state: str = None, min_days: int = 7,
+                     limit: int = 100):
+    """
+    Latest day's enrollments per pincode or district, z-scored against that series' own history
+    method: welford (all days), ewma (span 28) or rolling (last 28 days); answered from detector state
+    """
+    try:
+        data = detectors.zscores(get_connection(), level, method, state, min_days, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"metric": "streaming_zscore", "level": level, "method": method, "data": data}
+
+
+@router.get("/local-spikes")
+@workload("interactive")
+def local_spikes(level: str = "pincode", method: str = "ewma", threshold: float = 3.0, recent_days: int = 7,
+                 state: str = None, min_days: int = 7, limit: int = 100):
+    """Pincodes or districts whose latest day is `threshold` sigma above their own normal (local bulk days)"""
+    try:
+        data = detectors.spikes(get_connection(), level, method, threshold, recent_days, state, min_days, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"metric": "local_spikes", "level": level, "method": method, "threshold": threshold,
+            "count": len(data), "data": data}
+
+
 @router.get("/orphan-updates")
-def orphan_updates():
-    """Metric 23: Updates without matching enrollment"""
+@workload("interactive")
+def orphan_updates(limit: int = 50):
+    """Metric 23: Updates without matching enrollment (set difference over the pincode index)"""
     con = get_connection()
-    bio_orphans = con.execute("""
-        SELECT b.pincode, b.district, b.state, COUNT(*) FROM biometric b
-        LEFT JOIN enrollment e ON b.pincode = e.pincode WHERE e.pincode IS NULL
-        GROUP BY b.pincode, b.district, b.state ORDER BY 4 DESC LIMIT 50
-    """).fetchall()
-    demo_orphans = con.execute("""
-        SELECT d.pincode, d.district, d.state, COUNT(*) FROM demographic d
-        LEFT JOIN enrollment e ON d.pincode = e.pincode WHERE e.pincode IS NULL
-        GROUP BY d.pincode, d.district, d.state ORDER BY 4 DESC LIMIT 50
-    """).fetchall()
+    version = get_data_version(con)
+    bio_orphans, bio_pincodes = pincode_sets.missing(con, "biometric", ["enrollment"], limit, version)
+    demo_orphans, demo_pincodes = pincode_sets.missing(con, "demographic", ["enrollment"], limit, version)
     return {"metric": "orphan_updates",
-            "biometric_orphans": [{"pincode": r[0], "district": r[1], "state": r[2], "count": r[3]} for r in bio_orphans],
-            "demographic_orphans": [{"pincode": r[0], "district": r[1], "state": r[2], "count": r[3]} for r in demo_orphans]}
+            "biometric_orphans": bio_orphans, "demographic_orphans": demo_orphans,
+            "orphan_pincodes": {"biometric": bio_pincodes, "demographic": demo_pincodes}}
+
+
+@router.get("/enrolled-without-updates")
+@workload("interactive")
+def enrolled_without_updates(limit: int = 50):
+    """Reverse of Metric 23: enrolled pincodes with no biometric or demographic update at all"""
+    con = get_connection()
+    data, pincodes = pincode_sets.missing(con, "enrollment", ["biometric", "demographic"], limit,
+                                          get_data_version(con))
+    return {"metric": "enrolled_without_updates", "pincodes": pincodes, "data": data}
 
 
 @router.get("/age-distribution-skew")
+@workload("heavy")
 def age_distribution_skew():
     """Metric 24: Age distribution skewness per district"""
     con = get_connection()
-    result = con.execute("""
-        SELECT district, state, SUM(age_0_5) AS a0, SUM(age_5_17) AS a5, SUM(age_18_greater) AS a18,
-               SUM(age_0_5 + age_5_17 + age_18_greater) AS total
-        FROM enrollment GROUP BY district, state
-    """).fetchall()
+    result = queries.run(con, "district_enrollment").fetchall()
     data = []
     for r in result:
         if r[5] and r[5] > 0:
@@ -79,9 +116,12 @@ def age_distribution_skew():
 
 
 @router.get("/population-mismatch")
-def population_mismatch():
+@workload("heavy")
+def population_mismatch(approx: bool = False):
     """Metric 25: Pincodes with unusual enrollment counts (outliers)"""
     con = get_connection()
+    if approx:
+        return approx_population_mismatch(con)
     result = con.execute("""
         WITH stats AS (SELECT AVG(age_0_5 + age_5_17 + age_18_greater) AS avg_e, STDDEV(age_0_5 + age_5_17 + age_18_greater) AS std_e FROM enrollment)
         SELECT pincode, district, state, (age_0_5 + age_5_17 + age_18_greater) AS enrolled,
@@ -90,3 +130,33 @@ def population_mismatch():
     """).fetchall()
     return {"metric": "population_mismatch",
             "data": [{"pincode": r[0], "district": r[1], "state": r[2], "enrolled": r[3], "deviation": r[4]} for r in result]}
+
+
+def approx_enrollment_zscore(con):
+    """Metric 21 with district stats from the sample, scored over the per-district extremes"""
+    result = con.execute("""
+        WITH district_stats AS (SELECT district, state, COUNT(*) AS n, AVG(total) AS avg_total, STDDEV(total) AS std_total
+                                FROM enrollment_sample GROUP BY district, state)
+        SELECT p.pincode, p.district, p.state, p.total, d.avg_total, d.std_total, d.n,
+               CASE WHEN d.std_total > 0 THEN ROUND((p.total - d.avg_total) / d.std_total, 2) ELSE 0 END AS zscore
+        FROM enrollment_extremes p JOIN district_stats d ON p.district = d.district AND p.state = d.state
+        ORDER BY ABS(CASE WHEN d.std_total > 0 THEN (p.total - d.avg_total) / d.std_total ELSE 0 END) DESC LIMIT 100
+    """).fetchall()
+    return {"metric": "enrollment_zscore", "approx": True,
+            "data": [{"pincode": r[0], "district": r[1], "state": r[2], "total": r[3], "avg": round(r[4], 2) if r[4] else 0,
+                      "avg_ci": sampling.interval(r[4], sampling.mean_se(r[5], r[6], None)),
+                      "sample_size": r[6], "zscore": r[7]} for r in result]}
+
+
+def approx_population_mismatch(con):
+    """Metric 25 with the national mean from the sample; the largest deviations are always national extremes"""
+    avg_e, se, n = sampling.stratified_mean(con)
+    if avg_e is None:
+        return {"metric": "population_mismatch", "approx": True, "data": []}
+    result = con.execute("""
+        SELECT DISTINCT pincode, district, state, total, ROUND(ABS(total - ?), 2) AS deviation
+        FROM enrollment_extremes ORDER BY deviation DESC LIMIT 100
+    """, [avg_e]).fetchall()
+    return {"metric": "population_mismatch", "approx": True, "avg": round(avg_e, 2),
+            "avg_ci": sampling.interval(avg_e, se), "sample_size": n,
+            "data": [{"pincode": r[0], "district": r[1], "state": r[2], "enrolled": r[3], "deviation": r[4]} for r in result]}
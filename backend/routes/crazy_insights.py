@@ -1,38 +1,38 @@
 """
 Crazy Insights Endpoints (Metrics 28-32)
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import sys
-sys.path.append('..')
 from db.duckdb_loader import get_connection
+from db import cube, activity, jobs
+from db.resources import workload
 
 router = APIRouter(prefix="/metrics", tags=["Crazy Insights"])
 
 
 @router.get("/monsoon-fingerprint-index")
+@workload("heavy")
 def monsoon_fingerprint_index():
     """Metric 28: Monsoon bio updates vs rest of year"""
     con = get_connection()
-    result = con.execute("""
-        WITH monthly AS (
-            SELECT state, EXTRACT(MONTH FROM date) AS month, COUNT(*) AS updates
-            FROM biometric WHERE date IS NOT NULL GROUP BY state, EXTRACT(MONTH FROM date)
-        ),
-        monsoon AS (SELECT state, SUM(updates) AS monsoon FROM monthly WHERE month IN (6,7,8,9) GROUP BY state),
-        non_monsoon AS (SELECT state, SUM(updates) AS non_monsoon FROM monthly WHERE month NOT IN (6,7,8,9) GROUP BY state)
+    monthly_sql, params = cube.build_query(["state", "month_of_year"], measures=["records"],
+                                           filters={"dataset": "biometric"})
+    result = con.execute(f"""
+        WITH monthly AS ({monthly_sql}),
+        monsoon AS (SELECT state, SUM(records) AS monsoon FROM monthly WHERE month_of_year IN (6,7,8,9) GROUP BY state),
+        non_monsoon AS (SELECT state, SUM(records) AS non_monsoon FROM monthly WHERE month_of_year NOT IN (6,7,8,9) GROUP BY state)
         SELECT m.state, m.monsoon, n.non_monsoon,
                ROUND(m.monsoon::FLOAT / NULLIF(n.non_monsoon, 0), 2) AS ratio,
                CASE WHEN m.monsoon::FLOAT / NULLIF(n.non_monsoon, 0) > 1.2 THEN 'High Impact'
                     WHEN m.monsoon::FLOAT / NULLIF(n.non_monsoon, 0) < 0.8 THEN 'Low Impact' ELSE 'Normal' END
         FROM monsoon m JOIN non_monsoon n ON m.state = n.state ORDER BY ratio DESC
-    """).fetchall()
+    """, params).fetchall()
     return {"metric": "monsoon_fingerprint_index", "data": [
         {"state": r[0], "monsoon": r[1], "non_monsoon": r[2], "ratio": r[3], "impact": r[4]} for r in result]}
 
 
 @router.get("/enrollment-mirage")
+@workload("heavy")
 def enrollment_mirage():
     """Metric 29: High enrollments but low update activity"""
     con = get_connection()
@@ -54,6 +54,7 @@ def enrollment_mirage():
 
 
 @router.get("/phantom-children")
+@workload("heavy")
 def phantom_children():
     """Metric 30: Age 0-5 enrollments without biometric updates"""
     con = get_connection()
@@ -71,44 +72,59 @@ def phantom_children():
 
 
 @router.get("/district-twins")
+@workload("heavy")
 def district_twins():
     """Metric 31: Districts with similar metric profiles"""
-    con = get_connection()
-    result = con.execute("""
+    return jobs.run_inline("district_twins")
+
+
+def district_profile_rows(con, params):
+    return con.execute("""
         SELECT district, state,
                SUM(age_0_5)::FLOAT / NULLIF(SUM(age_0_5 + age_5_17 + age_18_greater), 0) AS r1,
                SUM(age_5_17)::FLOAT / NULLIF(SUM(age_0_5 + age_5_17 + age_18_greater), 0) AS r2,
                SUM(age_18_greater)::FLOAT / NULLIF(SUM(age_0_5 + age_5_17 + age_18_greater), 0) AS r3
         FROM enrollment GROUP BY district, state
     """).fetchall()
+
+
+def twins(result, params, progress):
+    from sklearn.metrics.pairwise import cosine_similarity
     if len(result) < 2:
         return {"metric": "district_twins", "message": "Insufficient data"}
     districts = [(r[0], r[1]) for r in result]
     features = np.array([[r[2] or 0, r[3] or 0, r[4] or 0] for r in result])
+    progress(0.1, "similarity")
     sim = cosine_similarity(features)
     np.fill_diagonal(sim, 0)
-    twins = []
+    progress(0.8, "matching")
+    found = []
     for i in range(len(districts)):
         j = np.argmax(sim[i])
-        if sim[i][j] > 0.995:
-            twins.append({"d1": districts[i][0], "s1": districts[i][1], "d2": districts[j][0], "s2": districts[j][1], "sim": round(float(sim[i][j]), 4)})
-    return {"metric": "district_twins", "twins": twins[:20]}
+        if sim[i][j] > params["threshold"]:
+            found.append({"d1": districts[i][0], "s1": districts[i][1], "d2": districts[j][0], "s2": districts[j][1], "sim": round(float(sim[i][j]), 4)})
+    return {"metric": "district_twins", "twins": found[:params["limit"]]}
+
+
+jobs.register("district_twins", district_profile_rows, twins, defaults={"threshold": 0.995, "limit": 20})
 
 
 @router.get("/pincode-ghost-towns")
-def pincode_ghost_towns():
-    """Metric 32: Pincodes with no activity for 2+ years"""
+@workload("interactive")
+def pincode_ghost_towns(inactive_for: str = "2 years"):
+    """Metric 32: Pincodes with no biometric or demographic activity for 2+ years (or `inactive_for`)"""
+    try:
+        period = activity.parse_period(inactive_for)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     con = get_connection()
     result = con.execute("""
-        WITH latest_bio AS (SELECT pincode, MAX(date) AS last_bio FROM biometric GROUP BY pincode),
-             latest_demo AS (SELECT pincode, MAX(date) AS last_demo FROM demographic GROUP BY pincode)
         SELECT e.pincode, e.district, e.state, (e.age_0_5 + e.age_5_17 + e.age_18_greater) AS enrolled,
-               lb.last_bio, ld.last_demo,
-               GREATEST(COALESCE(lb.last_bio, '1900-01-01'), COALESCE(ld.last_demo, '1900-01-01')) AS last_activity
-        FROM enrollment e LEFT JOIN latest_bio lb ON e.pincode = lb.pincode LEFT JOIN latest_demo ld ON e.pincode = ld.pincode
-        WHERE GREATEST(COALESCE(lb.last_bio, '1900-01-01'), COALESCE(ld.last_demo, '1900-01-01')) < CURRENT_DATE - INTERVAL '2 years'
+               a.last_biometric, a.last_demographic
+        FROM enrollment e LEFT JOIN pincode_activity_status a ON e.pincode = a.pincode
+        WHERE COALESCE(a.last_update, DATE '1900-01-01') < CURRENT_DATE - CAST(? AS INTERVAL)
         ORDER BY enrolled DESC LIMIT 100
-    """).fetchall()
-    return {"metric": "pincode_ghost_towns", "count": len(result), "data": [
+    """, [period]).fetchall()
+    return {"metric": "pincode_ghost_towns", "inactive_for": period, "count": len(result), "data": [
         {"pincode": r[0], "district": r[1], "state": r[2], "enrolled": r[3],
          "last_bio": str(r[4]) if r[4] else None, "last_demo": str(r[5]) if r[5] else None} for r in result]}
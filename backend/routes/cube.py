@@ -0,0 +1,39 @@
+"""
+OLAP Cube Endpoint
+Generic slicing of the precomputed (geo x time x dataset x age band) cube
+"""
+from datetime import date
+from fastapi import APIRouter, HTTPException
+from db.duckdb_loader import get_connection
+from db import cube
+from db.resources import workload
+
+router = APIRouter(tags=["Cube"])
+
+
+def split_csv(value):
+    return [v.strip() for v in value.split(",") if v.strip()] if value else []
+
+
+@router.get("/cube")
+@workload("interactive")
+def query_cube(group_by: str = "state,period", grain: str = "month", measures: str = "value",
+               dataset: str = None, state: str = None, district: str = None, age_band: str = None,
+               start: date = None, end: date = None, limit: int = 5000):
+    """
+    Slice the cube: /cube?dataset=biometric&group_by=state,month_of_year&measures=records
+    group_by: period, dataset, state, district, age_band, year, month_of_year, day_of_week, day_type
+    grain:    day, week, month, quarter, year (bucket used for `period`)
+    measures: value (head-count), records (raw rows), days (distinct active days)
+    """
+    con = get_connection()
+    filters = {"dataset": dataset, "state": state, "district": district, "age_band": age_band}
+    try:
+        rows = cube.query(con, split_csv(group_by), grain, split_csv(measures), filters, start, end, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for r in rows:
+        if "period" in r:
+            r["period"] = str(r["period"])[:10] if r["period"] else None
+    return {"group_by": split_csv(group_by), "grain": grain, "measures": split_csv(measures),
+            "filters": {k: v for k, v in filters.items() if v is not None}, "count": len(rows), "data": rows}
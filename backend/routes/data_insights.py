@@ -2,16 +2,19 @@
 Data Insights Analytics Endpoints (Metrics 1-5)
 Schema: enrollment(date, state, district, pincode, age_0_5, age_5_17, age_18_greater)
 """
-from fastapi import APIRouter
-import numpy as np
-import sys
-sys.path.append('..')
+from fastapi import APIRouter, HTTPException
 from db.duckdb_loader import get_connection
+from db import sampling, inequality, activity, ingest, scatter
+from db.resources import workload
 
 router = APIRouter(prefix="/metrics", tags=["Data Insights"])
 
+# Keep the last-activity index current as new files are ingested
+ingest.register_hook(activity.on_ingest)
+
 
 @router.get("/enrollment-deficit-ratio")
+@workload("heavy")
 def enrollment_deficit_ratio():
     """Metric 1: Enrollment counts by pincode (deficit requires external population data)"""
     con = get_connection()
@@ -27,6 +30,7 @@ def enrollment_deficit_ratio():
 
 
 @router.get("/age-cohort-imbalance")
+@workload("heavy")
 def age_cohort_imbalance():
     """Metric 2: Age Cohort Coverage Imbalance = |age_0_5% - age_18_greater%| across districts"""
     con = get_connection()
@@ -47,8 +51,15 @@ def age_cohort_imbalance():
 
 
 @router.get("/rural-urban-disparity")
+@workload("heavy")
 def rural_urban_disparity():
     """Metric 3: State-wise enrollment comparison (rural/urban flag not available)"""
+    if scatter.ENABLED:
+        merged = scatter.gather("state_enrollment")
+        ordered = sorted(merged.items(), key=lambda kv: (-(kv[1]["sum"] or 0), kv[0]))
+        return {"metric": "state_enrollment_summary", "data": [
+            {"state": key[0], "districts": m["district"], "total_enrolled": m["sum"],
+             "avg_per_pincode": scatter.sql_round(m["avg"], 2)} for key, m in ordered]}
     con = get_connection()
     result = con.execute("""
         SELECT state, COUNT(DISTINCT district) AS districts,
@@ -61,37 +72,70 @@ def rural_urban_disparity():
 
 
 @router.get("/pincode-gini")
-def pincode_coverage_gini():
+@workload("heavy")
+def pincode_coverage_gini(approx: bool = False):
     """Metric 4: Pincode Enrollment Gini Coefficient (inequality measure)"""
     con = get_connection()
-    result = con.execute("""
-        SELECT pincode, (age_0_5 + age_5_17 + age_18_greater) AS total FROM enrollment ORDER BY total
-    """).fetchall()
+    if approx:
+        return approx_pincode_gini(con)
+    result = inequality.summary(con, ["national"])
     if not result:
-        return {"metric": "pincode_gini", "gini_coefficient": None}
-    values = np.array([r[1] for r in result if r[1] and r[1] >= 0])
-    if len(values) == 0 or np.sum(values) == 0:
         return {"metric": "pincode_gini", "gini_coefficient": 0}
-    n = len(values)
-    sorted_vals = np.sort(values)
-    gini = (2 * np.sum((np.arange(1, n + 1) * sorted_vals))) / (n * np.sum(sorted_vals)) - (n + 1) / n
-    return {"metric": "pincode_gini", "gini_coefficient": round(float(gini), 4),
-            "pincodes": n, "min": int(sorted_vals[0]), "max": int(sorted_vals[-1]),
-            "median": int(np.median(sorted_vals))}
+    r = result[0]
+    return {"metric": "pincode_gini", "gini_coefficient": round(r["gini"], 4),
+            "pincodes": r["n"], "min": int(r["min"]), "max": int(r["max"]),
+            "median": int(r["quantiles"][inequality.QUANTILES.index(0.5)]),
+            "theil_index": round(r["theil"], 4), "quantiles": dict(zip(inequality.QUANTILES, r["quantiles"])),
+            "lorenz": [[round(p, 4), round(share, 4)] for p, share in r["lorenz"]]}
+
+
+@router.get("/pincode-gini/breakdown")
+@workload("heavy")
+def pincode_gini_breakdown(level: str = "state", state: str = None):
+    """Metric 4 per state or per district: Gini, Theil, quantiles and Lorenz points in one pass"""
+    con = get_connection()
+    try:
+        result = inequality.summary(con, [level], state)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"metric": "pincode_gini_breakdown", "level": level, "data": [
+        {"state": r["state"], "district": r["district"], "pincodes": r["n"], "gini_coefficient": round(r["gini"], 4),
+         "theil_index": round(r["theil"], 4), "min": int(r["min"]), "max": int(r["max"]),
+         "quantiles": dict(zip(inequality.QUANTILES, r["quantiles"])),
+         "lorenz": [[round(p, 4), round(share, 4)] for p, share in r["lorenz"]]} for r in result]}
+
+
+def approx_pincode_gini(con):
+    """Weighted Gini over the stratified sample with a random-groups 95% interval"""
+    sample = sampling.weighted_sample(con)
+    values, weights = sample["total"].astype(float), sample["weight"]
+    if len(values) == 0:
+        return {"metric": "pincode_gini", "approx": True, "gini_coefficient": 0}
+    gini = inequality.weighted_gini(values, weights)
+    se = sampling.replicate_se(values, weights, inequality.weighted_gini)
+    min_total, max_total = con.execute("SELECT MIN(total), MAX(total) FROM enrollment_extremes WHERE total > 0").fetchone()
+    return {"metric": "pincode_gini", "approx": True, "gini_coefficient": round(gini, 4),
+            "gini_ci": sampling.interval(gini, se, 4), "pincodes": int(round(weights.sum())),
+            "sample_size": len(values), "min": int(min_total), "max": int(max_total),
+            "median": int(inequality.weighted_quantile(values, weights, 0.5))}
 
 
 @router.get("/demographic-deserts")
-def demographic_update_deserts():
-    """Metric 5: Pincodes with 0 demographic updates in last 12 months"""
+@workload("interactive")
+def demographic_update_deserts(inactive_for: str = "12 months"):
+    """Metric 5: Pincodes with 0 demographic updates in last 12 months (or `inactive_for`)"""
+    try:
+        period = activity.parse_period(inactive_for)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     con = get_connection()
     result = con.execute("""
-        WITH enrollment_pincodes AS (SELECT DISTINCT pincode, district, state FROM enrollment),
-             recent_demo AS (SELECT DISTINCT pincode FROM demographic WHERE date >= CURRENT_DATE - INTERVAL '12 months')
-        SELECT e.pincode, e.district, e.state,
-               (SELECT MAX(date) FROM demographic WHERE demographic.pincode = e.pincode) AS last_update
-        FROM enrollment_pincodes e LEFT JOIN recent_demo r ON e.pincode = r.pincode
-        WHERE r.pincode IS NULL ORDER BY e.state, e.district LIMIT 200
-    """).fetchall()
-    return {"metric": "demographic_deserts", "count": len(result),
+        SELECT e.pincode, e.district, e.state, a.last_demographic
+        FROM pincode_index e LEFT JOIN pincode_activity a ON e.pincode = a.pincode
+        WHERE e.dataset = 'enrollment'
+          AND (a.last_demographic IS NULL OR a.last_demographic < CURRENT_DATE - CAST(? AS INTERVAL))
+        ORDER BY e.state, e.district LIMIT 200
+    """, [period]).fetchall()
+    return {"metric": "demographic_deserts", "inactive_for": period, "count": len(result),
             "data": [{"pincode": r[0], "district": r[1], "state": r[2],
                       "last_update": str(r[3]) if r[3] else "Never"} for r in result]}
@@ -0,0 +1,50 @@
+"""
+District Profile Endpoints
+Point lookups into the per-district feature store (db/features.py)
+"""
+from fastapi import APIRouter, HTTPException
+from db.duckdb_loader import get_connection
+from db import features, startup
+from db.resources import workload
+
+router = APIRouter(prefix="/districts", tags=["District Profiles"])
+
+
+@router.get("")
+@workload("interactive")
+def list_districts(state: str = None):
+    """District names with their state, for search boxes"""
+    startup.wait("district_features")
+    con = get_connection()
+    if state:
+        result = con.execute("""
+            SELECT district, state FROM district_features WHERE LOWER(state) = LOWER(?) ORDER BY district
+        """, [state]).fetchall()
+    else:
+        result = con.execute("SELECT district, state FROM district_features ORDER BY district").fetchall()
+    return {"count": len(result), "data": [{"district": r[0], "state": r[1]} for r in result]}
+
+
+@router.get("/compare")
+@workload("interactive")
+def compare_districts(ids: str):
+    """Feature rows for a comma-separated list of district names: /districts/compare?ids=Pune,Nashik"""
+    names = [n.strip() for n in ids.split(",") if n.strip()]
+    if not names:
+        raise HTTPException(status_code=400, detail="Pass at least one district name in ids")
+    rows = features.fetch(get_connection(), names)
+    found = {r["district"].lower() for r in rows}
+    return {"requested": names, "missing": [n for n in names if n.lower() not in found], "data": rows}
+
+
+@router.get("/{district}/profile")
+@workload("interactive")
+def district_profile(district: str, state: str = None):
+    """Every district-level metric for one district; pass ?state= when the name exists in several states"""
+    rows = features.fetch(get_connection(), [district], state)
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"District '{district}' not found")
+    profile = rows[0]
+    if len(rows) > 1:
+        profile["other_states"] = [r["state"] for r in rows[1:]]
+    return profile
@@ -3,30 +3,55 @@ Geospatial Analytics Endpoints (Metrics 11-15)
 """
 from fastapi import APIRouter
 import numpy as np
-from sklearn.cluster import DBSCAN, KMeans
-from sklearn.preprocessing import StandardScaler
-import sys
-sys.path.append('..')
 from db.duckdb_loader import get_connection
+from db import sampling, queries, scatter, jobs
+from db.resources import workload
 
 router = APIRouter(prefix="/metrics", tags=["Geospatial"])
 
 
 @router.get("/enrollment-cold-clusters")
+@workload("heavy")
 def enrollment_cold_clusters():
     """Metric 11: DBSCAN clusters of low-enrollment pincodes"""
-    con = get_connection()
-    result = con.execute("""
+    return jobs.run_inline("enrollment_cold_clusters")
+
+
+@router.get("/update-hot-clusters")
+@workload("heavy")
+def update_hot_clusters():
+    """Metric 12: KMeans clusters of high-update pincodes"""
+    return jobs.run_inline("update_hot_clusters")
+
+
+@router.get("/moran-i")
+@workload("heavy")
+def spatial_autocorrelation_moran():
+    """Metric 13: Moran's I on district enrollments"""
+    return jobs.run_inline("moran_i")
+
+
+# Job steps (db/jobs.py): the SQL runs in the API process, the model work in a job worker
+
+def cold_cluster_rows(con, params):
+    return con.execute("""
         SELECT pincode, district, state, (age_0_5 + age_5_17 + age_18_greater) AS total
-        FROM enrollment ORDER BY total ASC LIMIT 500
-    """).fetchall()
+        FROM enrollment ORDER BY total ASC LIMIT ?
+    """, [params["limit"]]).fetchall()
+
+
+def cold_clusters(result, params, progress):
+    from sklearn.cluster import DBSCAN
+    from sklearn.preprocessing import StandardScaler
     if len(result) < 5:
         return {"metric": "enrollment_cold_clusters", "message": "Insufficient data"}
     pincodes = [int(str(r[0])[:3]) if r[0] else 0 for r in result]
     totals = [r[3] if r[3] else 0 for r in result]
     X = np.array(list(zip(pincodes, totals)))
     X_scaled = StandardScaler().fit_transform(X)
-    clusters = DBSCAN(eps=0.5, min_samples=3).fit_predict(X_scaled)
+    progress(0.2, "clustering")
+    clusters = DBSCAN(eps=params["eps"], min_samples=params["min_samples"]).fit_predict(X_scaled)
+    progress(0.9, "summarizing")
     cluster_data = {}
     for i, r in enumerate(result):
         cid = int(clusters[i])
@@ -42,27 +67,23 @@ def enrollment_cold_clusters():
     return {"metric": "enrollment_cold_clusters", "clusters": formatted}
 
 
-@router.get("/update-hot-clusters")
-def update_hot_clusters():
-    """Metric 12: KMeans clusters of high-update pincodes"""
-    con = get_connection()
-    result = con.execute("""
-        WITH update_cnt AS (
-            SELECT e.pincode, e.district, e.state,
-                   (SELECT COUNT(*) FROM biometric b WHERE b.pincode = e.pincode) +
-                   (SELECT COUNT(*) FROM demographic d WHERE d.pincode = e.pincode) AS updates
-            FROM enrollment e GROUP BY e.pincode, e.district, e.state
-        )
-        SELECT * FROM update_cnt WHERE updates > 0 ORDER BY updates DESC LIMIT 300
-    """).fetchall()
+def hot_cluster_rows(con, params):
+    return queries.run(con, "hot_pincodes", [params["limit"]]).fetchall()
+
+
+def hot_clusters(result, params, progress):
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
     if len(result) < 5:
         return {"metric": "update_hot_clusters", "message": "Insufficient data"}
     pincodes = [int(str(r[0])[:3]) if r[0] else 0 for r in result]
     updates = [r[3] for r in result]
     X = np.array(list(zip(pincodes, updates)))
     X_scaled = StandardScaler().fit_transform(X)
-    n_clusters = min(5, max(2, len(result) // 20))
+    n_clusters = params["clusters"] or min(5, max(2, len(result) // 20))
+    progress(0.2, "clustering")
     clusters = KMeans(n_clusters=n_clusters, random_state=42, n_init=10).fit_predict(X_scaled)
+    progress(0.9, "summarizing")
     cluster_data = {}
     for i, r in enumerate(result):
         cid = int(clusters[i])
@@ -76,20 +97,20 @@ def update_hot_clusters():
     return {"metric": "update_hot_clusters", "num_clusters": n_clusters, "clusters": formatted}
 
 
-@router.get("/moran-i")
-def spatial_autocorrelation_moran():
-    """Metric 13: Moran's I on district enrollments"""
-    con = get_connection()
-    result = con.execute("""
-        SELECT district, state, SUM(age_0_5 + age_5_17 + age_18_greater) AS total
-        FROM enrollment GROUP BY district, state ORDER BY state, district
-    """).fetchall()
+def moran_rows(con, params):
+    return queries.run(con, "district_enrollment").fetchall()
+
+
+def moran(result, params, progress):
     if len(result) < 5:
         return {"metric": "moran_i", "message": "Insufficient data"}
-    values = np.array([r[2] for r in result])
+    values = np.array([r[5] for r in result])
     n = len(values)
     W = np.zeros((n, n))
+    step = max(1, n // 20)
     for i in range(n):
+        if i % step == 0:
+            progress(0.9 * i / n, "weights")
         for j in range(n):
             if i != j and result[i][1] == result[j][1]:
                 W[i, j] = 1
@@ -107,18 +128,20 @@ def spatial_autocorrelation_moran():
     return {"metric": "moran_i", "value": round(float(moran_i), 4), "interpretation": interp, "districts": n}
 
 
+jobs.register("enrollment_cold_clusters", cold_cluster_rows, cold_clusters,
+              defaults={"limit": 500, "eps": 0.5, "min_samples": 3})
+jobs.register("update_hot_clusters", hot_cluster_rows, hot_clusters, defaults={"limit": 300, "clusters": 0})
+jobs.register("moran_i", moran_rows, moran)
+
+
 @router.get("/contiguity-ratio")
+@workload("heavy")
 def contiguity_ratio():
     """Metric 14: % districts within 10% of state avg"""
-    con = get_connection()
-    result = con.execute("""
-        WITH dist_total AS (SELECT district, state, SUM(age_0_5 + age_5_17 + age_18_greater) AS total FROM enrollment GROUP BY district, state),
-             state_avg AS (SELECT state, AVG(total) AS avg_total FROM dist_total GROUP BY state)
-        SELECT d.district, d.state, d.total, s.avg_total,
-               ABS(d.total - s.avg_total) / NULLIF(s.avg_total, 0) * 100 AS deviation,
-               CASE WHEN ABS(d.total - s.avg_total) / NULLIF(s.avg_total, 0) <= 0.1 THEN 1 ELSE 0 END AS contiguous
-        FROM dist_total d JOIN state_avg s ON d.state = s.state ORDER BY d.state
-    """).fetchall()
+    if scatter.ENABLED:
+        result = scattered_district_vs_state(0.1)
+    else:
+        result = queries.run(get_connection(), "district_enrollment_vs_state", [0.1]).fetchall()
     total = len(result)
     contig = sum(r[5] for r in result)
     return {"metric": "contiguity_ratio", "total_districts": total, "contiguous": contig,
@@ -126,10 +149,36 @@ def contiguity_ratio():
             "sample": [{"district": r[0], "state": r[1], "total": r[2], "state_avg": round(r[3], 2), "deviation_pct": round(r[4], 2)} for r in result[:20]]}
 
 
+def scattered_district_vs_state(threshold):
+    """Rows of the district_enrollment_vs_state catalog query from shard partials"""
+    totals = {key: m["sum"] for key, m in scatter.gather("district_enrollment").items()}
+    by_state = {}
+    for (state, _), total in totals.items():
+        if total is not None:
+            by_state.setdefault(state, []).append(total)
+    rows = []
+    for (state, district), total in sorted(totals.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")):
+        avg = sum(by_state[state]) / len(by_state[state]) if by_state.get(state) else None
+        deviation = abs(total - avg) / avg if total is not None and avg else None
+        rows.append((district, state, total, avg, deviation * 100 if deviation is not None else None,
+                     1 if deviation is not None and deviation <= threshold else 0))
+    return rows
+
+
 @router.get("/enrollment-density-variance")
-def enrollment_density_variance():
+@workload("heavy")
+def enrollment_density_variance(approx: bool = False):
     """Metric 15: Standard deviation of enrollments per pincode by state"""
     con = get_connection()
+    if approx:
+        return approx_enrollment_density_variance(con)
+    if scatter.ENABLED:
+        merged = scatter.gather("state_enrollment")
+        stddev = {key: scatter.sql_round(m["stddev"], 2) for key, m in merged.items()}
+        ordered = sorted(merged.items(), key=lambda kv: (stddev[kv[0]] is None, -(stddev[kv[0]] or 0), kv[0]))
+        return {"metric": "enrollment_density_variance", "data": [
+            {"state": key[0], "pincodes": m["count"], "avg": scatter.sql_round(m["avg"], 2), "stddev": stddev[key],
+             "min": m["min"], "max": m["max"]} for key, m in ordered]}
     result = con.execute("""
         SELECT state, COUNT(*) AS pincodes,
                ROUND(AVG(age_0_5 + age_5_17 + age_18_greater), 2) AS avg_enroll,
@@ -140,3 +189,20 @@ def enrollment_density_variance():
     """).fetchall()
     return {"metric": "enrollment_density_variance", "data": [
         {"state": r[0], "pincodes": r[1], "avg": r[2], "stddev": r[3], "min": r[4], "max": r[5]} for r in result]}
+
+
+def approx_enrollment_density_variance(con):
+    """Metric 15 from the per-state sample; exact counts and min/max come from the strata and extremes tables"""
+    result = con.execute("""
+        WITH sample_stats AS (SELECT state, COUNT(*) AS n, AVG(total) AS avg_enroll, STDDEV(total) AS stddev_enroll
+                              FROM enrollment_sample GROUP BY state),
+             bounds AS (SELECT state, MIN(total) AS min_enroll, MAX(total) AS max_enroll FROM enrollment_extremes GROUP BY state)
+        SELECT t.state, t.rows, s.avg_enroll, s.stddev_enroll, b.min_enroll, b.max_enroll, s.n
+        FROM enrollment_strata t JOIN sample_stats s ON t.state = s.state JOIN bounds b ON t.state = b.state
+        ORDER BY s.stddev_enroll DESC NULLS LAST
+    """).fetchall()
+    return {"metric": "enrollment_density_variance", "approx": True, "data": [
+        {"state": r[0], "pincodes": r[1], "avg": round(r[2], 2), "stddev": round(r[3], 2) if r[3] is not None else None,
+         "min": r[4], "max": r[5], "sample_size": r[6],
+         "avg_ci": sampling.interval(r[2], sampling.mean_se(r[3], r[6], r[1])),
+         "stddev_ci": sampling.interval(r[3], sampling.stddev_se(r[3], r[6]))} for r in result]}
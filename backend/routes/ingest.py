@@ -0,0 +1,61 @@
+"""
+Ingestion Endpoints
+Append new source files without a full reload (db/ingest.py, db/staging.py)
+"""
+from fastapi import APIRouter, Body, HTTPException
+from db.duckdb_loader import get_connection
+from db import ingest, response_cache
+from db.resources import workload
+
+router = APIRouter(prefix="/ingest", tags=["Ingestion"])
+
+
+@router.post("")
+@workload("ingestion")
+def ingest_file(file: str):
+    """Append one new CSV from data/ (e.g. ?file=enrollment_2026-01-02.csv) and run the ingestion hooks"""
+    try:
+        result = ingest.ingest_file(file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response_cache.schedule(result["data_version"])
+    return result
+
+
+@router.post("/batch")
+@workload("ingestion")
+def ingest_batch(files: list[str] = Body(default=None), pattern: str = Body(default=None)):
+    """Append many new CSVs at once, e.g. {"pattern": "enrollment_2026-02-*.csv"} or {"files": [...]}; parsed in parallel, appended in one transaction"""
+    try:
+        names = files or (ingest.pending(pattern) if pattern else [])
+        result = ingest.ingest_files(names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response_cache.schedule(result["data_version"])
+    return result
+
+
+@router.get("/files")
+@workload("interactive")
+def loaded_files():
+    """Every source file currently loaded, how it was loaded (full reload or append), its rows, rejects, parse time and column drift"""
+    result = get_connection().execute("""
+        SELECT dataset, file, size, rows, rejected, parse_ms, missing_columns, extra_columns, error, mode, loaded_at
+        FROM loaded_files ORDER BY loaded_at, dataset, file
+    """).fetchall()
+    return {"count": len(result),
+            "data": [{"dataset": r[0], "file": r[1], "size": r[2], "rows": r[3], "rejected": r[4], "parse_ms": r[5],
+                      "missing_columns": r[6], "extra_columns": r[7], "error": r[8], "mode": r[9],
+                      "loaded_at": str(r[10])} for r in result]}
+
+
+@router.get("/rejects")
+@workload("interactive")
+def rejected_rows(file: str = None, limit: int = 100):
+    """Sampled rejected rows (the first few per file) with why they were rejected"""
+    result = get_connection().execute("""
+        SELECT dataset, file, row, reason, record FROM ingest_rejects
+        WHERE ? IS NULL OR file = ? ORDER BY loaded_at, file, row NULLS LAST LIMIT ?
+    """, [file, file, limit]).fetchall()
+    return {"count": len(result),
+            "data": [{"dataset": r[0], "file": r[1], "row": r[2], "reason": r[3], "record": r[4]} for r in result]}
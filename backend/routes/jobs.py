@@ -0,0 +1,49 @@
+"""
+Job Endpoints
+Long-running analyses queued to the job worker pool (db/jobs.py)
+"""
+from fastapi import APIRouter, Body, HTTPException
+from db import jobs
+from db.resources import workload
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.post("", status_code=202)
+@workload("interactive")
+def submit_job(type: str = Body(...), params: dict = Body(default={})):
+    """Queue an analysis, e.g. {"type": "enrollment_cold_clusters", "params": {"eps": 0.3}}; identical submissions share one job"""
+    try:
+        job, created = jobs.submit(type, params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**jobs.describe(job), "created": created}
+
+
+@router.get("")
+@workload("interactive")
+def list_jobs(limit: int = 50):
+    """Worker pool usage, job types and the most recent jobs"""
+    return {**jobs.status(), "jobs": jobs.recent(limit)}
+
+
+@router.get("/{job_id}")
+@workload("interactive")
+def job_status(job_id: str):
+    """Status, progress, stage and timing of a job; the result once it is done"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return jobs.describe(job)
+
+
+@router.delete("/{job_id}")
+@workload("interactive")
+def cancel_job(job_id: str):
+    """Cancel a queued or running job (a running job's worker process is terminated)"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    if job["status"] in jobs.FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' already {job['status']}")
+    return jobs.describe(jobs.cancel(job_id))
@@ -3,27 +3,51 @@ Map Data Endpoints for Geospatial Visualization
 Provides state/district/pincode level data for choropleth maps
 """
 from fastapi import APIRouter
-import sys
-sys.path.append('..')
 from db.duckdb_loader import get_connection
+from db import sampling, queries, scatter
+from db.resources import workload
 
 router = APIRouter(prefix="/map", tags=["Map Data"])
 
 
 @router.get("/states")
-def get_state_data():
+@workload("heavy")
+def get_state_data(approx: bool = False):
     """Get state-level enrollment aggregations for choropleth map"""
     con = get_connection()
-    result = con.execute("""
-        SELECT 
-            state,
-            SUM(age_0_5 + age_5_17 + age_18_greater) AS total_enrolled,
-            COUNT(DISTINCT district) AS district_count,
-            COUNT(DISTINCT pincode) AS pincode_count
-        FROM enrollment
-        GROUP BY state
-        ORDER BY total_enrolled DESC
-    """).fetchall()
+    if approx:
+        # Totals and district counts are exact; pincode counts are HyperLogLog estimates
+        result = con.execute("""
+            SELECT state, enrolled, districts, pincodes_hll FROM enrollment_strata ORDER BY enrolled DESC
+        """).fetchall()
+        return {
+            "approx": True,
+            "data": [
+                {
+                    "state": r[0],
+                    "enrolled": int(r[1]) if r[1] else 0,
+                    "districts": int(r[2]) if r[2] else 0,
+                    "pincodes": int(r[3]) if r[3] else 0,
+                    "pincodes_ci": sampling.interval(r[3], r[3] * sampling.HLL_RSE, 0) if r[3] else None
+                }
+                for r in result
+            ]
+        }
+    if scatter.ENABLED:
+        merged = scatter.gather("state_enrollment")
+        result = sorted(((key[0], m["sum"], m["district"], m["pincode"]) for key, m in merged.items()),
+                        key=lambda r: (-(r[1] or 0), r[0]))
+    else:
+        result = con.execute("""
+            SELECT
+                state,
+                SUM(age_0_5 + age_5_17 + age_18_greater) AS total_enrolled,
+                COUNT(DISTINCT district) AS district_count,
+                COUNT(DISTINCT pincode) AS pincode_count
+            FROM enrollment
+            GROUP BY state
+            ORDER BY total_enrolled DESC
+        """).fetchall()
     
     return {
         "data": [
@@ -39,6 +63,7 @@ def get_state_data():
 
 
 @router.get("/districts/{state}")
+@workload("interactive")
 def get_district_data(state: str):
     """Get district-level data for a specific state"""
     con = get_connection()
@@ -75,6 +100,7 @@ def get_district_data(state: str):
 
 
 @router.get("/pincodes/{district}")
+@workload("interactive")
 def get_pincode_data(district: str):
     """Get pincode-level data for a specific district"""
     con = get_connection()
@@ -126,6 +152,7 @@ def get_pincode_data(district: str):
 
 
 @router.get("/clusters/{cluster_type}")
+@workload("heavy")
 def get_cluster_map_data(cluster_type: str):
     """Get cluster data with coordinates for map visualization"""
     con = get_connection()
@@ -138,17 +165,7 @@ def get_cluster_map_data(cluster_type: str):
         """).fetchall()
     else:
         # High update clusters (KMeans hot spots)
-        result = con.execute("""
-            WITH update_cnt AS (
-                SELECT e.pincode, e.district, e.state,
-                       (SELECT COUNT(*) FROM biometric b WHERE b.pincode = e.pincode) +
-                       (SELECT COUNT(*) FROM demographic d WHERE d.pincode = e.pincode) AS updates,
-                       (e.age_0_5 + e.age_5_17 + e.age_18_greater) AS enrolled
-                FROM enrollment e GROUP BY e.pincode, e.district, e.state
-            )
-            SELECT pincode, district, state, updates, enrolled
-            FROM update_cnt WHERE updates > 0 ORDER BY updates DESC LIMIT 300
-        """).fetchall()
+        result = queries.run(con, "hot_pincodes", [300]).fetchall()
     
     def pincode_to_coords(pincode):
         prefix = int(str(pincode)[:2]) if pincode else 11
@@ -0,0 +1,54 @@
+"""
+Profile Endpoints
+Stored per-request profiles (db/profiler.py); every endpoint needs the x-profile-token header
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+from db import profiler
+from db.resources import workload
+
+
+def require_token(x_profile_token: str = Header(None)):
+    if not profiler.ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is off (set UIDAI_PROFILE_TOKEN)")
+    if not profiler.authorized(x_profile_token):
+        raise HTTPException(status_code=403, detail="Missing or wrong x-profile-token")
+
+
+router = APIRouter(prefix="/profiles", tags=["Profiles"], dependencies=[Depends(require_token)])
+
+
+def stored(profile_id, kind):
+    path = profiler.path_of(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    return path
+
+
+@router.get("")
+@workload("interactive")
+def list_profiles():
+    """Stored profiles, newest first"""
+    return {"profiles": profiler.listing()}
+
+
+@router.get("/{profile_id}")
+@workload("interactive")
+def profile_summary(profile_id: str):
+    """Timing, DuckDB statements and top allocations of one profiled request"""
+    return FileResponse(stored(profile_id, "summary"), media_type="application/json")
+
+
+@router.get("/{profile_id}/speedscope")
+@workload("interactive")
+def profile_speedscope(profile_id: str):
+    """Sampled CPU profile in speedscope's format (open it at https://www.speedscope.app)"""
+    return FileResponse(stored(profile_id, "speedscope"), media_type="application/json",
+                        filename=f"{profile_id}.speedscope.json")
+
+
+@router.get("/{profile_id}/collapsed")
+@workload("interactive")
+def profile_collapsed(profile_id: str):
+    """Collapsed stacks, for flamegraph.pl or inferno-flamegraph"""
+    return PlainTextResponse(stored(profile_id, "collapsed").read_text())
@@ -3,13 +3,12 @@ Trend Analyser Routes - ML-based predictive analytics for Aadhaar enrollment tre
 Provides insights on enrollment patterns, completion rates, bottlenecks, and fraud detection
 """
 
-from fastapi import APIRouter
-import pandas as pd
+from fastapi import APIRouter, HTTPException
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.linear_model import LinearRegression
-import glob
-import os
+import threading
+from db.duckdb_loader import get_connection, get_data_version, DATA_DIR, DATASETS
+from db import forecast, anomaly_scores, jobs, trend_frame, staging
+from db.resources import workload
 
 router = APIRouter(prefix="/api/trends", tags=["Trend Analysis"])
 
@@ -18,43 +17,38 @@ trend_state = {
     "data": None,
     "models": {},
     "insights": {},
+    "aggregates": {},
+    "footprint": None,
     "data_loaded": False
 }
 
-DATA_DIR = "data/"  # Data folder within backend directory
+_load_lock = threading.Lock()  # the startup warm-up and a first request may race to load
+SUM_COLUMNS = ['age_0_5', 'age_5_17', 'age_18_greater', 'demo_age_5_17', 'demo_age_17_', 'bio_age_5_17', 'bio_age_17_']
 
 
 def load_dataset_group(file_pattern):
     """
-    Reads all files matching a pattern (e.g., 'enrollment_*.csv') 
-    and combines them into a single DataFrame.
+    Reads all files matching a pattern (e.g., 'enrollment_*.csv') in parallel, with their
+    columns matched by name (db/staging.py), and combines them into a single DataFrame.
     """
-    search_path = os.path.join(DATA_DIR, file_pattern)
-    files = glob.glob(search_path)
-    
+    import pandas as pd
+    files = sorted(DATA_DIR.glob(file_pattern))
+
     if not files:
         print(f"⚠️ [WARNING] No files found for pattern: {file_pattern}")
         return pd.DataFrame()
 
     print(f"📂 [SYSTEM] Found {len(files)} files for '{file_pattern}'. Merging...")
-    
-    df_list = []
-    for file in files:
-        try:
-            df = pd.read_csv(file)
-            df_list.append(df)
-        except Exception as e:
-            print(f"❌ [ERROR] Could not read {file}: {e}")
-
-    if df_list:
-        combined_df = pd.concat(df_list, ignore_index=True)
-        return combined_df
-    else:
-        return pd.DataFrame()
+    columns = next(columns for pattern, columns in DATASETS.values() if pattern == file_pattern)
+    combined_df, messages = staging.read_frames(files, columns)
+    for message in messages:
+        print(f"❌ [ERROR] {message}")
+    return combined_df
 
 
 def load_and_merge_data():
     """Load and merge enrollment, demographic, and biometric data"""
+    import pandas as pd
     print("⏳ [SYSTEM] Starting Trend Analysis Data Pipeline...")
     
     df_enr = load_dataset_group("enrollment_*.csv")
@@ -77,53 +71,204 @@ def load_and_merge_data():
 
 
 def train_analytics_engine(df):
-    """Train ML models for fraud detection and forecasting"""
+    """Train ML models for fraud detection"""
     if df.empty:
         return
     
     print("🧠 [ML] Training Models on Combined Data...")
-    
-    # Feature Engineering
+    add_features(df)
+
+    # Fraud Detection (Isolation Forest), persisted and scored incrementally in db/anomaly_scores.py
+    iso = anomaly_scores.train_or_restore(get_connection(), df)
+    install(df, iso)
+
+
+def add_features(df):
+    """Feature Engineering: adult enrollment spikes against the district's rolling mean"""
     df['rolling_adult_enr'] = df.groupby('district')['age_18_greater'].transform(
         lambda x: x.rolling(7).mean().fillna(0)
     )
     df['fraud_spike_score'] = df['age_18_greater'] / (df['rolling_adult_enr'] + 1)
     df['bio_failure_ratio'] = df['bio_age_17_'] / (df['age_18_greater'].cumsum() + 10)
 
-    # Fraud Detection (Isolation Forest)
-    iso = IsolationForest(contamination=0.01, random_state=42)
-    df['is_anomaly'] = iso.fit_predict(df[['age_18_greater', 'fraud_spike_score', 'bio_age_17_']])
-    
-    # Forecasting (Linear Regression)
-    df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y')
-    df['date_ordinal'] = df['date'].map(pd.Timestamp.toordinal)
-    trend_model = LinearRegression()
-    
-    recent_data = df.tail(min(len(df), 2000))
-    trend_model.fit(recent_data[['date_ordinal']], recent_data['bio_age_17_'])
-    
-    # Save State
-    trend_state['data'] = df
+
+def install(df, iso):
+    """Serve a trained frame and fraud model from the trend endpoints, in the compact layout"""
+    version = get_data_version(get_connection())
+    frame = trend_frame.compact(df)
+    trend_frame.save(frame, version)
+    before = trend_frame.nbytes(df)
+    serve(trend_frame.load(version), iso)
+    after = trend_frame.nbytes(trend_state['data'])
+    trend_state['footprint'] = {"merged_bytes": before, "compact_bytes": after}
+    print(f"✅ [ML] Training Finished. Trend frame {before / 2**20:.1f} MB -> {after / 2**20:.1f} MB (memory-mapped)")
+
+
+def serve(frame, iso):
+    """Swap in a compact trend frame (db/trend_frame.py) and its fraud model"""
+    # Forecasting lives in db/forecast.py (vectorized per-series fits, precomputed at load)
     trend_state['models']['fraud'] = iso
-    trend_state['models']['trend'] = trend_model
     trend_state['insights'] = {
-        "total_records": len(df),
-        "fraud_alerts": int(len(df[df['is_anomaly'] == -1])),
-        "trend_slope": float(trend_model.coef_[0])
+        "total_records": len(frame),
+        "fraud_alerts": anomaly_scores.model_state['alerts']
     }
+    trend_state['aggregates'] = precompute_aggregates(frame)
+    trend_state['data'] = frame
     trend_state['data_loaded'] = True
-    print("✅ [ML] Training Finished.")
+
+
+# train_analytics_engine as a job (db/jobs.py): the worker reads the CSVs, builds the features and
+# fits the model; the API process rescores `anomaly_scores` with it and swaps in the new state
+
+def no_inputs(con, params):
+    return None
+
+
+def train_in_worker(inputs, params, progress):
+    progress(0.0, "loading")
+    df = load_and_merge_data()
+    if df.empty:
+        raise ValueError("One or more dataset groups are missing")
+    progress(0.5, "features")
+    add_features(df)
+    progress(0.7, "fitting")
+    model = anomaly_scores.fit(df[anomaly_scores.FEATURES].to_numpy(dtype=float))
+    return {"frame": df, "model": model}
+
+
+def publish_training(con, output):
+    df, model = output["frame"], output["model"]
+    with _load_lock:
+        anomaly_scores.adopt(con, df, model)
+        install(df, model)
+    return {"total_records": len(df), "fraud_alerts": anomaly_scores.model_state['alerts'],
+            "model_version": anomaly_scores.model_state['version']}
+
+
+jobs.register("train_analytics_engine", no_inputs, train_in_worker, publish_training)
+
+
+def completion_stats(df, keys):
+    """Enrollment/update sums and completion rates per group"""
+    stats = df.groupby(keys, observed=True)[SUM_COLUMNS].sum().astype(np.int64).reset_index()
+    stats['total_enrolled'] = stats['age_0_5'] + stats['age_5_17'] + stats['age_18_greater']
+    stats['demo_completed'] = stats['demo_age_5_17'] + stats['demo_age_17_']
+    stats['bio_completed'] = stats['bio_age_5_17'] + stats['bio_age_17_']
+    stats['demo_rate'] = (stats['demo_completed'] / stats['total_enrolled'] * 100).fillna(0)
+    stats['bio_rate'] = (stats['bio_completed'] / stats['total_enrolled'] * 100).fillna(0)
+    return stats
+
+
+def precompute_aggregates(df):
+    """
+    Every response aggregate, computed once per load as column arrays
+    ({field: list}), so requests only zip them into rows
+    """
+    # sums of the compact count columns can come back uint8/uint16: widen before adding them up
+    daily = df.groupby('date')[SUM_COLUMNS].sum().astype(np.int64).reset_index()
+    dates = trend_frame.to_datetime(daily['date']).strftime('%Y-%m-%d').tolist()
+
+    states = completion_stats(df, 'state').sort_values('total_enrolled', ascending=False)
+
+    districts = completion_stats(df, ['state', 'district'])
+    bottlenecks = districts[
+        (districts['total_enrolled'] > 50) &
+        ((districts['bio_rate'] < 80) | (districts['demo_rate'] < 80))
+    ].sort_values('total_enrolled', ascending=False).head(20)
+
+    pincodes = df.groupby(['state', 'district', 'pincode'], observed=True)[['age_0_5', 'age_5_17', 'age_18_greater']].sum().astype(np.int64).reset_index()
+    pincodes['total'] = pincodes['age_0_5'] + pincodes['age_5_17'] + pincodes['age_18_greater']
+    top_pincodes = pincodes.sort_values('total', ascending=False).head(30)
+
+    total_enrollments = int(daily['age_0_5'].sum() + daily['age_5_17'].sum() + daily['age_18_greater'].sum())
+    total_demographics = int(daily['demo_age_5_17'].sum() + daily['demo_age_17_'].sum())
+    total_biometrics = int(daily['bio_age_5_17'].sum() + daily['bio_age_17_'].sum())
+    demo_completion_rate = (total_demographics / total_enrollments * 100) if total_enrollments > 0 else 0
+    bio_completion_rate = (total_biometrics / total_enrollments * 100) if total_enrollments > 0 else 0
+    first, last = trend_frame.to_datetime([df['date'].min(), df['date'].max()])
+
+    return {
+        "summary": {
+            "total_enrollment": total_enrollments,
+            "demographic_completion_rate": round(demo_completion_rate, 2),
+            "biometric_completion_rate": round(bio_completion_rate, 2),
+            "fraud_cases": trend_state['insights']['fraud_alerts'],
+            "districts_covered": int(df['district'].nunique()),
+            "states_covered": int(df['state'].nunique()),
+            "date_range": {
+                "start": str(first.date()),
+                "end": str(last.date())
+            }
+        },
+        "enrollment_by_age": {
+            "dates": dates,
+            "age_0_5": daily['age_0_5'].tolist(),
+            "age_5_17": daily['age_5_17'].tolist(),
+            "age_18_plus": daily['age_18_greater'].tolist()
+        },
+        "daily_volume": {
+            "dates": dates,
+            "enrollments": (daily['age_0_5'] + daily['age_5_17'] + daily['age_18_greater']).tolist(),
+            "demographics": (daily['demo_age_5_17'] + daily['demo_age_17_']).tolist(),
+            "biometrics": (daily['bio_age_5_17'] + daily['bio_age_17_']).tolist()
+        },
+        "state_performance": {
+            "state": states['state'].tolist(),
+            "total_enrolled": states['total_enrolled'].astype(int).tolist(),
+            "demographic_rate": states['demo_rate'].round(2).tolist(),
+            "biometric_rate": states['bio_rate'].round(2).tolist(),
+            "pending_demographics": (states['total_enrolled'] - states['demo_completed']).astype(int).tolist(),
+            "pending_biometrics": (states['total_enrolled'] - states['bio_completed']).astype(int).tolist()
+        },
+        "bottleneck_districts": {
+            "state": bottlenecks['state'].tolist(),
+            "district": bottlenecks['district'].tolist(),
+            "total_enrolled": bottlenecks['total_enrolled'].astype(int).tolist(),
+            "demographic_rate": bottlenecks['demo_rate'].round(2).tolist(),
+            "biometric_rate": bottlenecks['bio_rate'].round(2).tolist(),
+            "issue": np.where(bottlenecks['bio_rate'] < bottlenecks['demo_rate'],
+                              "Biometric Backlog", "Demographic Backlog").tolist()
+        },
+        "high_volume_pincodes": {
+            "pincode": top_pincodes['pincode'].tolist(),
+            "district": top_pincodes['district'].tolist(),
+            "state": top_pincodes['state'].tolist(),
+            "total_enrollments": top_pincodes['total'].astype(int).tolist(),
+            "children_0_5": top_pincodes['age_0_5'].astype(int).tolist(),
+            "children_5_17": top_pincodes['age_5_17'].astype(int).tolist(),
+            "adults": top_pincodes['age_18_greater'].astype(int).tolist()
+        }
+    }
+
+
+def records(columns):
+    """Row dicts from precomputed column arrays"""
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
 
 
 def ensure_data_loaded():
     """Ensure data is loaded before processing requests"""
-    if not trend_state['data_loaded']:
+    if trend_state['data_loaded']:
+        return
+    with _load_lock:
+        if trend_state['data_loaded']:
+            return
+        # Another worker (or an earlier run) on the same data already saved the frame and model
+        con = get_connection()
+        frame = trend_frame.load(get_data_version(con))
+        iso = anomaly_scores.saved_model(con) if frame is not None else None
+        if iso is not None:
+            serve(frame, iso)
+            print(f"✅ [SYSTEM] Mapped the saved trend frame ({len(frame)} records)")
+            return
         df = load_and_merge_data()
         if not df.empty:
             train_analytics_engine(df)
 
 
 @router.get("/summary")
+@workload("interactive")
 def get_summary():
     """Returns aggregated stats for the dashboard"""
     ensure_data_loaded()
@@ -131,51 +276,44 @@ def get_summary():
     if trend_state['data'] is None:
         return {"error": "Data not loaded"}
     
-    df = trend_state['data']
-    
-    total_enrollments = int(df['age_0_5'].sum() + df['age_5_17'].sum() + df['age_18_greater'].sum())
-    total_demographics = int(df['demo_age_5_17'].sum() + df['demo_age_17_'].sum())
-    total_biometrics = int(df['bio_age_5_17'].sum() + df['bio_age_17_'].sum())
-    
-    demo_completion_rate = (total_demographics / total_enrollments * 100) if total_enrollments > 0 else 0
-    bio_completion_rate = (total_biometrics / total_enrollments * 100) if total_enrollments > 0 else 0
-    
-    return {
-        "total_enrollment": total_enrollments,
-        "demographic_completion_rate": round(demo_completion_rate, 2),
-        "biometric_completion_rate": round(bio_completion_rate, 2),
-        "fraud_cases": trend_state['insights']['fraud_alerts'],
-        "districts_covered": int(df['district'].nunique()),
-        "states_covered": int(df['state'].nunique()),
-        "date_range": {
-            "start": str(df['date'].min().date()),
-            "end": str(df['date'].max().date())
-        }
-    }
+    return {**trend_state['aggregates']['summary'], "fraud_cases": anomaly_scores.model_state['alerts']}
 
 
 @router.get("/forecast")
-def get_forecast():
-    """Returns ML prediction for next 7 days"""
-    ensure_data_loaded()
-    
-    if 'trend' not in trend_state['models']:
+@workload("interactive")
+def get_forecast(horizon: int = 7, confidence: float = 0.95):
+    """Returns the national biometric (17+) load forecast with prediction intervals"""
+    try:
+        series = forecast.query(get_connection(), "national", "biometric", "bio_age_17_",
+                                horizon=horizon, confidence=confidence)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not series:
         return {"error": "Model not trained"}
     
-    model = trend_state['models']['trend']
-    last_date = trend_state['data']['date'].max()
-    
-    future_dates = [last_date + pd.Timedelta(days=x) for x in range(1, 8)]
-    future_ordinals = np.array([d.toordinal() for d in future_dates]).reshape(-1, 1)
-    predictions = model.predict(future_ordinals)
-    
     return [
-        {"date": str(d.date()), "predicted_biometric_load": int(max(0, p))} 
-        for d, p in zip(future_dates, predictions)
+        {"date": p["date"], "predicted_biometric_load": int(p["predicted"]),
+         "lower": int(p["lower"]), "upper": int(p["upper"])}
+        for p in series[0]["points"]
     ]
 
 
+@router.get("/forecast/series")
+@workload("interactive")
+def get_forecast_series(level: str = "district", dataset: str = "biometric", age_band: str = "bio_age_17_",
+                        state: str = None, district: str = None, horizon: int = 14, confidence: float = 0.95):
+    """Per-state or per-district forecasts for staffing, with prediction intervals"""
+    try:
+        series = forecast.query(get_connection(), level, dataset, age_band, state, district, horizon, confidence)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"level": level, "dataset": dataset, "age_band": age_band, "horizon": horizon,
+            "confidence": confidence, "count": len(series), "series": series}
+
+
 @router.get("/enrollment-by-age")
+@workload("interactive")
 def enrollment_by_age():
     """Age-wise enrollment trends over time"""
     ensure_data_loaded()
@@ -183,23 +321,11 @@ def enrollment_by_age():
     if trend_state['data'] is None:
         return []
     
-    df = trend_state['data']
-    
-    daily = df.groupby('date').agg({
-        'age_0_5': 'sum',
-        'age_5_17': 'sum',
-        'age_18_greater': 'sum'
-    }).reset_index()
-    
-    return {
-        "dates": [str(d.date()) for d in daily['date']],
-        "age_0_5": daily['age_0_5'].tolist(),
-        "age_5_17": daily['age_5_17'].tolist(),
-        "age_18_plus": daily['age_18_greater'].tolist()
-    }
+    return trend_state['aggregates']['enrollment_by_age']
 
 
 @router.get("/state-performance")
+@workload("interactive")
 def state_performance():
     """State-wise enrollment and completion rates"""
     ensure_data_loaded()
@@ -207,40 +333,11 @@ def state_performance():
     if trend_state['data'] is None:
         return []
     
-    df = trend_state['data']
-    
-    state_stats = df.groupby('state').agg({
-        'age_0_5': 'sum',
-        'age_5_17': 'sum',
-        'age_18_greater': 'sum',
-        'demo_age_5_17': 'sum',
-        'demo_age_17_': 'sum',
-        'bio_age_5_17': 'sum',
-        'bio_age_17_': 'sum'
-    }).reset_index()
-    
-    state_stats['total_enrolled'] = state_stats['age_0_5'] + state_stats['age_5_17'] + state_stats['age_18_greater']
-    state_stats['demo_completed'] = state_stats['demo_age_5_17'] + state_stats['demo_age_17_']
-    state_stats['bio_completed'] = state_stats['bio_age_5_17'] + state_stats['bio_age_17_']
-    state_stats['demo_rate'] = (state_stats['demo_completed'] / state_stats['total_enrolled'] * 100).fillna(0)
-    state_stats['bio_rate'] = (state_stats['bio_completed'] / state_stats['total_enrolled'] * 100).fillna(0)
-    
-    state_stats = state_stats.sort_values('total_enrolled', ascending=False)
-    
-    return [
-        {
-            "state": row['state'],
-            "total_enrolled": int(row['total_enrolled']),
-            "demographic_rate": round(row['demo_rate'], 2),
-            "biometric_rate": round(row['bio_rate'], 2),
-            "pending_demographics": int(row['total_enrolled'] - row['demo_completed']),
-            "pending_biometrics": int(row['total_enrolled'] - row['bio_completed'])
-        }
-        for _, row in state_stats.iterrows()
-    ]
+    return records(trend_state['aggregates']['state_performance'])
 
 
 @router.get("/bottleneck-districts")
+@workload("interactive")
 def bottleneck_districts():
     """Districts with low biometric/demographic completion"""
     ensure_data_loaded()
@@ -248,43 +345,11 @@ def bottleneck_districts():
     if trend_state['data'] is None:
         return []
     
-    df = trend_state['data']
-    
-    district_stats = df.groupby(['state', 'district']).agg({
-        'age_0_5': 'sum',
-        'age_5_17': 'sum',
-        'age_18_greater': 'sum',
-        'demo_age_5_17': 'sum',
-        'demo_age_17_': 'sum',
-        'bio_age_5_17': 'sum',
-        'bio_age_17_': 'sum'
-    }).reset_index()
-    
-    district_stats['total_enrolled'] = district_stats['age_0_5'] + district_stats['age_5_17'] + district_stats['age_18_greater']
-    district_stats['demo_completed'] = district_stats['demo_age_5_17'] + district_stats['demo_age_17_']
-    district_stats['bio_completed'] = district_stats['bio_age_5_17'] + district_stats['bio_age_17_']
-    district_stats['demo_rate'] = (district_stats['demo_completed'] / district_stats['total_enrolled'] * 100).fillna(0)
-    district_stats['bio_rate'] = (district_stats['bio_completed'] / district_stats['total_enrolled'] * 100).fillna(0)
-    
-    bottlenecks = district_stats[
-        (district_stats['total_enrolled'] > 50) & 
-        ((district_stats['bio_rate'] < 80) | (district_stats['demo_rate'] < 80))
-    ].sort_values('total_enrolled', ascending=False).head(20)
-    
-    return [
-        {
-            "state": row['state'],
-            "district": row['district'],
-            "total_enrolled": int(row['total_enrolled']),
-            "demographic_rate": round(row['demo_rate'], 2),
-            "biometric_rate": round(row['bio_rate'], 2),
-            "issue": "Biometric Backlog" if row['bio_rate'] < row['demo_rate'] else "Demographic Backlog"
-        }
-        for _, row in bottlenecks.iterrows()
-    ]
+    return records(trend_state['aggregates']['bottleneck_districts'])
 
 
 @router.get("/daily-volume")
+@workload("interactive")
 def daily_volume():
     """Daily enrollment, demographic, and biometric volumes"""
     ensure_data_loaded()
@@ -292,31 +357,11 @@ def daily_volume():
     if trend_state['data'] is None:
         return []
     
-    df = trend_state['data']
-    
-    daily = df.groupby('date').agg({
-        'age_0_5': 'sum',
-        'age_5_17': 'sum',
-        'age_18_greater': 'sum',
-        'demo_age_5_17': 'sum',
-        'demo_age_17_': 'sum',
-        'bio_age_5_17': 'sum',
-        'bio_age_17_': 'sum'
-    }).reset_index()
-    
-    daily['enrollments'] = daily['age_0_5'] + daily['age_5_17'] + daily['age_18_greater']
-    daily['demographics'] = daily['demo_age_5_17'] + daily['demo_age_17_']
-    daily['biometrics'] = daily['bio_age_5_17'] + daily['bio_age_17_']
-    
-    return {
-        "dates": [str(d.date()) for d in daily['date']],
-        "enrollments": daily['enrollments'].tolist(),
-        "demographics": daily['demographics'].tolist(),
-        "biometrics": daily['biometrics'].tolist()
-    }
+    return trend_state['aggregates']['daily_volume']
 
 
 @router.get("/high-volume-pincodes")
+@workload("interactive")
 def high_volume_pincodes():
     """Top 30 pincodes by enrollment volume"""
     ensure_data_loaded()
@@ -324,54 +369,48 @@ def high_volume_pincodes():
     if trend_state['data'] is None:
         return []
     
-    df = trend_state['data']
-    
-    pincode_stats = df.groupby(['state', 'district', 'pincode']).agg({
-        'age_0_5': 'sum',
-        'age_5_17': 'sum',
-        'age_18_greater': 'sum'
-    }).reset_index()
-    
-    pincode_stats['total'] = pincode_stats['age_0_5'] + pincode_stats['age_5_17'] + pincode_stats['age_18_greater']
-    top_pincodes = pincode_stats.sort_values('total', ascending=False).head(30)
-    
-    return [
-        {
-            "pincode": row['pincode'],
-            "district": row['district'],
-            "state": row['state'],
-            "total_enrollments": int(row['total']),
-            "children_0_5": int(row['age_0_5']),
-            "children_5_17": int(row['age_5_17']),
-            "adults": int(row['age_18_greater'])
-        }
-        for _, row in top_pincodes.iterrows()
-    ]
+    return records(trend_state['aggregates']['high_volume_pincodes'])
 
 
 @router.get("/fraud/anomalies")
+@workload("heavy")
 def fraud_anomalies():
-    """Districts flagged for unusual enrollment patterns"""
+    """Districts flagged for unusual enrollment patterns, including rows scored since the last fit"""
     ensure_data_loaded()
     
     if trend_state['data'] is None:
         return []
     
-    df = trend_state['data']
-    
-    anomalies = df[df['is_anomaly'] == -1].groupby(['state', 'district']).agg({
-        'age_18_greater': 'sum',
-        'fraud_spike_score': 'max',
-        'date': 'max'
-    }).reset_index().sort_values('fraud_spike_score', ascending=False).head(20)
-    
+    result = get_connection().execute("""
+        SELECT state, district, SUM(age_18_greater), MAX(fraud_spike_score), MAX(date)
+        FROM anomaly_scores WHERE is_anomaly = -1
+        GROUP BY state, district ORDER BY 4 DESC LIMIT 20
+    """).fetchall()
     return [
         {
-            "state": row['state'],
-            "district": row['district'],
-            "adult_enrollments": int(row['age_18_greater']),
-            "anomaly_score": round(row['fraud_spike_score'], 2),
-            "last_detected": str(row['date'].date())
+            "state": r[0],
+            "district": r[1],
+            "adult_enrollments": int(r[2]),
+            "anomaly_score": float(np.round(r[3], 2)),
+            "last_detected": str(r[4])
         }
-        for _, row in anomalies.iterrows()
+        for r in result
     ]
+
+
+@router.get("/fraud/model")
+@workload("interactive")
+def fraud_model():
+    """Fraud model version, alert counts and drift since the last fit"""
+    ensure_data_loaded()
+    return anomaly_scores.status()
+
+
+@router.post("/fraud/retrain")
+@workload("heavy")
+def fraud_retrain():
+    """Refit the fraud model on every scored row in the background"""
+    ensure_data_loaded()
+    if not anomaly_scores.start_retrain():
+        raise HTTPException(status_code=409, detail="A retrain is already running")
+    return {"status": "started", "model_version": anomaly_scores.model_state['version']}
@@ -3,15 +3,16 @@ Update Health Analytics Endpoints (Metrics 6-10)
 Schema: biometric(date, state, district, pincode, bio_age_5_17, bio_age_17_)
         demographic(date, state, district, pincode, demo_age_5_17, demo_age_17_)
 """
-from fastapi import APIRouter
-import sys
-sys.path.append('..')
+from fastapi import APIRouter, HTTPException
 from db.duckdb_loader import get_connection
+from db import activity, queries
+from db.resources import workload
 
 router = APIRouter(prefix="/metrics", tags=["Update Health"])
 
 
 @router.get("/biometric-freshness")
+@workload("heavy")
 def biometric_update_freshness():
     """Metric 6: Days since last biometric update by district"""
     con = get_connection()
@@ -28,25 +29,31 @@ def biometric_update_freshness():
 
 
 @router.get("/demographic-staleness")
-def demographic_staleness_score():
-    """Metric 7: Pincodes without demographic update in >24 months"""
+@workload("heavy")
+def demographic_staleness_score(inactive_for: str = "24 months"):
+    """Metric 7: Pincodes without demographic update in >24 months (or `inactive_for`)"""
+    try:
+        period = activity.parse_period(inactive_for)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     con = get_connection()
     result = con.execute("""
-        WITH enroll_pins AS (SELECT district, state, COUNT(DISTINCT pincode) AS total FROM enrollment GROUP BY district, state),
-             stale AS (SELECT e.district, e.state, COUNT(DISTINCT e.pincode) AS stale_count
-                       FROM enrollment e LEFT JOIN demographic d ON e.pincode = d.pincode
-                       WHERE d.date IS NULL OR d.date < CURRENT_DATE - INTERVAL '24 months'
-                       GROUP BY e.district, e.state)
-        SELECT ep.district, ep.state, ep.total, COALESCE(s.stale_count, 0),
-               ROUND(COALESCE(s.stale_count, 0)::FLOAT / ep.total * 100, 2)
-        FROM enroll_pins ep LEFT JOIN stale s ON ep.district = s.district AND ep.state = s.state
-        ORDER BY 5 DESC
-    """).fetchall()
-    return {"metric": "demographic_staleness", "data": [
+        WITH pins AS (SELECT e.district, e.state, e.pincode,
+                             a.last_demographic IS NULL OR a.last_demographic < CURRENT_DATE - CAST(? AS INTERVAL) AS stale
+                      FROM pincode_index e LEFT JOIN pincode_activity a ON e.pincode = a.pincode
+                      WHERE e.dataset = 'enrollment'),
+             counts AS (SELECT district, state, COUNT(DISTINCT pincode) AS total,
+                               COUNT(DISTINCT pincode) FILTER (WHERE stale) AS stale_count
+                        FROM pins GROUP BY district, state)
+        SELECT district, state, total, stale_count, ROUND(stale_count::FLOAT / total * 100, 2)
+        FROM counts ORDER BY 5 DESC
+    """, [period]).fetchall()
+    return {"metric": "demographic_staleness", "inactive_for": period, "data": [
         {"district": r[0], "state": r[1], "total_pincodes": r[2], "stale": r[3], "staleness_pct": r[4]} for r in result]}
 
 
 @router.get("/update-dependency-ratio")
+@workload("heavy")
 def update_dependency_ratio():
     """Metric 8: (bio + demo updates) / enrollments ratio"""
     con = get_connection()
@@ -66,6 +73,7 @@ def update_dependency_ratio():
 
 
 @router.get("/child-adult-transition")
+@workload("heavy")
 def child_adult_transition_rate():
     """Metric 9: bio_age_17_ / age_5_17 transition rate"""
     con = get_connection()
@@ -81,20 +89,10 @@ def child_adult_transition_rate():
 
 
 @router.get("/multi-update-penalty")
+@workload("heavy")
 def multi_update_penalty():
     """Metric 10: % pincodes with 3+ updates"""
     con = get_connection()
-    result = con.execute("""
-        WITH update_cnt AS (
-            SELECT e.pincode, e.district, e.state,
-                   (SELECT COUNT(*) FROM biometric b WHERE b.pincode = e.pincode) +
-                   (SELECT COUNT(*) FROM demographic d WHERE d.pincode = e.pincode) AS total_updates
-            FROM enrollment e GROUP BY e.pincode, e.district, e.state
-        )
-        SELECT district, state, COUNT(*) AS total,
-               SUM(CASE WHEN total_updates >= 3 THEN 1 ELSE 0 END) AS high_update,
-               ROUND(SUM(CASE WHEN total_updates >= 3 THEN 1 ELSE 0 END)::FLOAT / COUNT(*) * 100, 2)
-        FROM update_cnt GROUP BY district, state ORDER BY 5 DESC
-    """).fetchall()
+    result = queries.run(con, "district_update_penalty", [3, 3]).fetchall()
     return {"metric": "multi_update_penalty", "data": [
         {"district": r[0], "state": r[1], "total": r[2], "high_update": r[3], "penalty_pct": r[4]} for r in result]}
@@ -0,0 +1,100 @@
+"""
+Shard worker for scatter-gather aggregation (db/scatter.py)
+    python shard_worker.py --shard 0/4 --port 9100
+    python shard_worker.py --states "Bihar,Uttar Pradesh" --port 9101
+
+Loads the rows of its states from the source CSVs into an in-memory DuckDB and
+answers partial aggregates on host:port. --shard i/N takes every state whose
+hash modulo N is i, so N workers started with 0/N..N-1/N cover every state once.
+Point the API at the workers with UIDAI_SHARDS=host:port,host:port. A worker
+starts with every file in data/; when the API asks for another data version (an
+/ingest append) it reloads the files the API has loaded, and refuses the request
+if they don't give that version.
+"""
+import argparse
+import threading
+import time
+
+import duckdb
+from db import scatter, staging
+from db.duckdb_loader import DATA_DIR, DATASETS, source_paths, compute_data_version
+
+
+def load(con, states=None, shard=None, files=None):
+    """
+    Create each dataset table holding only this worker's states, from `files` ([dataset, name, ...]
+    as the API lists them) or every file in data/, and record them in loaded_files; returns rows per table
+    """
+    if states:
+        where, params = "state IN (SELECT unnest(?::VARCHAR[]))", [states]
+    else:
+        index, count = shard
+        where, params = f"hash(state) % {count} = {index}", []
+    paths = source_paths() if files is None else [(f[0], DATA_DIR / f[1]) for f in files]
+    stats = staging.stage_files(con.cursor, [(table, path, DATASETS[table][1]) for table, path in paths])
+    rows = {}
+    for table, (_, columns) in DATASETS.items():
+        staged = [s for s in stats if s["dataset"] == table and s["table"]]
+        if staged:
+            con.execute(f"CREATE TABLE {table} AS SELECT * FROM ({staging.union_sql(staged)}) WHERE {where}", params)
+        else:
+            # No files for this dataset: an empty table with the loader's columns
+            types = ", ".join(f"{c} {staging.TYPES.get(c, 'BIGINT')}" for c in columns)
+            con.execute(f"CREATE TABLE {table} ({types}, year_month VARCHAR)")
+        rows[table] = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    staging.drop(con, stats)
+    staging.create_log(con)
+    staging.record(con, stats, "full")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve partial aggregates for a subset of states")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--shard", help="i/N: the states whose hash modulo N is i")
+    group.add_argument("--states", help="comma-separated state names")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+
+    states = [s.strip() for s in args.states.split(",")] if args.states else None
+    shard = tuple(int(x) for x in args.shard.split("/")) if args.shard else None
+    current = {}
+    reload_lock = threading.Lock()
+
+    def reload(files=None, expected=None):
+        """
+        Load `files` (default: every file in data/) into a fresh database and switch to it unless it
+        isn't version `expected`; requests running on the old database finish there
+        """
+        start = time.perf_counter()
+        database = duckdb.connect()
+        rows = load(database, states, shard, files)
+        version = compute_data_version(database)
+        if expected is not None and version != expected:
+            database.close()
+            raise ValueError(f"shard has data version {current['version']} and the coordinator's files give "
+                             f"{version} here, coordinator expects {expected}")
+        owned = [r[0] for r in database.execute("SELECT DISTINCT state FROM enrollment ORDER BY 1").fetchall()]
+        current.update(database=database, version=version,
+                       info={"shard": args.shard, "states": owned, "rows": rows, "data_version": version})
+        print(f"✅ Shard {args.shard or args.states}: {len(owned)} states, {rows} rows, data version {version} "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    def ensure_version(version, files):
+        if version is None or version == current["version"]:
+            return
+        with reload_lock:
+            if version == current["version"]:
+                return
+            if files is None:
+                raise ValueError(f"shard has data version {current['version']}, coordinator expects {version}")
+            reload(files, version)
+
+    reload()
+    print(f"✅ Serving on {args.host}:{args.port}")
+    scatter.serve(lambda: current["database"].cursor(), args.host, args.port, lambda: current["info"], ensure_version)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,26 +15,28 @@ export default function ComparePage() {
     const [search1, setSearch1] = useState("");
     const [search2, setSearch2] = useState("");
 
-    const { data: healthIndex } = useQuery({ queryKey: ["healthIndex"], queryFn: api.healthIndex });
-    const { data: exclusionRisk } = useQuery({ queryKey: ["exclusionRisk"], queryFn: api.exclusionRisk });
-    const { data: freshness } = useQuery({ queryKey: ["freshness"], queryFn: api.biometricFreshness });
+    const selected = [district1, district2].filter(Boolean);
+    const { data: districtList } = useQuery({ queryKey: ["districtList"], queryFn: api.districtList });
+    const { data: comparison } = useQuery({
+        queryKey: ["compareDistricts", ...selected],
+        queryFn: () => api.compareDistricts(selected),
+        enabled: selected.length > 0,
+    });
 
-    const districts = healthIndex?.data?.map((d: any) => d.district) || [];
+    const districts = districtList?.data?.map((d: any) => d.district) || [];
     const filtered1 = districts.filter((d: string) => d.toLowerCase().includes(search1.toLowerCase())).slice(0, 8);
     const filtered2 = districts.filter((d: string) => d.toLowerCase().includes(search2.toLowerCase())).slice(0, 8);
 
     const getData = (district: string) => {
-        const h = healthIndex?.data?.find((d: any) => d.district === district);
-        const r = exclusionRisk?.data?.find((d: any) => d.district === district);
-        const f = freshness?.data?.find((d: any) => d.district === district);
+        const p = comparison?.data?.find((d: any) => d.district === district);
         return {
-            health: h?.health_index || 0,
-            freshness: h?.freshness_pct || 0,
-            update: h?.update_pct || 0,
-            enrolled: h?.enrolled || 0,
-            exclusion: r?.exclusion_risk || 0,
-            staleness: r?.staleness_pct || 0,
-            state: h?.state || "",
+            health: p?.health_index || 0,
+            freshness: p?.freshness_pct || 0,
+            update: p?.update_pct || 0,
+            enrolled: p?.enrolled || 0,
+            exclusion: p?.exclusion_risk || 0,
+            staleness: p?.stale_ratio_pct || 0,
+            state: p?.state || "",
         };
     };
 
@@ -49,7 +51,7 @@ export default function ComparePage() {
         { metric: "100 - Stale", d1: 100 - d1Data.staleness, d2: 100 - d2Data.staleness },
     ];
 
-    const isLoading = !healthIndex?.data;
+    const isLoading = !districtList?.data;
 
     if (isLoading) {
         return (
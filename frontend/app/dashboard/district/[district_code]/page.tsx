@@ -12,33 +12,12 @@ export default function DistrictView() {
     const params = useParams();
     const districtCode = decodeURIComponent(params.district_code as string);
 
-    const { data: healthIndex } = useQuery({
-        queryKey: ["healthIndex"],
-        queryFn: api.healthIndex,
+    const { data: profile } = useQuery({
+        queryKey: ["districtProfile", districtCode],
+        queryFn: () => api.districtProfile(districtCode),
     });
 
-    const { data: exclusionRisk } = useQuery({
-        queryKey: ["exclusionRisk"],
-        queryFn: api.exclusionRisk,
-    });
-
-    const { data: freshness } = useQuery({
-        queryKey: ["freshness"],
-        queryFn: api.biometricFreshness,
-    });
-
-    const { data: staleness } = useQuery({
-        queryKey: ["staleness"],
-        queryFn: api.demographicStaleness,
-    });
-
-    // Find district data
-    const districtHealth = healthIndex?.data?.find((d: any) => d.district === districtCode);
-    const districtRisk = exclusionRisk?.data?.find((d: any) => d.district === districtCode);
-    const districtFresh = freshness?.data?.find((d: any) => d.district === districtCode);
-    const districtStale = staleness?.data?.find((d: any) => d.district === districtCode);
-
-    const state = districtHealth?.state || "Unknown";
+    const state = profile?.state || "Unknown";
 
     return (
         <div className="space-y-6">
@@ -68,7 +47,7 @@ export default function DistrictView() {
             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-4">
                 <KPICard
                     title="Health Index"
-                    value={`${districtHealth?.health_index?.toFixed(1) || "—"}%`}
+                    value={`${profile?.health_index?.toFixed(1) || "—"}%`}
                     subtitle="Overall ecosystem health"
                     description={METRIC_DESCRIPTIONS.healthIndex}
                     icon={Activity}
@@ -76,7 +55,7 @@ export default function DistrictView() {
                 />
                 <KPICard
                     title="Exclusion Risk"
-                    value={`${districtRisk?.exclusion_risk?.toFixed(1) || "—"}%`}
+                    value={`${profile?.exclusion_risk?.toFixed(1) || "—"}%`}
                     subtitle="Risk of service exclusion"
                     description={METRIC_DESCRIPTIONS.exclusionRisk}
                     icon={AlertTriangle}
@@ -84,7 +63,7 @@ export default function DistrictView() {
                 />
                 <KPICard
                     title="Biometric Update Age"
-                    value={`${Math.round(districtFresh?.avg_days_since_update || 0)} days`}
+                    value={`${Math.round(profile?.avg_days_since_update || 0)} days`}
                     subtitle="Since last biometric update"
                     description={METRIC_DESCRIPTIONS.biometricFreshness}
                     icon={TrendingUp}
@@ -92,7 +71,7 @@ export default function DistrictView() {
                 />
                 <KPICard
                     title="Demographic Staleness"
-                    value={`${districtStale?.staleness_pct?.toFixed(1) || "—"}%`}
+                    value={`${profile?.staleness_pct?.toFixed(1) || "—"}%`}
                     subtitle="Outdated address/DOB records"
                     description={METRIC_DESCRIPTIONS.demographicStaleness}
                     icon={TrendingDown}
@@ -120,23 +99,23 @@ export default function DistrictView() {
                         <div className="space-y-3">
                             <div className="flex justify-between items-center py-2 border-b border-border/50">
                                 <span className="text-sm">Total Enrollments</span>
-                                <span className="font-medium">{districtHealth?.enrolled?.toLocaleString() || "—"}</span>
+                                <span className="font-medium">{profile?.enrolled?.toLocaleString() || "—"}</span>
                             </div>
                             <div className="flex justify-between items-center py-2 border-b border-border/50">
                                 <span className="text-sm" title="Score based on how recently data was updated">Data Freshness Score</span>
-                                <span className="font-medium">{districtHealth?.freshness_pct?.toFixed(1) || "—"}%</span>
+                                <span className="font-medium">{profile?.freshness_pct?.toFixed(1) || "—"}%</span>
                             </div>
                             <div className="flex justify-between items-center py-2 border-b border-border/50">
                                 <span className="text-sm" title="Ratio of updates to enrollments">Update Activity Rate</span>
-                                <span className="font-medium">{districtHealth?.update_pct?.toFixed(1) || "—"}%</span>
+                                <span className="font-medium">{profile?.update_pct?.toFixed(1) || "—"}%</span>
                             </div>
                             <div className="flex justify-between items-center py-2 border-b border-border/50">
                                 <span className="text-sm" title="Gap between expected and actual enrollments">Enrollment Deficit</span>
-                                <span className="font-medium">{districtRisk?.deficit_pct?.toFixed(1) || "—"}%</span>
+                                <span className="font-medium">{profile?.deficit_pct?.toFixed(1) || "—"}%</span>
                             </div>
                             <div className="flex justify-between items-center py-2">
                                 <span className="text-sm" title="Pincodes with no demographic updates in 12 months">Update Desert Areas</span>
-                                <span className="font-medium">{districtRisk?.desert_pct?.toFixed(1) || "—"}%</span>
+                                <span className="font-medium">{profile?.desert_pct?.toFixed(1) || "—"}%</span>
                             </div>
                         </div>
                     </GlassCard>
@@ -144,16 +123,16 @@ export default function DistrictView() {
                     <GlassCard padding="sm">
                         <h4 className="text-sm font-medium text-muted-foreground mb-3">Status Indicators</h4>
                         <div className="flex flex-wrap gap-2">
-                            {districtHealth?.health_index > 70 && (
+                            {profile?.health_index > 70 && (
                                 <span className="badge-success px-3 py-1 rounded-full text-xs">Good Coverage</span>
                             )}
-                            {districtRisk?.exclusion_risk > 50 && (
+                            {profile?.exclusion_risk > 50 && (
                                 <span className="badge-danger px-3 py-1 rounded-full text-xs">High Exclusion Risk</span>
                             )}
-                            {districtStale?.staleness_pct > 30 && (
+                            {profile?.staleness_pct > 30 && (
                                 <span className="badge-warning px-3 py-1 rounded-full text-xs">Outdated Records</span>
                             )}
-                            {districtFresh?.avg_days_since_update < 180 && (
+                            {profile?.avg_days_since_update < 180 && (
                                 <span className="badge-info px-3 py-1 rounded-full text-xs">Recently Updated</span>
                             )}
                         </div>
@@ -47,6 +47,7 @@ export const api = {
     enrollmentZscore: () => fetchAPI<MetricData<any>>("/metrics/enrollment-zscore"),
     bulkDays: () => fetchAPI<any>("/metrics/bulk-enrollment-days"),
     orphanUpdates: () => fetchAPI<any>("/metrics/orphan-updates"),
+    enrolledWithoutUpdates: () => fetchAPI<any>("/metrics/enrolled-without-updates"),
     ageSkew: () => fetchAPI<MetricData<any>>("/metrics/age-distribution-skew"),
     populationMismatch: () => fetchAPI<MetricData<any>>("/metrics/population-mismatch"),
 
@@ -61,6 +62,12 @@ export const api = {
     districtTwins: () => fetchAPI<any>("/metrics/district-twins"),
     ghostTowns: () => fetchAPI<any>("/metrics/pincode-ghost-towns"),
 
+    // District profiles (per-district feature store)
+    districtList: () => fetchAPI<any>("/districts"),
+    districtProfile: (district: string) => fetchAPI<any>(`/districts/${encodeURIComponent(district)}/profile`),
+    compareDistricts: (districts: string[]) =>
+        fetchAPI<any>(`/districts/compare?ids=${districts.map(encodeURIComponent).join(",")}`),
+
     // General
     allMetrics: () => fetchAPI<any>("/metrics"),
     enrollmentsByState: () => fetchAPI<any>("/enrollments_by_state"),